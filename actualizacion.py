@@ -0,0 +1,212 @@
+"""
+🔄 Actualización Incremental del Modelo - Predicción de Roturas en Red de Gas
+Universidad Tecnológica de Bolívar
+
+Incorpora al artefacto SARIMA los meses cerrados que llegaron después del
+último ajuste sin volver a estimar el modelo:
+- las observaciones nuevas se agregan extendiendo el filtro de Kalman desde
+  el estado guardado en el artefacto (NumPy, sin statsmodels)
+- los residuos estandarizados de un paso de esos meses deben comportarse
+  como N(0, 1); si la prueba de deriva (sesgo y varianza) falla, se
+  re-estiman los parámetros con la serie completa
+- si cambiaron meses ya incorporados (registros tardíos) se vuelve a filtrar
+  la serie con los parámetros actuales, sin estimarlos
+
+Solo se agregan meses cerrados: un mes se considera cerrado cuando ya
+terminó en el calendario y los datos llegan hasta su último día (o hay
+registros de un mes posterior). Por eso es seguro ejecutarlo a diario: con
+un mes en curso no cambia nada.
+
+Uso desde la línea de comandos (p. ej. en un cron diario o mensual):
+
+    python actualizacion.py                    # agrega los meses cerrados nuevos
+    python actualizacion.py --hasta 2025-06    # no agrega meses posteriores
+    python actualizacion.py --forzar           # re-estima aunque no haya deriva
+
+Cada vez que cambia el modelo se regenera también su diagnóstico
+(``diagnostico.py``) con los parámetros resultantes.
+"""
+
+import argparse
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from pronostico import (RUTA_ARTEFACTO, ajustar_modelo, cargar_artefacto, escala_modelo,
+                        extraer_artefacto, guardar_artefacto)
+
+# Residuos posteriores a la última estimación que entran en la prueba de deriva
+VENTANA_DERIVA = 12
+# Nivel de significancia de cada prueba (sesgo y varianza)
+ALFA_DERIVA = 0.01
+
+
+# ============= MESES CERRADOS =============
+def ultimo_mes_cerrado(fecha_maxima, hoy=None):
+    """
+    Último mes completo: terminado en el calendario y cubierto por los datos
+    hasta su último día (``fecha_maxima`` es el registro más reciente).
+    """
+    hoy = pd.Timestamp.now() if hoy is None else pd.Timestamp(hoy)
+    cubierto = (pd.Timestamp(fecha_maxima).normalize() + pd.Timedelta(days=1)).to_period('M') - 1
+    return min(hoy.to_period('M') - 1, cubierto)
+
+
+# ============= FILTRO DE KALMAN =============
+def extender_filtro(artefacto, observaciones):
+    """
+    Agrega observaciones (en la escala del modelo) al estado predicho del
+    artefacto. Devuelve el artefacto extendido y los residuos estandarizados
+    de un paso v / sqrt(F) de cada observación.
+    """
+    Z, T, R = artefacto['Z'], artefacto['T'], artefacto['R']
+    Q, H, d, c = artefacto['Q'], artefacto['H'], artefacto['d'], artefacto['c']
+    a = artefacto['estado'].copy()
+    P = artefacto['cov_estado'].copy()
+    RQR = R @ Q @ R.T
+
+    residuos = np.empty(len(observaciones))
+    for t, y in enumerate(observaciones):
+        v = y - (d + Z @ a)[0]
+        F = (Z @ P @ Z.T + H)[0, 0]
+        ganancia = (P @ Z.T)[:, 0] / F
+        a = c + T @ (a + ganancia * v)
+        P = T @ (P - np.outer(ganancia, ganancia) * F) @ T.T + RQR
+        residuos[t] = v / np.sqrt(F)
+
+    extendido = {**artefacto, 'estado': a, 'cov_estado': (P + P.T) / 2}
+    extendido['observaciones'] = np.concatenate([artefacto['observaciones'], observaciones])
+    extendido['residuos'] = np.concatenate([artefacto['residuos'], residuos])
+    return extendido, residuos
+
+
+def refiltrar(artefacto, serie, estimado_hasta):
+    """Vuelve a filtrar la serie completa con los parámetros del artefacto, sin estimarlos"""
+    from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+    meta = artefacto['meta']
+    modelo = SARIMAX(escala_modelo(serie, meta['transformacion']), order=tuple(meta['order']),
+                     seasonal_order=tuple(meta['seasonal_order']))
+    resultado = modelo.filter(artefacto['parametros'])
+    return extraer_artefacto(resultado, serie, meta['transformacion'], estimado_hasta)
+
+
+# ============= DERIVA =============
+def prueba_deriva(residuos, alfa=ALFA_DERIVA, ventana=VENTANA_DERIVA):
+    """
+    Compara los últimos ``ventana`` residuos estandarizados con N(0, 1):
+    sesgo (z de la media) y varianza (suma de cuadrados contra chi² con n
+    grados de libertad). Hay deriva si alguna prueba tiene p < ``alfa``.
+    """
+    z = np.asarray(residuos, dtype=float)[-ventana:]
+    n = len(z)
+    if n == 0:
+        return {'n': 0, 'p_sesgo': 1.0, 'p_varianza': 1.0, 'deriva': False}
+    p_sesgo = float(2 * stats.norm.sf(abs(z.mean()) * np.sqrt(n)))
+    p_varianza = float(stats.chi2.sf(np.sum(z ** 2), n))
+    return {'n': n, 'media': float(z.mean()), 'varianza': float(np.mean(z ** 2)),
+            'p_sesgo': p_sesgo, 'p_varianza': p_varianza,
+            'deriva': min(p_sesgo, p_varianza) < alfa}
+
+
+# ============= ACTUALIZACIÓN =============
+def _historial_coincide(artefacto, y):
+    """Indica si los meses ya filtrados por el artefacto no cambiaron en los datos"""
+    meta = artefacto['meta']
+    previas = y[pd.Period(meta['primer_mes'], freq='M'):pd.Period(meta['ultimo_mes'], freq='M')]
+    return (len(previas) == len(artefacto['observaciones'])
+            and np.allclose(previas.to_numpy(), artefacto['observaciones'], rtol=0, atol=1e-9))
+
+
+def actualizar(artefacto, serie, hasta, forzar=False, alfa=ALFA_DERIVA):
+    """
+    Lleva el artefacto hasta el mes ``hasta`` con la serie mensual de roturas
+    (indexada por fecha de fin de mes, como ``datos.serie_mensual``).
+
+    Devuelve ``(artefacto, informe)``; ``informe['accion']`` es
+    ``sin_cambios``, ``extendido`` (filtro extendido), ``refiltrado``
+    (historial corregido) o ``reestimado`` (deriva o ``forzar``).
+    """
+    inicio = time.perf_counter()
+    meta = artefacto['meta']
+    hasta = pd.Period(hasta, freq='M')
+    ultimo = pd.Period(meta['ultimo_mes'], freq='M')
+    estimado_hasta = meta['estimado_hasta']
+    meses = serie.index.to_period('M')
+    serie = serie[meses <= hasta]
+    y = pd.Series(escala_modelo(serie.to_numpy(dtype=float), meta['transformacion']), index=meses[meses <= hasta])
+    informe = {'desde': str(ultimo), 'hasta': str(hasta), 'meses_nuevos': max((hasta - ultimo).n, 0)}
+
+    if hasta < ultimo and not forzar:
+        raise ValueError(f"Los datos llegan hasta {hasta} y el modelo ya incluye {ultimo}; use --forzar para re-estimar")
+
+    if forzar:
+        accion, nuevo = 'reestimado', None
+    elif not _historial_coincide(artefacto, y):
+        # Registros tardíos en meses ya incorporados
+        accion, nuevo = 'refiltrado', refiltrar(artefacto, serie, estimado_hasta)
+    elif hasta == ultimo:
+        informe.update(accion='sin_cambios', prueba=prueba_deriva(artefacto['residuos'], alfa),
+                       segundos=time.perf_counter() - inicio)
+        return artefacto, informe
+    else:
+        accion = 'extendido'
+        nuevo, _ = extender_filtro(artefacto, y[ultimo + 1:].to_numpy(dtype=float))
+        nuevo['meta'] = {**meta, 'ultimo_mes': str(hasta), 'nobs': meta['nobs'] + informe['meses_nuevos']}
+
+    if nuevo is not None:
+        informe['prueba'] = prueba_deriva(nuevo['residuos'], alfa)
+    if nuevo is None or informe['prueba']['deriva']:
+        accion = 'reestimado'
+        resultado = ajustar_modelo(serie, tuple(meta['order']), tuple(meta['seasonal_order']), meta['transformacion'])
+        nuevo = extraer_artefacto(resultado, serie, meta['transformacion'])
+
+    nuevo['meta']['actualizado'] = datetime.now().isoformat(timespec='seconds')
+    informe.setdefault('prueba', prueba_deriva(nuevo['residuos'], alfa))
+    informe.update(accion=accion, segundos=time.perf_counter() - inicio)
+    return nuevo, informe
+
+
+# ============= CLI =============
+def main(argv=None):
+    from datos import RUTA_EXCEL, cargar_incidencias, serie_mensual
+    from diagnostico import RUTA_DIAGNOSTICO, actualizar_diagnostico
+
+    parser = argparse.ArgumentParser(
+        description="Agrega al modelo SARIMA los meses cerrados nuevos, re-estimando solo si hay deriva"
+    )
+    parser.add_argument('--ruta', default=RUTA_EXCEL, help="Archivo Excel de origen")
+    parser.add_argument('--artefacto', default=RUTA_ARTEFACTO, help="Ruta del artefacto .npz")
+    parser.add_argument('--hasta', default=None, help="Último mes a incorporar (AAAA-MM); por defecto, el último cerrado")
+    parser.add_argument('--alfa', type=float, default=ALFA_DERIVA, help="Significancia de la prueba de deriva")
+    parser.add_argument('--forzar', action='store_true', help="Re-estimar los parámetros siempre")
+    parser.add_argument('--diagnostico', default=RUTA_DIAGNOSTICO, help="Ruta del artefacto de diagnóstico")
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    df = cargar_incidencias(args.ruta)
+    cerrado = ultimo_mes_cerrado(df['Fecha de Creación'].max())
+    hasta = cerrado if args.hasta is None else min(pd.Period(args.hasta, freq='M'), cerrado)
+    serie = serie_mensual(df)['Num_Roturas']
+    artefacto, informe = actualizar(cargar_artefacto(args.artefacto), serie, hasta, args.forzar, args.alfa)
+    if informe['accion'] != 'sin_cambios':
+        guardar_artefacto(artefacto, args.artefacto)
+        actualizar_diagnostico(artefacto, serie, args.diagnostico)
+
+    iconos = {'sin_cambios': '✅', 'extendido': '➕', 'refiltrado': '🔁', 'reestimado': '🔧'}
+    print(f"{iconos[informe['accion']]} {informe['accion'].replace('_', ' ').capitalize()}: "
+          f"modelo hasta {artefacto['meta']['ultimo_mes']} ({informe['meses_nuevos']} meses nuevos, "
+          f"{informe['segundos'] * 1000:.0f} ms; total {time.perf_counter() - inicio:.2f} s)")
+    prueba = informe['prueba']
+    if prueba['n']:
+        print(f"   Deriva ({prueba['n']} residuos desde la última estimación): media {prueba['media']:+.2f}, "
+              f"varianza {prueba['varianza']:.2f}, p sesgo {prueba['p_sesgo']:.3f}, p varianza {prueba['p_varianza']:.3f}")
+    print(f"   Parámetros estimados con datos hasta {artefacto['meta']['estimado_hasta']}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,434 @@
+"""
+✈️ Modelo Aerolínea Vectorizado - Predicción de Roturas en Red de Gas
+Universidad Tecnológica de Bolívar
+
+Motor especializado para el modelo de producción, SARIMA(0,1,1)(0,1,1,12)
+sobre log1p de los conteos mensuales (el "modelo aerolínea"), que ajusta
+miles de series a la vez en lugar de una por una con statsmodels.
+
+- Las series se guardan en un arreglo 2-D (series × meses).
+- Tras la doble diferenciación w = (1-B)(1-B¹²)y, el modelo es un MA(13)
+  con coeficientes (1 + θB)(1 + ΘB¹²). La verosimilitud exacta se evalúa con
+  el algoritmo de innovaciones, vectorizado sobre todas las series, con σ²
+  concentrada.
+- θ y Θ se estiman con BFGS por lotes (una matriz 2×2 por serie) y un
+  gradiente por diferencias centrales evaluado en una sola llamada.
+- Los pronósticos e intervalos de todas las series salen de una llamada, con
+  la covarianza exacta de los errores de pronóstico del algoritmo de
+  innovaciones.
+
+Tolerancia frente a SARIMAX (inicialización difusa aproximada):
+- Con los mismos parámetros, la log-verosimilitud y los pronósticos e
+  intervalos coinciden en ~1e-5.
+- Tras la estimación, la log-verosimilitud del lote nunca queda más de
+  TOLERANCIA_LOGLIKE (1e-3) por debajo de la de SARIMAX; en los 354 barrios
+  de los datos reales la mayor desventaja es ~1e-5. En barrios casi vacíos
+  la verosimilitud es plana cerca de la frontera de invertibilidad y tiene
+  máximos locales: las series que terminan en la frontera se reajustan desde
+  un segundo inicio y se conserva el mejor máximo. Si aun así quedan en la
+  frontera (|θ| o |Θ| a menos de 1e-3 de 1) no cuentan como convergidas.
+- Las predicciones difieren en menos de 1e-3 roturas en la serie típica;
+  donde el lote encuentra un máximo mejor que SARIMAX pueden diferir hasta
+  ~0.1 roturas.
+- ``--verificar`` termina con error si se excede la tolerancia.
+
+Uso desde la línea de comandos:
+
+    python aerolinea.py                        # ajusta todos los barrios en lote
+    python aerolinea.py --verificar 50         # compara 50 barrios con SARIMAX
+"""
+
+import argparse
+import time
+import warnings
+
+import numpy as np
+from scipy import stats
+
+PERIODO = 12
+
+# Máxima desventaja de log-verosimilitud admitida frente a SARIMAX
+TOLERANCIA_LOGLIKE = 1e-3
+
+# Diferencia para el gradiente numérico y tolerancias del optimizador
+_H_GRADIENTE = 1e-5
+_TOL_GRADIENTE = 1e-6
+_TOL_FUNCION = 1e-10
+_SIGMA2_MIN = 1e-12
+
+# Inicios de BFGS: el primero para todas las series; los demás solo para las
+# que terminan en la frontera de invertibilidad (|θ| o |Θ| a menos de
+# _MARGEN_FRONTERA de 1), donde la verosimilitud es plana y hay máximos locales
+_INICIOS = ((-0.4, -0.6), (-0.9, 0.5))
+_MARGEN_FRONTERA = 1e-3
+
+
+# ============= ESTRUCTURA DEL MA(13) =============
+def _coeficientes_ma(theta, Theta, periodo=PERIODO):
+    """Coeficientes ψ_0..ψ_q de (1 + θB)(1 + ΘB^s), con forma (n, s + 2)"""
+    n = len(theta)
+    psi = np.zeros((n, periodo + 2))
+    psi[:, 0] = 1.0
+    psi[:, 1] = theta
+    psi[:, periodo] = Theta
+    psi[:, periodo + 1] = theta * Theta
+    return psi
+
+
+def _autocovarianzas(psi):
+    """γ(0..q) del MA con σ² = 1: γ(h) = Σ_j ψ_j ψ_{j+h}"""
+    q = psi.shape[1] - 1
+    gamma = np.empty_like(psi)
+    for h in range(q + 1):
+        gamma[:, h] = np.einsum('ij,ij->i', psi[:, :q + 1 - h], psi[:, h:])
+    return gamma
+
+
+def _innovaciones(gamma, w, pasos=0):
+    """
+    Algoritmo de innovaciones (Brockwell y Davis) para un MA(q), en lote.
+
+    Recorre las m observaciones de ``w`` y ``pasos`` posiciones futuras.
+    Devuelve:
+    - coef: θ_{t,j} (n, m + pasos, q + 1), con coef[:, t, 0] = 1
+    - r: varianzas relativas de las innovaciones (n, m + pasos)
+    - u: innovaciones observadas w_t - ŵ_t (n, m)
+    - w_pred: predicciones a un paso ŵ_t, extendidas hacia el futuro
+    """
+    n, q1 = gamma.shape
+    q = q1 - 1
+    m = w.shape[1]
+    total = m + pasos
+
+    # Las series van en el último eje: cada suma sobre retardos opera con
+    # vistas contiguas en lugar de indexación avanzada
+    G = np.ascontiguousarray(gamma.T)
+    W = np.ascontiguousarray(w.T)
+    coef = np.zeros((total, q1, n))
+    coef[:, 0] = 1.0
+    r = np.empty((total, n))
+    u = np.zeros((total, n))
+    w_pred = np.zeros((total, n))
+
+    r[0] = G[0]
+    if m:
+        u[0] = W[0]
+    for t in range(1, total):
+        inicio = max(0, t - q)
+        for k in range(inicio, t):
+            # θ_{t,t-k} = (γ(t-k) - Σ_{inicio<=j<k} θ_{k,k-j} θ_{t,t-j} r_j) / r_k
+            if k > inicio:
+                suma = np.einsum('jn,jn,jn->n', coef[k, k - inicio:0:-1],
+                                 coef[t, t - inicio:t - k:-1], r[inicio:k])
+                coef[t, t - k] = (G[t - k] - suma) / r[k]
+            else:
+                coef[t, t - k] = G[t - k] / r[k]
+        retardos = coef[t, t - inicio:0:-1]
+        r[t] = G[0] - np.einsum('jn,jn,jn->n', retardos, retardos, r[inicio:t])
+        # ŵ_t = Σ_{j=1}^{min(t,q)} θ_{t,j} u_{t-j}  (u futuras = 0)
+        w_pred[t] = np.einsum('jn,jn->n', retardos, u[inicio:t])
+        if t < m:
+            u[t] = W[t] - w_pred[t]
+    return coef.transpose(2, 0, 1), r.T, u[:m].T, w_pred.T
+
+
+def _diferenciar(y, periodo=PERIODO):
+    """w = (1-B)(1-B^s) y sobre el eje de los meses"""
+    return (y[:, periodo + 1:] - y[:, periodo:-1]) - (y[:, 1:-periodo] - y[:, :-periodo - 1])
+
+
+def log_verosimilitud(theta, Theta, w):
+    """
+    Log-verosimilitud exacta (σ² concentrada) del MA(13) para cada serie.
+
+    Devuelve (loglike, sigma2) con forma (n,).
+    """
+    gamma = _autocovarianzas(_coeficientes_ma(theta, Theta))
+    _, r, u, _ = _innovaciones(gamma, w)
+    m = w.shape[1]
+    # Piso para series constantes tras diferenciar (p. ej. barrios sin roturas)
+    sigma2 = np.maximum(np.sum(u ** 2 / r[:, :m], axis=1) / m, _SIGMA2_MIN)
+    loglike = -0.5 * (m * (np.log(2 * np.pi) + 1 + np.log(sigma2)) + np.sum(np.log(r[:, :m]), axis=1))
+    return loglike, sigma2
+
+
+# ============= OPTIMIZACIÓN EN LOTE =============
+def _a_parametros(x):
+    """Espacio libre → (θ, Θ) invertibles con |θ|, |Θ| < 1"""
+    return np.tanh(x[:, 0]), np.tanh(x[:, 1])
+
+
+def _objetivo(x, w):
+    """-loglike / m, con el gradiente por diferencias centrales en una sola evaluación"""
+    n = len(x)
+    h = _H_GRADIENTE
+    desplazamientos = np.array([[0, 0], [h, 0], [-h, 0], [0, h], [0, -h]])
+    x_todos = (x[None, :, :] + desplazamientos[:, None, :]).reshape(-1, 2)
+    w_todos = np.tile(w, (len(desplazamientos), 1))
+    theta, Theta = _a_parametros(x_todos)
+    f = -log_verosimilitud(theta, Theta, w_todos)[0].reshape(len(desplazamientos), n) / w.shape[1]
+    grad = np.stack([(f[1] - f[2]) / (2 * h), (f[3] - f[4]) / (2 * h)], axis=1)
+    return f[0], grad
+
+
+def _valor(x, w):
+    theta, Theta = _a_parametros(x)
+    return -log_verosimilitud(theta, Theta, w)[0] / w.shape[1]
+
+
+def _en_frontera(x):
+    """Soluciones con |θ| o |Θ| a menos de _MARGEN_FRONTERA de 1 (MA no invertible)"""
+    return (np.abs(np.tanh(x)) > 1 - _MARGEN_FRONTERA).any(axis=1)
+
+
+def _bfgs_multiinicio(x0, w, maxiter):
+    """
+    BFGS en lote desde ``x0`` y, para las series que quedan en la frontera,
+    desde los demás inicios de _INICIOS; conserva el mejor máximo de cada una.
+    Las soluciones que siguen en la frontera no cuentan como convergidas.
+    """
+    x, iteraciones, convergido = _bfgs_lote(x0, w, maxiter)
+    f = _valor(x, w)
+    for inicio in _INICIOS[1:]:
+        idx = np.flatnonzero(_en_frontera(x))
+        if len(idx) == 0:
+            break
+        x_alt, it_alt, conv_alt = _bfgs_lote(np.tile(np.arctanh(inicio), (len(idx), 1)), w[idx], maxiter)
+        f_alt = _valor(x_alt, w[idx])
+        iteraciones[idx] += it_alt
+        mejor = f_alt < f[idx]
+        x[idx[mejor]], f[idx[mejor]], convergido[idx[mejor]] = x_alt[mejor], f_alt[mejor], conv_alt[mejor]
+    return x, iteraciones, convergido & ~_en_frontera(x)
+
+
+def _bfgs_lote(x, w, maxiter):
+    """BFGS vectorizado: cada serie tiene su propia inversa de Hessiana 2×2"""
+    n = len(x)
+    f, g = _objetivo(x, w)
+    H = np.tile(np.eye(2), (n, 1, 1))
+    activo = np.ones(n, dtype=bool)
+    iteraciones = np.zeros(n, dtype=int)
+
+    for _ in range(maxiter):
+        idx = np.flatnonzero(activo)
+        if len(idx) == 0:
+            break
+        iteraciones[idx] += 1
+        p = -np.einsum('nij,nj->ni', H[idx], g[idx])
+        pendiente = np.einsum('ni,ni->n', g[idx], p)
+        # Si la dirección no es de descenso se reinicia con el gradiente
+        malas = pendiente >= 0
+        p[malas] = -g[idx][malas]
+        H[idx[malas]] = np.eye(2)
+        pendiente = np.einsum('ni,ni->n', g[idx], p)
+
+        # Búsqueda lineal de Armijo por retroceso, en lote
+        alpha = np.ones(len(idx))
+        f_nuevo = np.full(len(idx), np.inf)
+        pendientes_ls = np.ones(len(idx), dtype=bool)
+        for _ in range(30):
+            j = np.flatnonzero(pendientes_ls)
+            if len(j) == 0:
+                break
+            prueba = _valor(x[idx[j]] + alpha[j, None] * p[j], w[idx[j]])
+            acepta = np.isfinite(prueba) & (prueba <= f[idx[j]] + 1e-4 * alpha[j] * pendiente[j])
+            f_nuevo[j[acepta]] = prueba[acepta]
+            pendientes_ls[j[acepta]] = False
+            alpha[j[~acepta]] *= 0.5
+
+        avanzan = ~pendientes_ls
+        activo[idx[~avanzan]] = False
+        idx, p, alpha, f_nuevo = idx[avanzan], p[avanzan], alpha[avanzan], f_nuevo[avanzan]
+        if len(idx) == 0:
+            break
+
+        s = alpha[:, None] * p
+        x_nuevo = x[idx] + s
+        f_eval, g_nuevo = _objetivo(x_nuevo, w[idx])
+        y = g_nuevo - g[idx]
+
+        # Actualización BFGS de la inversa de la Hessiana
+        sy = np.einsum('ni,ni->n', s, y)
+        ok = sy > 1e-12
+        rho = np.where(ok, 1.0 / np.where(ok, sy, 1.0), 0.0)
+        I = np.eye(2)
+        A = I - rho[:, None, None] * np.einsum('ni,nj->nij', s, y)
+        H_nuevo = A @ H[idx] @ A.transpose(0, 2, 1) + rho[:, None, None] * np.einsum('ni,nj->nij', s, s)
+        H[idx[ok]] = H_nuevo[ok]
+
+        mejora = f[idx] - f_eval
+        x[idx], f[idx], g[idx] = x_nuevo, f_eval, g_nuevo
+        terminadas = (np.abs(g_nuevo).max(axis=1) < _TOL_GRADIENTE) | (np.abs(mejora) < _TOL_FUNCION)
+        activo[idx[terminadas]] = False
+
+    convergido = np.abs(g).max(axis=1) < 1e-3
+    return x, iteraciones, convergido
+
+
+# ============= MODELO EN LOTE =============
+class AerolineaLote:
+    """
+    Modelo aerolínea ajustado sobre un lote de series.
+
+    ``Y`` es un arreglo (series × meses) de conteos; todas las series
+    comparten el eje temporal y deben tener más de 13 meses.
+    """
+
+    def __init__(self, periodo=PERIODO, transformacion='log1p'):
+        if periodo != PERIODO:
+            raise ValueError("Solo se soporta periodo estacional 12")
+        self.periodo = periodo
+        self.transformacion = transformacion
+
+    def _escala_modelo(self, Y):
+        Y = np.asarray(Y, dtype=float)
+        if Y.ndim == 1:
+            Y = Y[None, :]
+        return np.log1p(Y) if self.transformacion == 'log1p' else Y
+
+    def fit(self, Y, maxiter=100, start_params=None):
+        """Estima θ, Θ y σ² para todas las series; devuelve self"""
+        self.y_ = self._escala_modelo(Y)
+        self.w_ = _diferenciar(self.y_, self.periodo)
+        n = len(self.y_)
+
+        if start_params is None:
+            x0 = np.tile(np.arctanh(_INICIOS[0]), (n, 1))
+        else:
+            inicio = np.clip(np.asarray(start_params, dtype=float).reshape(n, 2), -0.999, 0.999)
+            x0 = np.arctanh(inicio)
+
+        x, self.iteraciones_, self.convergido_ = _bfgs_multiinicio(x0, self.w_, maxiter)
+        self.theta_, self.Theta_ = _a_parametros(x)
+        self.loglike_, self.sigma2_ = log_verosimilitud(self.theta_, self.Theta_, self.w_)
+        self.aic_ = -2 * self.loglike_ + 2 * 3
+        return self
+
+    @property
+    def params_(self):
+        """Parámetros (n, 3) en el orden de SARIMAX: ma.L1, ma.S.L12, sigma2"""
+        return np.column_stack([self.theta_, self.Theta_, self.sigma2_])
+
+    def pronosticar(self, pasos, confianza=95):
+        """
+        Pronósticos e intervalos de todas las series en una llamada.
+
+        Devuelve (media, inferior, superior), cada uno de forma (n, pasos), en
+        la escala original (expm1 si el modelo usa log1p).
+        """
+        s = self.periodo
+        m = self.w_.shape[1]
+        gamma = _autocovarianzas(_coeficientes_ma(self.theta_, self.Theta_, s))
+        coef, r, _, w_pred = _innovaciones(gamma, self.w_, pasos)
+
+        # Pronóstico de w y covarianza exacta de sus errores: B diag(r) Bᵀ σ²
+        w_futuro = w_pred[:, m:]
+        n = len(w_futuro)
+        B = np.zeros((n, pasos, pasos))
+        for k in range(pasos):
+            for i in range(max(0, k - coef.shape[2] + 1), k + 1):
+                B[:, k, i] = coef[:, m + k, k - i]
+        cov_w = np.einsum('nki,ni,nli->nkl', B, r[:, m:], B) * self.sigma2_[:, None, None]
+
+        # Integración: y_{t} = y_{t-1} + y_{t-s} - y_{t-s-1} + w_t
+        y_ext = np.concatenate([self.y_, np.zeros((n, pasos))], axis=1)
+        base = self.y_.shape[1]
+        for h in range(pasos):
+            t = base + h
+            y_ext[:, t] = y_ext[:, t - 1] + y_ext[:, t - s] - y_ext[:, t - s - 1] + w_futuro[:, h]
+        media = y_ext[:, base:]
+
+        # Pesos de 1/((1-B)(1-B^s)): c_j = floor(j/s) + 1
+        j = np.subtract.outer(np.arange(pasos), np.arange(pasos))
+        C = np.where(j >= 0, j // s + 1, 0).astype(float)
+        varianza = np.einsum('ki,nij,kj->nk', C, cov_w, C)
+
+        z = stats.norm.ppf(0.5 + confianza / 200)
+        desv = np.sqrt(varianza)
+        inferior, superior = media - z * desv, media + z * desv
+        if self.transformacion == 'log1p':
+            return np.expm1(media), np.expm1(inferior), np.expm1(superior)
+        return media, inferior, superior
+
+
+# ============= VERIFICACIÓN CONTRA SARIMAX =============
+def comparar_con_sarimax(Y, modelo, indices, pasos=12, confianza=95):
+    """
+    Ajusta SARIMAX serie por serie en ``indices`` y compara con el lote.
+
+    Devuelve un dict con las diferencias máximas y medianas, la mayor
+    desventaja de log-verosimilitud del lote (SARIMAX - lote, 0 si el lote
+    siempre es igual o mejor) y los segundos por serie de SARIMAX.
+    """
+    from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+    media, _, superior = modelo.pronosticar(pasos, confianza)
+    alpha = 1 - confianza / 100
+    dif_loglike, dif_media, dif_superior = [], [], []
+    inicio = time.perf_counter()
+    for i in indices:
+        y = modelo._escala_modelo(Y[i])[0]
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            resultado = SARIMAX(y, order=(0, 1, 1), seasonal_order=(0, 1, 1, PERIODO)).fit(disp=False)
+        f = resultado.get_forecast(pasos)
+        ref_media, ref_superior = f.predicted_mean, f.conf_int(alpha=alpha)[:, 1]
+        if modelo.transformacion == 'log1p':
+            ref_media, ref_superior = np.expm1(ref_media), np.expm1(ref_superior)
+        dif_loglike.append(resultado.llf - modelo.loglike_[i])
+        dif_media.append(np.abs(media[i] - ref_media).max())
+        dif_superior.append(np.abs(superior[i] - ref_superior).max())
+    segundos = (time.perf_counter() - inicio) / max(len(indices), 1)
+
+    return {
+        'series': len(indices),
+        'segundos_por_serie': segundos,
+        'desventaja_loglike_max': max(float(np.max(dif_loglike)), 0.0),
+        'peor_serie': int(indices[int(np.argmax(dif_loglike))]),
+        'prediccion_max': float(np.max(dif_media)),
+        'prediccion_mediana': float(np.median(dif_media)),
+        'ic_superior_max': float(np.max(dif_superior)),
+    }
+
+
+# ============= CLI =============
+def main(argv=None):
+    from datos import RUTA_EXCEL, cargar_incidencias
+    from flota import NIVELES, series_por_nivel
+
+    parser = argparse.ArgumentParser(description="Modelo aerolínea ajustado en lote")
+    parser.add_argument('--ruta', default=RUTA_EXCEL, help="Archivo Excel de origen")
+    parser.add_argument('--nivel', choices=NIVELES, default='Barrio', help="Nivel de agregación")
+    parser.add_argument('--horizonte', type=int, default=12, help="Meses a pronosticar")
+    parser.add_argument('--verificar', type=int, default=0,
+                        help="Número de series a comparar con SARIMAX (0 = no comparar)")
+    args = parser.parse_args(argv)
+
+    _, _, matriz = series_por_nivel(cargar_incidencias(args.ruta), args.nivel)
+    inicio = time.perf_counter()
+    modelo = AerolineaLote().fit(matriz)
+    modelo.pronosticar(args.horizonte)
+    segundos = time.perf_counter() - inicio
+
+    print(f"✅ {len(matriz)} series × {matriz.shape[1]} meses ajustadas en {segundos:.2f} s "
+          f"({1000 * segundos / len(matriz):.1f} ms por serie)")
+    print(f"   Convergieron: {modelo.convergido_.sum()}/{len(matriz)} (el resto queda en la frontera de invertibilidad)")
+
+    if args.verificar:
+        indices = np.linspace(0, len(matriz) - 1, min(args.verificar, len(matriz))).astype(int)
+        r = comparar_con_sarimax(matriz, modelo, indices, args.horizonte)
+        velocidad = r['segundos_por_serie'] * len(matriz) / segundos
+        print(f"\n🔬 Comparación con SARIMAX ({r['series']} series):")
+        print(f"   SARIMAX: {1000 * r['segundos_por_serie']:.0f} ms por serie → lote {velocidad:.0f}x más rápido")
+        print(f"   Desventaja de loglike máx: {r['desventaja_loglike_max']:.2e} "
+              f"(serie {r['peor_serie']}, tolerancia {TOLERANCIA_LOGLIKE:.0e})")
+        print(f"   |Δ predicción| máx: {r['prediccion_max']:.3f} (mediana {r['prediccion_mediana']:.1e})")
+        print(f"   |Δ IC superior| máx: {r['ic_superior_max']:.3f}")
+        if r['desventaja_loglike_max'] > TOLERANCIA_LOGLIKE:
+            print("❌ El lote queda por debajo de SARIMAX más allá de la tolerancia")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,127 @@
+"""
+🧊 Cubo de Conteos Agregados - Predicción de Roturas en Red de Gas
+Universidad Tecnológica de Bolívar
+
+Resume el DataFrame de incidencias en un cubo de conteos
+mes × barrio × día de la semana × hora, construido una sola vez por carga de
+datos. Las gráficas, métricas y tablas del dashboard se obtienen con cortes y
+sumas del cubo, de modo que su costo depende del tamaño del cubo y no del
+número de roturas.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+DIAS = 7
+HORAS = 24
+FRANJAS = DIAS * HORAS
+
+
+class CuboRoturas:
+    """
+    Cubo de conteos de roturas.
+
+    El cubo completo se guarda como matriz dispersa CSR con una fila por
+    (mes, barrio) y una columna por (día, hora). La última posición del eje
+    de barrios agrupa las roturas sin barrio registrado, que cuentan en los
+    totales pero no en los rankings.
+
+    Al construirlo se precalculan dos marginales densas:
+    - ``mes_barrio``: conteos (n_meses, n_barrios + 1)
+    - ``mes_dia_hora``: conteos (n_meses, 7, 24)
+    """
+
+    def __init__(self, meses, barrios, conteos):
+        self.meses = meses
+        self.barrios = barrios
+        self.conteos = conteos.tocsr()
+
+        n_meses, n_barrios = len(meses), len(barrios) + 1
+        self.mes_barrio = np.asarray(self.conteos.sum(axis=1)).reshape(n_meses, n_barrios)
+
+        coo = self.conteos.tocoo()
+        clave = (coo.row // n_barrios) * FRANJAS + coo.col
+        self.mes_dia_hora = np.bincount(
+            clave, weights=coo.data, minlength=n_meses * FRANJAS
+        ).astype(np.int64).reshape(n_meses, DIAS, HORAS)
+
+        self._posiciones = {(p.year, p.month): i for i, p in enumerate(meses)}
+
+    @classmethod
+    def desde_marginales(cls, meses, barrios, conteos, mes_barrio, mes_dia_hora):
+        """Arma el cubo con marginales ya calculadas (p. ej. mapeadas desde disco), sin copiarlas"""
+        cubo = cls.__new__(cls)
+        cubo.meses, cubo.barrios, cubo.conteos = meses, barrios, conteos
+        cubo.mes_barrio, cubo.mes_dia_hora = mes_barrio, mes_dia_hora
+        cubo._posiciones = {(p.year, p.month): i for i, p in enumerate(meses)}
+        return cubo
+
+    def posicion_mes(self, año, mes):
+        """Posición del mes en el eje temporal, o None si está fuera del rango"""
+        return self._posiciones.get((año, mes))
+
+    def _filas_mes(self, matriz, mes):
+        return matriz.sum(axis=0) if mes is None else matriz[mes]
+
+    def total(self, mes=None):
+        """Total de roturas, de todo el histórico o de un mes (posición)"""
+        return int(self._filas_mes(self.mes_barrio, mes).sum())
+
+    def dia_hora(self, mes=None):
+        """Matriz 7 × 24 de conteos por día de la semana (lunes=0) y hora"""
+        return self._filas_mes(self.mes_dia_hora, mes)
+
+    def conteo_barrios(self, mes=None):
+        """Roturas por barrio ordenadas de mayor a menor (como value_counts)"""
+        conteos = self._filas_mes(self.mes_barrio, mes)[:-1]
+        orden = np.argsort(-conteos, kind='stable')
+        orden = orden[conteos[orden] > 0]
+        return pd.Series(conteos[orden], index=self.barrios[orden], name='count')
+
+    def ultimos_meses(self, n):
+        """Los ``n`` meses más recientes con roturas, del más reciente al más antiguo"""
+        con_datos = self.mes_barrio.sum(axis=1) > 0
+        return self.meses[con_datos][::-1][:n]
+
+    def serie_mensual(self):
+        """Serie mensual de roturas, equivalente a agrupar por mes"""
+        return pd.DataFrame(
+            {'Num_Roturas': self.mes_barrio.sum(axis=1)},
+            index=pd.DatetimeIndex(self.meses.to_timestamp(how='end').normalize(),
+                                   name='Fecha de Creación', freq='M')
+        )
+
+    @property
+    def nbytes(self):
+        """Memoria ocupada por el cubo y sus marginales"""
+        return (self.conteos.data.nbytes + self.conteos.indices.nbytes
+                + self.conteos.indptr.nbytes + self.mes_barrio.nbytes
+                + self.mes_dia_hora.nbytes)
+
+
+def construir_cubo(df):
+    """Construye el cubo de conteos a partir del DataFrame de incidencias"""
+    fechas = df['Fecha de Creación']
+    periodo_ini = fechas.min().to_period('M')
+    periodo_fin = fechas.max().to_period('M')
+    meses = pd.period_range(periodo_ini, periodo_fin, freq='M')
+
+    # Los campos de calendario son int8/int16: se amplían antes de operar
+    pos_mes = ((df['Año'].to_numpy(np.int64) - periodo_ini.year) * 12
+               + df['Mes'].to_numpy(np.int64) - periodo_ini.month)
+
+    codigos, barrios = pd.factorize(df['Barrio'], sort=True)
+    n_barrios = len(barrios) + 1
+    codigos = np.where(codigos < 0, len(barrios), codigos)
+
+    filas = pos_mes * n_barrios + codigos
+    columnas = df['Dia_Semana'].to_numpy(np.int64) * HORAS + df['Hora'].to_numpy(np.int64)
+
+    conteos = sparse.coo_matrix(
+        (np.ones(len(df), dtype=np.int32), (filas, columnas)),
+        shape=(len(meses) * n_barrios, FRANJAS)
+    )
+    conteos.sum_duplicates()
+    return CuboRoturas(meses, pd.Index(barrios, name='Barrio'), conteos)
+
@@ -0,0 +1,358 @@
+"""
+🌐 API HTTP de Pronósticos - Predicción de Roturas en Red de Gas
+Universidad Tecnológica de Bolívar
+
+Servicio JSON liviano (solo biblioteca estándar) para los sistemas de
+despacho y GIS. Usa el mismo código de carga y pronóstico que el dashboard:
+``cargar_incidencias``, el cubo de conteos, el artefacto SARIMA y la flota
+por barrio.
+
+Rutas:
+- ``/forecast?horizon=6&level=total|barrio|distrito[&name=...]``
+- ``/barrios/top?n=10[&month=2025-07]``
+- ``/patterns/hourly[?month=2025-07]``
+- ``/health``: huella de los datos y estadísticas de la caché
+
+Cada respuesta se guarda ya serializada en una caché LRU en memoria, con la
+huella de los datos en la clave. Antes de cada consulta se revisan (con
+``os.stat``) el archivo de datos y los artefactos; si cambiaron se recargan
+en un estado nuevo que reemplaza al anterior de una sola vez y, si cambió la
+huella, se vacía la caché.
+
+Uso desde la línea de comandos:
+
+    python api.py                              # http://127.0.0.1:8600
+    python api.py --host 0.0.0.0 --puerto 9000
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pandas as pd
+
+from agregados import construir_cubo
+from datos import RUTA_EXCEL, cargar_incidencias, huella_datos
+from flota import RUTA_FLOTA, FlotaPronosticos
+from pronostico import RUTA_ARTEFACTO, cargar_artefacto, pronosticar
+
+PUERTO = 8600
+TAMANO_CACHE = 1024
+HORIZONTE_MAXIMO = 36
+NIVELES_API = {'total': None, 'barrio': 'Barrio', 'distrito': 'Distrito'}
+
+
+class ErrorConsulta(Exception):
+    """Parámetros inválidos: se responde 400 con el mensaje"""
+
+
+# ============= CACHÉ LRU =============
+class CacheLRU:
+    """Caché LRU de respuestas serializadas, segura entre hilos"""
+
+    def __init__(self, tamano=TAMANO_CACHE):
+        self.tamano = tamano
+        self._datos = OrderedDict()
+        self._candado = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, clave):
+        with self._candado:
+            valor = self._datos.get(clave)
+            if valor is None:
+                self.fallos += 1
+                return None
+            self._datos.move_to_end(clave)
+            self.aciertos += 1
+            return valor
+
+    def guardar(self, clave, valor):
+        with self._candado:
+            self._datos[clave] = valor
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.tamano:
+                self._datos.popitem(last=False)
+
+    def vaciar(self):
+        with self._candado:
+            self._datos.clear()
+
+    def estadisticas(self):
+        with self._candado:
+            return {'entries': len(self._datos), 'size': self.tamano,
+                    'hits': self.aciertos, 'misses': self.fallos}
+
+
+# ============= MOTOR DE CONSULTAS =============
+class EstadoConsultas:
+    """
+    Una carga completa de las fuentes: datos, cubo y artefactos con su
+    huella y su firma. No se modifica después de creada; el motor publica
+    una nueva al recargar, así que cada consulta ve una carga coherente.
+    """
+
+    def __init__(self, rutas, firma):
+        ruta_excel, ruta_artefacto, ruta_flota = rutas
+        self.firma = firma
+        self.df = cargar_incidencias(ruta_excel)
+        self.cubo = construir_cubo(self.df)
+        self.artefacto = cargar_artefacto(ruta_artefacto)
+        try:
+            self.flota = FlotaPronosticos.cargar(ruta_flota)
+        except FileNotFoundError:
+            self.flota = None
+        artefactos = [self.artefacto['meta']['ultimo_mes'], self.artefacto['meta']['aic'],
+                      self.artefacto['meta'].get('actualizado'),
+                      self.flota.meta['ultimo_mes'] if self.flota is not None else None,
+                      float(self.flota.prediccion.sum()) if self.flota is not None else None]
+        self.huella = f"{huella_datos(self.df)}:{json.dumps(artefactos)}"
+
+    # ----- Consultas -----
+    def _mes(self, valor):
+        if not valor:
+            return None, None
+        try:
+            mes = pd.Period(valor, freq='M')
+        except (ValueError, TypeError):
+            raise ErrorConsulta(f"month debe tener formato AAAA-MM, no '{valor}'")
+        pos = self.cubo.posicion_mes(mes.year, mes.month)
+        if pos is None:
+            raise ErrorConsulta(f"Sin datos para el mes {mes}")
+        return mes, pos
+
+    @staticmethod
+    def _entero(valor, nombre, defecto, minimo, maximo):
+        if valor is None:
+            return defecto
+        try:
+            numero = int(valor)
+        except ValueError:
+            raise ErrorConsulta(f"{nombre} debe ser un entero")
+        if not minimo <= numero <= maximo:
+            raise ErrorConsulta(f"{nombre} debe estar entre {minimo} y {maximo}")
+        return numero
+
+    @staticmethod
+    def _filas_pronostico(df_pred):
+        return [
+            {'date': f.strftime('%Y-%m'), 'prediction': round(float(p), 4),
+             'lower': round(float(lo), 4), 'upper': round(float(hi), 4)}
+            for f, p, lo, hi in zip(df_pred['Fecha'], df_pred['Prediccion'],
+                                    df_pred['IC_Inferior'], df_pred['IC_Superior'])
+        ]
+
+    def forecast(self, horizon=None, level=None, name=None):
+        nivel_api = (level or 'total').lower()
+        if nivel_api not in NIVELES_API:
+            raise ErrorConsulta(f"level debe ser uno de {sorted(NIVELES_API)}")
+        nivel = NIVELES_API[nivel_api]
+
+        if nivel is None:
+            horizonte = self._entero(horizon, 'horizon', 6, 1, HORIZONTE_MAXIMO)
+            series = [{'name': 'total', 'model': 'sarima',
+                       'forecast': self._filas_pronostico(pronosticar(self.artefacto, horizonte))}]
+        else:
+            if self.flota is None:
+                raise ErrorConsulta("No hay flota de pronósticos entrenada (python flota.py)")
+            horizonte = self._entero(horizon, 'horizon', 6, 1, self.flota.meta['horizonte'])
+            nombres = [n for nv, n in zip(self.flota.niveles, self.flota.nombres) if nv == nivel]
+            if name is not None:
+                if name not in nombres:
+                    raise ErrorConsulta(f"No existe {nivel.lower()} '{name}'")
+                nombres = [name]
+            series = [{'name': str(n), 'model': self.flota.modelo(n, nivel),
+                       'forecast': self._filas_pronostico(self.flota.pronostico(n, nivel, horizonte))}
+                      for n in nombres]
+
+        return {'level': nivel_api, 'horizon': horizonte, 'confidence': 95, 'series': series}
+
+    def barrios_top(self, n=None, month=None):
+        top = self._entero(n, 'n', 10, 1, len(self.cubo.barrios))
+        mes, pos = self._mes(month)
+        conteos = self.cubo.conteo_barrios(pos)
+        total = self.cubo.total(pos)
+        return {
+            'month': str(mes) if mes is not None else None,
+            'total': total,
+            'barrios': [{'rank': i, 'barrio': str(b), 'count': int(c),
+                         'share': round(100 * c / total, 2) if total else 0.0}
+                        for i, (b, c) in enumerate(conteos.head(top).items(), 1)],
+        }
+
+    def patterns_hourly(self, month=None):
+        mes, pos = self._mes(month)
+        dia_hora = self.cubo.dia_hora(pos)
+        return {
+            'month': str(mes) if mes is not None else None,
+            'hourly': dia_hora.sum(axis=0).astype(int).tolist(),
+            'weekday': dia_hora.sum(axis=1).astype(int).tolist(),
+            'weekday_hour': dia_hora.astype(int).tolist(),
+        }
+
+
+class MotorConsultas:
+    """
+    Estado de consultas vigente, con recarga automática.
+
+    ``firma`` resume (tamaño, mtime) de las fuentes y se compara en cada
+    consulta; ``huella`` es la huella del contenido y define la validez de
+    la caché.
+    """
+
+    def __init__(self, ruta_excel=RUTA_EXCEL, ruta_artefacto=RUTA_ARTEFACTO,
+                 ruta_flota=RUTA_FLOTA, tamano_cache=TAMANO_CACHE):
+        self.rutas = (ruta_excel, ruta_artefacto, ruta_flota)
+        self.cache = CacheLRU(tamano_cache)
+        self._candado = threading.Lock()
+        self.estado = None
+        self.recargas = 0
+        self.verificar()
+
+    @property
+    def huella(self):
+        return self.estado.huella
+
+    @property
+    def df(self):
+        return self.estado.df
+
+    def _firma_fuentes(self):
+        firma = []
+        for ruta in self.rutas:
+            try:
+                info = os.stat(ruta)
+                firma.append((info.st_size, info.st_mtime_ns))
+            except FileNotFoundError:
+                firma.append(None)
+        return tuple(firma)
+
+    def verificar(self):
+        """
+        Recarga si cambió alguna fuente y devuelve el estado vigente. El
+        estado nuevo se arma completo y se publica con una sola asignación;
+        si cambió la huella, se vacía la caché.
+        """
+        firma = self._firma_fuentes()
+        estado = self.estado
+        if estado is not None and firma == estado.firma:
+            return estado
+        with self._candado:
+            if self.estado is not None and firma == self.estado.firma:
+                return self.estado
+            nuevo = EstadoConsultas(self.rutas, firma)
+            if self.estado is None or nuevo.huella != self.estado.huella:
+                self.cache.vaciar()
+            self.estado = nuevo
+            self.recargas += 1
+            return nuevo
+
+    def health(self):
+        estado = self.estado
+        return {'status': 'ok', 'fingerprint': estado.huella, 'reloads': self.recargas,
+                'rows': int(len(estado.df)), 'cache': self.cache.estadisticas()}
+
+
+# ============= SERVIDOR HTTP =============
+RUTAS = {
+    '/forecast': ('forecast', ('horizon', 'level', 'name')),
+    '/barrios/top': ('barrios_top', ('n', 'month')),
+    '/patterns/hourly': ('patterns_hourly', ('month',)),
+}
+
+
+def responder(motor, ruta, consulta):
+    """
+    Resuelve una petición y devuelve (código HTTP, cuerpo JSON en bytes).
+
+    Las respuestas correctas se sirven desde la caché LRU, con clave por
+    huella, ruta y parámetros normalizados; la consulta se resuelve sobre el
+    mismo estado cuya huella forma la clave.
+    """
+    estado = motor.verificar()
+    if ruta == '/health':
+        return 200, json.dumps(motor.health()).encode('utf-8')
+    if ruta not in RUTAS:
+        return 404, json.dumps({'error': f"Ruta desconocida: {ruta}"}).encode('utf-8')
+
+    metodo, parametros = RUTAS[ruta]
+    valores = parse_qs(consulta)
+    argumentos = {p: valores[p][0] for p in parametros if p in valores}
+    clave = (estado.huella, ruta, tuple(sorted(argumentos.items())))
+
+    cuerpo = motor.cache.obtener(clave)
+    if cuerpo is not None:
+        return 200, cuerpo
+    try:
+        resultado = getattr(estado, metodo)(**argumentos)
+    except ErrorConsulta as e:
+        return 400, json.dumps({'error': str(e)}, ensure_ascii=False).encode('utf-8')
+    cuerpo = json.dumps(resultado, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    motor.cache.guardar(clave, cuerpo)
+    return 200, cuerpo
+
+
+def crear_manejador(motor):
+    """Clase de manejador HTTP ligada a un motor de consultas"""
+
+    class Manejador(BaseHTTPRequestHandler):
+        # Conexiones persistentes: los clientes reutilizan el socket. Sin
+        # TCP_NODELAY las cabeceras y el cuerpo, enviados por separado,
+        # esperan al ACK retardado del cliente (~40 ms por respuesta)
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            partes = urlsplit(self.path)
+            try:
+                codigo, cuerpo = responder(motor, partes.path.rstrip('/') or '/', partes.query)
+            except Exception as e:
+                codigo, cuerpo = 500, json.dumps({'error': f"{type(e).__name__}: {e}"}).encode('utf-8')
+            self.send_response(codigo)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def log_message(self, formato, *args):
+            pass
+
+    return Manejador
+
+
+def crear_servidor(motor, host='127.0.0.1', puerto=PUERTO):
+    servidor = ThreadingHTTPServer((host, puerto), crear_manejador(motor))
+    servidor.daemon_threads = True
+    return servidor
+
+
+# ============= CLI =============
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="API HTTP de pronósticos de roturas")
+    parser.add_argument('--ruta', default=RUTA_EXCEL, help="Archivo Excel de origen")
+    parser.add_argument('--host', default='127.0.0.1', help="Interfaz de escucha")
+    parser.add_argument('--puerto', type=int, default=PUERTO, help="Puerto HTTP")
+    parser.add_argument('--cache', type=int, default=TAMANO_CACHE, help="Respuestas en la caché LRU")
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    motor = MotorConsultas(args.ruta, tamano_cache=args.cache)
+    servidor = crear_servidor(motor, args.host, args.puerto)
+    print(f"✅ Datos cargados ({len(motor.df):,} roturas, {time.perf_counter() - inicio:.2f} s)")
+    print(f"   Escuchando en http://{args.host}:{args.puerto}", flush=True)
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,405 @@
+"""
+⏱️ Suite de Benchmarks - Predicción de Roturas en Red de Gas
+Universidad Tecnológica de Bolívar
+
+Mide tiempo y memoria pico de las rutas críticas del proyecto:
+- ``ingesta_excel``: leer y limpiar el Excel (``cargar_excel``)
+- ``ingesta_cache``: ``cargar_incidencias`` con la caché Parquet vigente
+- ``ingesta_agregada``: ``ingesta.ingerir`` del mismo Parquet por bloques,
+  directo al cubo de conteos (sin el DataFrame)
+- ``cubo``: cubo de conteos construido al cargar
+- ``pestanas``: consultas de las pestañas del dashboard (métricas, barrios
+  de cada mes, patrones día × hora y lista de meses del cubo)
+- ``sarimax``: un ajuste del modelo final
+- ``simulacion``: 20.000 trayectorias Monte Carlo a 12 meses del modelo final
+- ``grid_search`` y ``validacion``: búsqueda y rolling window del notebook
+  (sin la caché de ajustes)
+- ``validacion_cache``: la misma rolling window con todas las ventanas en
+  la caché de ajustes
+- ``seleccion``: selección stepwise del orden sobre el mismo train del grid
+  (sin la caché de ajustes)
+- ``reporte_pdf``: ``generar_pdf_reporte``
+
+Cada benchmark de datos se ejecuta con varios tamaños: el histórico real
+(4.162 roturas) y conjuntos sintéticos de ``generador.py`` con su misma
+forma (hasta ~10M filas con ``--tamanos``). Los ajustes de modelos dependen
+de la serie mensual y no del número de filas, así que se miden una sola vez.
+
+El tiempo es la mediana de ``--repeticiones`` corridas. La memoria pico es
+el aumento del RSS máximo (``resource.getrusage``) de una corrida aparte en
+un proceso hijo creado con fork, sin los trabajadores del pool: a
+diferencia de tracemalloc, incluye lo que reservan pyarrow, NumPy y las
+extensiones en C. Donde no hay fork (Windows) se recurre a tracemalloc,
+que solo ve las reservas de Python; cada resultado indica en ``memoria``
+cuál se usó y la comparación no mezcla ambas.
+
+Uso desde la línea de comandos:
+
+    python benchmarks.py correr                          # tamaños por defecto
+    python benchmarks.py correr --tamanos 4162 10000000 --solo ingesta_cache cubo pestanas
+    python benchmarks.py correr --guardar-base           # fija la línea base
+    python benchmarks.py comparar                        # última corrida vs línea base
+"""
+
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from datos import DIR_CACHE, RUTA_EXCEL, cargar_incidencias
+from esquema import nombre_mes
+from generador import GeneradorIncidencias
+
+DIR_BENCHMARKS = os.path.join(DIR_CACHE, 'benchmarks')
+RUTA_ULTIMA = os.path.join(DIR_BENCHMARKS, 'ultima.json')
+RUTA_BASE = os.path.join(DIR_BENCHMARKS, 'linea_base.json')
+
+TAMANOS = (4162, 100_000, 1_000_000)
+# openpyxl escribe y lee el Excel fila por fila: por encima de este tamaño
+# (y del límite de 1.048.576 filas de Excel) no se mide la ingesta de Excel
+MAX_FILAS_EXCEL = 200_000
+
+# Regresión: más de un 20% más lento o con más memoria que la línea base
+UMBRAL_REGRESION = 0.20
+
+
+# ============= DATOS SINTÉTICOS =============
+def datos_sinteticos(df_real, n_filas, semilla=0):
+    """
+    Roturas sintéticas con el rango de fechas y el número de barrios del
+    histórico real (``GeneradorIncidencias``); devuelve un DataFrame con el
+    esquema de ``cargar_incidencias``, ordenado por fecha.
+    """
+    if n_filas == len(df_real):
+        return df_real
+    fechas = df_real['Fecha de Creación']
+    return GeneradorIncidencias(
+        n_barrios=df_real['Barrio'].nunique(), n_distritos=df_real['Distrito'].nunique(),
+        inicio=fechas.min(), fin=fechas.max(), semilla=semilla,
+    ).dataframe(n_filas)
+
+
+# ============= MEDICIÓN =============
+def _pico_tracemalloc(funcion):
+    """Pico de memoria (bytes) de ``funcion()`` según tracemalloc (solo reservas de Python)"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        funcion()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _pico_rss(funcion):
+    """
+    Aumento del RSS máximo (bytes) al ejecutar ``funcion()`` en un proceso
+    hijo creado con fork. El hijo parte con el RSS actual del padre como
+    máximo, así que la diferencia es lo que agrega la función.
+    """
+    import resource
+
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    unidad = 1 if sys.platform == 'darwin' else 1024
+    lector, escritor = multiprocessing.Pipe(duplex=False)
+
+    def hijo():
+        antes = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        funcion()
+        escritor.send((resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - antes) * unidad)
+
+    gc.collect()
+    proceso = multiprocessing.get_context('fork').Process(target=hijo)
+    proceso.start()
+    # Sin el extremo de escritura en el padre, recv termina (EOFError) si el hijo falla
+    escritor.close()
+    try:
+        pico = lector.recv()
+    except EOFError:
+        pico = None
+    proceso.join()
+    if proceso.exitcode != 0 or pico is None:
+        raise RuntimeError(f"La medición de memoria terminó con código {proceso.exitcode}")
+    return pico
+
+
+def medir(funcion, repeticiones=3):
+    """
+    Mediana y mínimo de tiempo de ``funcion()`` y su pico de memoria (MB).
+
+    Una primera corrida sirve de calentamiento (importaciones perezosas,
+    fuentes de reportlab, cachés de pandas); la de memoria se hace después,
+    en un proceso hijo que hereda ese estado.
+    """
+    funcion()
+    if 'fork' in multiprocessing.get_all_start_methods():
+        pico, memoria = _pico_rss(funcion), 'rss'
+    else:
+        pico, memoria = _pico_tracemalloc(funcion), 'tracemalloc'
+
+    tiempos = []
+    for _ in range(repeticiones):
+        gc.collect()
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return {
+        'segundos': float(np.median(tiempos)),
+        'segundos_min': float(np.min(tiempos)),
+        'repeticiones': repeticiones,
+        'pico_mb': pico / 2 ** 20,
+        'memoria': memoria,
+    }
+
+
+# ============= BENCHMARKS =============
+def _preparar_excel(df, directorio):
+    """Escribe el conjunto en un Excel temporal con las columnas del original"""
+    ruta = os.path.join(directorio, f"incidencias_{len(df)}.xlsx")
+    df[['Fecha de Creación', 'Distrito', 'Barrio']].to_excel(ruta, index=False)
+    return ruta
+
+
+def _preparar_cache(df, directorio):
+    """Deja una caché Parquet vigente para un archivo fuente ficticio"""
+    from datos import _guardar_meta, huella_archivo, rutas_cache
+
+    ruta = os.path.join(directorio, f"fuente_{len(df)}.xlsx")
+    with open(ruta, 'wb') as f:
+        f.write(str(len(df)).encode())
+    dir_cache = os.path.join(directorio, 'cache')
+    os.makedirs(dir_cache, exist_ok=True)
+    ruta_parquet, ruta_meta = rutas_cache(ruta, dir_cache)
+    df.to_parquet(ruta_parquet, index=False)
+    _guardar_meta(ruta_meta, {**huella_archivo(ruta), 'filas': len(df)})
+    return ruta, dir_cache
+
+
+def _consultas_pestanas(cubo):
+    """Lo que calculan las pestañas del dashboard en una ejecución completa"""
+    cubo.total()
+    cubo.serie_mensual()['Num_Roturas'].mean()
+    [f"{nombre_mes(m.month)} {m.year}" for m in cubo.ultimos_meses(12)]
+    for pos in [None] + list(range(len(cubo.meses))):
+        cubo.conteo_barrios(pos).head(15)
+        cubo.total(pos)
+    dia_hora = cubo.dia_hora()
+    dia_hora.sum(axis=0), dia_hora.sum(axis=1)
+
+
+def benchmarks_datos(df, directorio, nombres, repeticiones):
+    """Benchmarks que escalan con el número de filas"""
+    from agregados import construir_cubo
+    from datos import cargar_excel
+    from pronostico import cargar_artefacto, pronosticar, RUTA_ARTEFACTO
+    from reportes import generar_pdf_reporte, preparar_datos_reporte
+
+    resultados = {}
+    if 'ingesta_excel' in nombres and len(df) <= MAX_FILAS_EXCEL:
+        ruta = _preparar_excel(df, directorio)
+        resultados['ingesta_excel'] = medir(lambda: cargar_excel(ruta), max(1, repeticiones // 2))
+    if 'ingesta_cache' in nombres:
+        ruta, dir_cache = _preparar_cache(df, directorio)
+        resultados['ingesta_cache'] = medir(lambda: cargar_incidencias(ruta, dir_cache), repeticiones)
+    if 'ingesta_agregada' in nombres:
+        from datos import rutas_cache
+        from ingesta import ingerir
+
+        ruta, dir_cache = _preparar_cache(df, directorio)
+        ruta_parquet, _ = rutas_cache(ruta, dir_cache)
+        resultados['ingesta_agregada'] = medir(lambda: ingerir(ruta_parquet, modo='agregado'), repeticiones)
+
+    cubo = construir_cubo(df)
+    if 'cubo' in nombres:
+        resultados['cubo'] = medir(lambda: construir_cubo(df), repeticiones)
+    if 'pestanas' in nombres:
+        resultados['pestanas'] = medir(lambda: _consultas_pestanas(cubo), repeticiones)
+    if 'reporte_pdf' in nombres:
+        df_pred = pronosticar(cargar_artefacto(RUTA_ARTEFACTO), 6)
+        resultados['reporte_pdf'] = medir(
+            lambda: generar_pdf_reporte(preparar_datos_reporte(cubo, df_pred, None, 6)), repeticiones)
+    return resultados
+
+
+def benchmarks_modelos(df, directorio, nombres, repeticiones):
+    """Benchmarks de ajuste: dependen de la serie mensual, no del número de filas"""
+    from busqueda_grid import busqueda_grid
+    from cache_ajustes import CacheAjustes
+    from datos import serie_mensual
+    from pronostico import ajustar_modelo, extraer_artefacto
+    from seleccion_orden import seleccionar_orden
+    from simulacion import Simulacion
+    from validacion import backtest
+
+    serie = serie_mensual(df)['Num_Roturas']
+    sin_cache = CacheAjustes(habilitada=False)
+    resultados = {}
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        if 'sarimax' in nombres:
+            resultados['sarimax'] = medir(lambda: ajustar_modelo(serie, cache=sin_cache), repeticiones)
+        if 'simulacion' in nombres:
+            artefacto = extraer_artefacto(ajustar_modelo(serie), serie)
+            resultados['simulacion'] = medir(lambda: Simulacion.desde_artefacto(artefacto), repeticiones)
+        if 'grid_search' in nombres:
+            train, test = serie[:-6], serie[-6:]
+            almacen = os.path.join(directorio, 'grid.jsonl')
+
+            def grid_en_frio():
+                # Sin almacén previo: cada corrida ajusta las 140 configuraciones
+                if os.path.exists(almacen):
+                    os.remove(almacen)
+                busqueda_grid(train, test, ruta_almacen=almacen)
+            resultados['grid_search'] = medir(grid_en_frio, 1)
+        if 'validacion' in nombres:
+            resultados['validacion'] = medir(lambda: backtest(serie, cache=sin_cache), repeticiones)
+        if 'validacion_cache' in nombres:
+            cache = CacheAjustes(os.path.join(directorio, 'ajustes'))
+            backtest(serie, cache=cache)
+            resultados['validacion_cache'] = medir(lambda: backtest(serie, cache=cache), repeticiones)
+        if 'seleccion' in nombres:
+            resultados['seleccion'] = medir(lambda: seleccionar_orden(serie[:-6], cache=sin_cache), 1)
+    return resultados
+
+
+BENCHMARKS_DATOS = ('ingesta_excel', 'ingesta_cache', 'ingesta_agregada', 'cubo', 'pestanas', 'reporte_pdf')
+BENCHMARKS_MODELOS = ('sarimax', 'simulacion', 'grid_search', 'validacion', 'validacion_cache', 'seleccion')
+BENCHMARKS = BENCHMARKS_DATOS + BENCHMARKS_MODELOS
+
+
+def correr(tamanos=TAMANOS, nombres=BENCHMARKS, repeticiones=3, ruta_excel=RUTA_EXCEL, progreso=print):
+    """Ejecuta la suite y devuelve el dict de resultados (meta + filas)"""
+    df_real = cargar_incidencias(ruta_excel)
+    filas = []
+    directorio = tempfile.mkdtemp(prefix='benchmarks_')
+    try:
+        for tamano in tamanos:
+            df = datos_sinteticos(df_real, tamano)
+            for nombre, r in benchmarks_datos(df, directorio, nombres, repeticiones).items():
+                filas.append({'benchmark': nombre, 'tamano': tamano, **r})
+                progreso(f"  {nombre:<16} {tamano:>11,} filas  {r['segundos']:9.4f} s  {r['pico_mb']:9.1f} MB")
+            del df
+            gc.collect()
+        for nombre, r in benchmarks_modelos(df_real, directorio, nombres, repeticiones).items():
+            filas.append({'benchmark': nombre, 'tamano': len(df_real), **r})
+            progreso(f"  {nombre:<16} {len(df_real):>11,} filas  {r['segundos']:9.4f} s  {r['pico_mb']:9.1f} MB")
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    return {
+        'meta': {
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'python': sys.version.split()[0],
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'plataforma': platform.platform(),
+            'nucleos': os.cpu_count(),
+        },
+        'resultados': filas,
+    }
+
+
+# ============= COMPARACIÓN =============
+def comparar(base, actual, umbral=UMBRAL_REGRESION):
+    """
+    Compara dos corridas por (benchmark, tamaño).
+
+    Devuelve un DataFrame con los cocientes actual/base de tiempo y memoria
+    y una columna ``regresion`` cuando alguno supera 1 + umbral. La memoria
+    solo se compara si ambas corridas la midieron igual (RSS o tracemalloc;
+    las corridas sin ``memoria`` son de tracemalloc).
+    """
+    def indexar(corrida):
+        return {(r['benchmark'], r['tamano']): r for r in corrida['resultados']}
+
+    b, a = indexar(base), indexar(actual)
+    filas = []
+    for clave in sorted(set(b) & set(a)):
+        rb, ra = b[clave], a[clave]
+        razon_tiempo = ra['segundos'] / rb['segundos'] if rb['segundos'] > 0 else np.nan
+        misma_medida = ra.get('memoria', 'tracemalloc') == rb.get('memoria', 'tracemalloc')
+        razon_memoria = ra['pico_mb'] / rb['pico_mb'] if misma_medida and rb['pico_mb'] > 0 else np.nan
+        filas.append({
+            'benchmark': clave[0],
+            'tamano': clave[1],
+            'segundos_base': rb['segundos'],
+            'segundos': ra['segundos'],
+            'razon_tiempo': razon_tiempo,
+            'razon_memoria': razon_memoria,
+            'regresion': bool(razon_tiempo > 1 + umbral or razon_memoria > 1 + umbral),
+        })
+    return pd.DataFrame(filas)
+
+
+def _guardar(resultados, ruta):
+    directorio = os.path.dirname(ruta)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump(resultados, f, indent=2, ensure_ascii=False)
+
+
+def _leer(ruta):
+    with open(ruta, encoding='utf-8') as f:
+        return json.load(f)
+
+
+# ============= CLI =============
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de ingesta, agregación, ajuste y reportes")
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    p_correr = sub.add_parser('correr', help="Ejecutar la suite")
+    p_correr.add_argument('--ruta', default=RUTA_EXCEL, help="Archivo Excel de origen")
+    p_correr.add_argument('--tamanos', type=int, nargs='+', default=list(TAMANOS), help="Filas por corrida")
+    p_correr.add_argument('--solo', nargs='+', choices=BENCHMARKS, default=list(BENCHMARKS),
+                          help="Benchmarks a ejecutar")
+    p_correr.add_argument('--repeticiones', type=int, default=3, help="Repeticiones por medición")
+    p_correr.add_argument('--salida', default=RUTA_ULTIMA, help="Archivo JSON de resultados")
+    p_correr.add_argument('--guardar-base', action='store_true', help="Guardar también como línea base")
+
+    p_comparar = sub.add_parser('comparar', help="Comparar una corrida con la línea base")
+    p_comparar.add_argument('actual', nargs='?', default=RUTA_ULTIMA, help="JSON de la corrida a evaluar")
+    p_comparar.add_argument('--base', default=RUTA_BASE, help="JSON de la línea base")
+    p_comparar.add_argument('--umbral', type=float, default=UMBRAL_REGRESION,
+                            help="Aumento relativo tolerado (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    if args.comando == 'correr':
+        print(f"⏱️ BENCHMARKS: {', '.join(args.solo)}")
+        resultados = correr(args.tamanos, args.solo, args.repeticiones, args.ruta)
+        _guardar(resultados, args.salida)
+        print(f"\n✅ Resultados guardados en: {args.salida}")
+        if args.guardar_base:
+            _guardar(resultados, RUTA_BASE)
+            print(f"   Línea base actualizada: {RUTA_BASE}")
+        return 0
+
+    df = comparar(_leer(args.base), _leer(args.actual), args.umbral)
+    if df.empty:
+        print("⚠️ Las corridas no tienen benchmarks en común")
+        return 1
+    for _, r in df.iterrows():
+        marca = '❌' if r['regresion'] else '✅'
+        print(f"{marca} {r['benchmark']:<16} {r['tamano']:>11,} filas  "
+              f"{r['segundos_base']:9.4f} s → {r['segundos']:9.4f} s  "
+              f"(tiempo ×{r['razon_tiempo']:.2f}, memoria ×{r['razon_memoria']:.2f})")
+    regresiones = int(df['regresion'].sum())
+    print(f"\n{regresiones} regresiones (umbral {args.umbral:.0%})")
+    return 1 if regresiones else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,276 @@
+"""
+🔍 Grid Search SARIMA en Paralelo - Predicción de Roturas en Red de Gas
+Universidad Tecnológica de Bolívar
+
+Versión reutilizable del grid search del notebook (celda 12):
+- Reparte los ajustes de SARIMAX entre un pool de procesos.
+- Cada ajuste tiene un presupuesto de tiempo; se abandonan los que lo
+  agotan o no convergen.
+- Cada resultado (order, seasonal_order) se agrega a un almacén JSONL en
+  disco, de modo que una búsqueda interrumpida continúa donde quedó.
+
+Los resultados se indexan por la huella de la serie. Al volver a ejecutar con
+la misma serie no se reajusta nada; si la serie cambió (p. ej. llegó un mes
+nuevo) cada configuración arranca desde los parámetros que obtuvo en la
+corrida anterior, lo que reduce las iteraciones necesarias.
+
+Uso desde la línea de comandos:
+
+    python busqueda_grid.py                  # todos los núcleos disponibles
+    python busqueda_grid.py --workers 4 --presupuesto 30
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import product
+
+import numpy as np
+import pandas as pd
+
+from cache_ajustes import versiones_bibliotecas
+
+RUTA_ALMACEN = os.path.join('.cache', 'busqueda_grid.jsonl')
+
+
+class PresupuestoAgotado(Exception):
+    """El ajuste superó el tiempo asignado por modelo"""
+
+
+# ============= CONFIGURACIONES =============
+def generar_combinaciones(p_values=(0, 1, 2), d_values=(0, 1), q_values=(0, 1, 2),
+                          P_values=(0, 1), D_values=(0, 1), Q_values=(0, 1), s=12):
+    """Combinaciones válidas del notebook: sin modelos vacíos ni d + D > 2"""
+    combinaciones = []
+    for p, d, q in product(p_values, d_values, q_values):
+        for P, D, Q in product(P_values, D_values, Q_values):
+            if (p + q + P + Q) == 0:  # Evitar modelos sin componentes
+                continue
+            if (d + D) > 2:  # Evitar sobre-diferenciación
+                continue
+            combinaciones.append(((p, d, q), (P, D, Q, s)))
+    return combinaciones
+
+
+def huella_serie(train, test, maxiter):
+    """Huella de los datos, del criterio de ajuste y de las bibliotecas que definen un resultado"""
+    h = hashlib.sha256()
+    h.update(json.dumps(versiones_bibliotecas(), sort_keys=True).encode())
+    h.update(str(train.index[0]).encode())
+    h.update(np.asarray(train, dtype=float).tobytes())
+    h.update(np.asarray(test, dtype=float).tobytes())
+    h.update(str(maxiter).encode())
+    return h.hexdigest()[:16]
+
+
+def _clave(order, seasonal_order):
+    return f"{tuple(order)}{tuple(seasonal_order)}"
+
+
+# ============= MÉTRICAS =============
+def calcular_mape(real, pred, valor_sin_datos=999):
+    """MAPE robusto del notebook (ignora los meses con cero roturas)"""
+    real = np.asarray(real, dtype=float)
+    pred = np.asarray(pred, dtype=float)
+    mask = real != 0
+    if mask.sum() == 0:
+        return valor_sin_datos
+    return float(np.mean(np.abs((real[mask] - pred[mask]) / real[mask])) * 100)
+
+
+# ============= TRABAJADOR =============
+_train = None
+_test = None
+
+
+def limitar_hilos_blas():
+    """Un hilo de BLAS por proceso, para que el pool escale con los núcleos"""
+    warnings.filterwarnings('ignore')
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(1)
+    except ImportError:
+        pass
+
+
+def _inicializar_trabajador(train, test):
+    """Recibe la serie una sola vez por proceso y fija BLAS a un hilo"""
+    global _train, _test
+    _train, _test = train, test
+    limitar_hilos_blas()
+
+
+def ajustar_configuracion(order, seasonal_order, maxiter=100, presupuesto_s=60,
+                          start_params=None, train=None, test=None):
+    """
+    Ajusta una configuración y devuelve un registro serializable.
+
+    El estado es 'ok', 'no_converge', 'tiempo_agotado' o 'error'; solo los
+    registros 'ok' traen métricas.
+    """
+    from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+    train = _train if train is None else train
+    test = _test if test is None else test
+    registro = {'order': list(order), 'seasonal_order': list(seasonal_order)}
+    inicio = time.perf_counter()
+
+    def vigilar_tiempo(_params):
+        if time.perf_counter() - inicio > presupuesto_s:
+            raise PresupuestoAgotado()
+
+    try:
+        modelo = SARIMAX(train, order=order, seasonal_order=seasonal_order)
+        if start_params is not None and len(start_params) != len(modelo.start_params):
+            start_params = None
+        resultado = modelo.fit(disp=False, maxiter=maxiter, start_params=start_params,
+                               callback=vigilar_tiempo)
+    except PresupuestoAgotado:
+        registro['estado'] = 'tiempo_agotado'
+    except Exception as e:
+        registro['estado'] = 'error'
+        registro['error'] = f"{type(e).__name__}: {e}"
+    else:
+        registro['params'] = [float(v) for v in resultado.params]
+        if not resultado.mle_retvals.get('converged', True):
+            registro['estado'] = 'no_converge'
+        else:
+            pred = resultado.forecast(steps=len(test))
+            registro.update({
+                'estado': 'ok',
+                'MAE': float(np.mean(np.abs(np.asarray(test) - np.asarray(pred)))),
+                'MAPE': calcular_mape(test, pred),
+                'AIC': float(resultado.aic),
+            })
+
+    registro['segundos'] = round(time.perf_counter() - inicio, 3)
+    return registro
+
+
+# ============= ALMACÉN DE RESULTADOS =============
+def leer_almacen(ruta=RUTA_ALMACEN):
+    """Lee todos los registros válidos (ignora una última línea truncada)"""
+    registros = []
+    if not os.path.exists(ruta):
+        return registros
+    with open(ruta, encoding='utf-8') as f:
+        for linea in f:
+            try:
+                registros.append(json.loads(linea))
+            except ValueError:
+                continue
+    return registros
+
+
+def _agregar_registro(archivo, registro):
+    archivo.write(json.dumps(registro, ensure_ascii=False) + '\n')
+    archivo.flush()
+    os.fsync(archivo.fileno())
+
+
+# ============= BÚSQUEDA =============
+def busqueda_grid(train, test, combinaciones=None, max_workers=None, presupuesto_s=60,
+                  maxiter=100, ruta_almacen=RUTA_ALMACEN, progreso=None):
+    """
+    Evalúa las combinaciones SARIMA en paralelo y devuelve un DataFrame con
+    una fila por configuración (order, seasonal, estado, MAE, MAPE, AIC).
+
+    Las configuraciones que ya están en el almacén para esta misma serie no se
+    vuelven a ajustar. ``progreso(hechos, total)`` se llama al terminar cada
+    ajuste nuevo.
+    """
+    combinaciones = combinaciones or generar_combinaciones()
+    huella = huella_serie(train, test, maxiter)
+
+    previos = leer_almacen(ruta_almacen)
+    hechos = {_clave(r['order'], r['seasonal_order']): r
+              for r in previos if r.get('huella') == huella}
+    # Parámetros de corridas anteriores con otra serie para arrancar en caliente
+    semillas = {_clave(r['order'], r['seasonal_order']): r['params']
+                for r in previos if 'params' in r}
+
+    pendientes = [(o, so) for o, so in combinaciones if _clave(o, so) not in hechos]
+
+    if pendientes:
+        directorio = os.path.dirname(ruta_almacen)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        with open(ruta_almacen, 'a', encoding='utf-8') as archivo, \
+                ProcessPoolExecutor(max_workers=max_workers, initializer=_inicializar_trabajador,
+                                    initargs=(train, test)) as pool:
+            futuros = [
+                pool.submit(ajustar_configuracion, o, so, maxiter, presupuesto_s,
+                            semillas.get(_clave(o, so)))
+                for o, so in pendientes
+            ]
+            for i, futuro in enumerate(as_completed(futuros), 1):
+                registro = futuro.result()
+                registro['huella'] = huella
+                _agregar_registro(archivo, registro)
+                hechos[_clave(registro['order'], registro['seasonal_order'])] = registro
+                if progreso is not None:
+                    progreso(i, len(pendientes))
+
+    filas = []
+    for o, so in combinaciones:
+        r = hechos[_clave(o, so)]
+        filas.append({
+            'order': tuple(r['order']),
+            'seasonal': tuple(r['seasonal_order']),
+            'estado': r['estado'],
+            'MAE': r.get('MAE', np.nan),
+            'MAPE': r.get('MAPE', np.nan),
+            'AIC': r.get('AIC', np.nan),
+            'segundos': r.get('segundos', np.nan),
+        })
+    return pd.DataFrame(filas)
+
+
+def mejor_configuracion(df_resultados, criterio='AIC'):
+    """Fila del mejor modelo convergido según el criterio (AIC por defecto)"""
+    validos = df_resultados[df_resultados['estado'] == 'ok']
+    return validos.loc[validos[criterio].idxmin()]
+
+
+# ============= CLI =============
+def main(argv=None):
+    from datos import RUTA_EXCEL, cargar_incidencias, serie_mensual
+
+    parser = argparse.ArgumentParser(description="Grid search SARIMA en paralelo y reanudable")
+    parser.add_argument('--ruta', default=RUTA_EXCEL, help="Archivo Excel de origen")
+    parser.add_argument('--workers', type=int, default=None, help="Procesos (por defecto, todos los núcleos)")
+    parser.add_argument('--presupuesto', type=float, default=60, help="Segundos máximos por modelo")
+    parser.add_argument('--maxiter', type=int, default=100, help="Iteraciones máximas del optimizador")
+    parser.add_argument('--test', type=int, default=6, help="Meses reservados para test")
+    parser.add_argument('--almacen', default=RUTA_ALMACEN, help="Archivo JSONL de resultados")
+    args = parser.parse_args(argv)
+
+    serie = serie_mensual(cargar_incidencias(args.ruta))['Num_Roturas']
+    train, test = serie[:-args.test], serie[-args.test:]
+    combinaciones = generar_combinaciones()
+
+    print(f"🔍 GRID SEARCH: {len(combinaciones)} configuraciones SARIMA")
+    inicio = time.perf_counter()
+    df_resultados = busqueda_grid(
+        train, test, combinaciones, max_workers=args.workers, presupuesto_s=args.presupuesto,
+        maxiter=args.maxiter, ruta_almacen=args.almacen,
+        progreso=lambda i, n: print(f"  Progreso: {i}/{n}...") if i % 20 == 0 or i == n else None,
+    )
+
+    print(f"\n✅ {(df_resultados['estado'] == 'ok').sum()} modelos convergieron "
+          f"({time.perf_counter() - inicio:.1f} s)")
+    print(df_resultados['estado'].value_counts().to_string())
+
+    print("\n🏆 TOP 5 MODELOS (por AIC):")
+    top_5 = df_resultados[df_resultados['estado'] == 'ok'].nsmallest(5, 'AIC')
+    for idx, (_, row) in enumerate(top_5.iterrows(), 1):
+        print(f"{idx}. SARIMA{row['order']}{row['seasonal']} | MAE={row['MAE']:.2f} | AIC={row['AIC']:.2f}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,245 @@
+"""
+🗃️ Caché de Ajustes en Disco - Predicción de Roturas en Red de Gas
+Universidad Tecnológica de Bolívar
+
+Guarda el resultado de cada ajuste SARIMA bajo una clave derivada de su
+contenido: hash de la serie mensual (valores y primer mes), órdenes del
+modelo, transformación (log1p o ninguna), opciones del ajuste y versiones de
+statsmodels, numpy y scipy. Si cambia cualquiera de ellos la clave cambia,
+así que una entrada nunca se invalida: solo deja de usarse.
+
+Cada entrada es un ``.npz`` con arreglos (parámetros, pronósticos) y un JSON
+de metadatos (AIC, convergencia, métricas del backtest). Al guardar se
+desalojan las entradas usadas hace más tiempo hasta quedar dentro del
+presupuesto de disco; cada acierto renueva la fecha de uso del archivo.
+
+Se configura con variables de entorno:
+
+    AJUSTES_CACHE=0          desactiva la caché
+    AJUSTES_CACHE_MB=256     presupuesto de disco en MB
+    AJUSTES_CACHE_DIR=...    directorio (por defecto, .cache/ajustes)
+
+Uso desde la línea de comandos:
+
+    python cache_ajustes.py              # entradas, tamaño y presupuesto
+    python cache_ajustes.py --vaciar     # borra todas las entradas
+"""
+
+import argparse
+import functools
+import hashlib
+import json
+import os
+import threading
+import zipfile
+from importlib import metadata
+
+import numpy as np
+
+from datos import DIR_CACHE
+
+DIR_AJUSTES = os.path.join(DIR_CACHE, 'ajustes')
+PRESUPUESTO_MB = 256
+
+# Versión del formato de las entradas: incrementar si cambia lo que se guarda
+VERSION_AJUSTES = 1
+
+# Al desalojar se baja hasta esta fracción del presupuesto, para no desalojar
+# en cada escritura cuando la caché está llena
+FRACCION_DESALOJO = 0.9
+
+BIBLIOTECAS = ('statsmodels', 'numpy', 'scipy')
+
+
+@functools.lru_cache(maxsize=None)
+def versiones_bibliotecas():
+    """Versiones instaladas de las bibliotecas que determinan el resultado de un ajuste"""
+    versiones = {}
+    for nombre in BIBLIOTECAS:
+        try:
+            versiones[nombre] = metadata.version(nombre)
+        except metadata.PackageNotFoundError:
+            versiones[nombre] = None
+    return versiones
+
+
+def clave_ajuste(serie, order, seasonal_order, transformacion=None, **opciones):
+    """
+    Clave de contenido de un ajuste: serie (valores y primer índice),
+    órdenes, transformación, ``opciones`` que cambian el resultado (p. ej.
+    ``maxiter`` o los meses de prueba de un backtest) y versiones de las
+    bibliotecas. Los parámetros iniciales no entran: solo cambian el camino
+    del optimizador, no el óptimo.
+    """
+    h = hashlib.sha256()
+    indice = getattr(serie, 'index', None)
+    h.update(json.dumps({
+        'version': VERSION_AJUSTES,
+        'inicio': str(indice[0]) if indice is not None and len(indice) else None,
+        'order': list(order),
+        'seasonal_order': list(seasonal_order),
+        'transformacion': transformacion,
+        'opciones': opciones,
+        'bibliotecas': versiones_bibliotecas(),
+    }, sort_keys=True, default=_serializable).encode('utf-8'))
+    h.update(np.ascontiguousarray(serie, dtype=float).tobytes())
+    return h.hexdigest()[:32]
+
+
+def _serializable(valor):
+    if isinstance(valor, np.ndarray):
+        return hashlib.sha256(np.ascontiguousarray(valor, dtype=float).tobytes()).hexdigest()
+    if isinstance(valor, np.generic):
+        return valor.item()
+    return str(valor)
+
+
+def _activado(valor):
+    return (valor or '1').strip().lower() not in ('0', 'false', 'no', 'off')
+
+
+# ============= CACHÉ =============
+class CacheAjustes:
+    """
+    Entradas ``{'meta': dict, <nombre>: ndarray, ...}`` en disco con
+    desalojo LRU por tamaño. Es segura entre procesos: cada entrada se
+    escribe en un temporal y se renombra, y un archivo que desaparece por un
+    desalojo concurrente cuenta como fallo.
+    """
+
+    def __init__(self, directorio=DIR_AJUSTES, presupuesto_mb=PRESUPUESTO_MB, habilitada=True):
+        self.directorio = directorio
+        self.presupuesto = int(presupuesto_mb * 2 ** 20)
+        self.habilitada = habilitada
+        self.aciertos = 0
+        self.fallos = 0
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Se envía a los procesos del pool sin el lock ni los contadores
+        return {'directorio': self.directorio, 'presupuesto': self.presupuesto, 'habilitada': self.habilitada}
+
+    def __setstate__(self, estado):
+        self.__dict__.update(estado, aciertos=0, fallos=0, _lock=threading.Lock())
+
+    @classmethod
+    def desde_entorno(cls, entorno=None):
+        """Crea la caché según las variables ``AJUSTES_CACHE*``"""
+        entorno = os.environ if entorno is None else entorno
+        return cls(
+            directorio=entorno.get('AJUSTES_CACHE_DIR') or DIR_AJUSTES,
+            presupuesto_mb=float(entorno.get('AJUSTES_CACHE_MB') or PRESUPUESTO_MB),
+            habilitada=_activado(entorno.get('AJUSTES_CACHE')),
+        )
+
+    def _ruta(self, clave):
+        return os.path.join(self.directorio, f"{clave}.npz")
+
+    def obtener(self, clave):
+        """Entrada guardada con ``clave`` o None; un acierto renueva su fecha de uso"""
+        if not self.habilitada:
+            return None
+        ruta = self._ruta(clave)
+        try:
+            with np.load(ruta, allow_pickle=False) as datos_npz:
+                entrada = {k: datos_npz[k] for k in datos_npz.files if k != 'meta'}
+                entrada['meta'] = json.loads(str(datos_npz['meta']))
+            os.utime(ruta)
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            with self._lock:
+                self.fallos += 1
+            return None
+        with self._lock:
+            self.aciertos += 1
+        return entrada
+
+    def guardar(self, clave, entrada):
+        """Escribe la entrada y desaloja las menos usadas si se excede el presupuesto"""
+        if not self.habilitada:
+            return
+        os.makedirs(self.directorio, exist_ok=True)
+        ruta = self._ruta(clave)
+        arreglos = {k: np.asarray(v) for k, v in entrada.items() if k != 'meta'}
+        temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp.npz"
+        try:
+            np.savez(temporal, meta=np.array(json.dumps(entrada.get('meta', {}), default=_serializable)),
+                     **arreglos)
+            os.replace(temporal, ruta)
+        finally:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+        self.desalojar()
+
+    def _entradas(self):
+        """(última fecha de uso, bytes, ruta) de cada entrada"""
+        entradas = []
+        try:
+            archivos = list(os.scandir(self.directorio))
+        except FileNotFoundError:
+            return entradas
+        for archivo in archivos:
+            if not archivo.name.endswith('.npz') or archivo.name.endswith('.tmp.npz'):
+                continue
+            try:
+                info = archivo.stat()
+            except FileNotFoundError:
+                continue
+            entradas.append((info.st_mtime_ns, info.st_size, archivo.path))
+        return entradas
+
+    def desalojar(self):
+        """Borra las entradas usadas hace más tiempo hasta quedar bajo el presupuesto"""
+        entradas = self._entradas()
+        total = sum(tamano for _, tamano, _ in entradas)
+        if total <= self.presupuesto:
+            return 0
+        objetivo = self.presupuesto * FRACCION_DESALOJO
+        borradas = 0
+        for _, tamano, ruta in sorted(entradas):
+            if total <= objetivo:
+                break
+            try:
+                os.remove(ruta)
+            except FileNotFoundError:
+                pass
+            total -= tamano
+            borradas += 1
+        return borradas
+
+    def vaciar(self):
+        """Borra todas las entradas"""
+        for _, _, ruta in self._entradas():
+            try:
+                os.remove(ruta)
+            except FileNotFoundError:
+                pass
+
+    def estadisticas(self):
+        entradas = self._entradas()
+        return {'entradas': len(entradas), 'bytes': sum(t for _, t, _ in entradas),
+                'presupuesto': self.presupuesto, 'aciertos': self.aciertos, 'fallos': self.fallos}
+
+
+# Caché por defecto del proceso
+cache_ajustes = CacheAjustes.desde_entorno()
+
+
+# ============= CLI =============
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Estado de la caché de ajustes SARIMA")
+    parser.add_argument('--vaciar', action='store_true', help="Borrar todas las entradas")
+    args = parser.parse_args(argv)
+
+    if args.vaciar:
+        cache_ajustes.vaciar()
+        print(f"🗑️ Caché vaciada: {cache_ajustes.directorio}")
+    e = cache_ajustes.estadisticas()
+    print(f"🗃️ {e['entradas']:,} ajustes en {cache_ajustes.directorio} "
+          f"({e['bytes'] / 2 ** 20:.1f} de {e['presupuesto'] / 2 ** 20:.0f} MB)")
+    versiones = ', '.join(f"{k} {v}" for k, v in versiones_bibliotecas().items())
+    print(f"   Bibliotecas en la clave: {versiones}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,157 @@
+"""
+🚦 Prueba de Carga de la API - Predicción de Roturas en Red de Gas
+Universidad Tecnológica de Bolívar
+
+Arnés local para medir la latencia y el rendimiento de ``api.py``:
+- Levanta la API en un subproceso (o usa una ya en marcha con ``--url``).
+- Calienta la caché con cada consulta de la mezcla y luego la repite desde
+  varios clientes con conexiones persistentes durante ``--segundos``.
+- Informa peticiones por segundo y percentiles p50/p95/p99 por ruta.
+
+Uso desde la línea de comandos:
+
+    python carga_api.py                          # 10 s, 4 clientes
+    python carga_api.py --clientes 8 --segundos 30
+    python carga_api.py --url http://127.0.0.1:8600
+"""
+
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from api import PUERTO
+
+# Mezcla de consultas de despacho y GIS
+CONSULTAS = [
+    '/forecast?horizon=6&level=total',
+    '/forecast?horizon=12&level=total',
+    '/forecast?horizon=3&level=barrio',
+    '/forecast?horizon=6&level=distrito',
+    '/barrios/top?n=10',
+    '/barrios/top?n=5&month=2025-07',
+    '/barrios/top?n=15&month=2024-12',
+    '/patterns/hourly',
+    '/patterns/hourly?month=2025-06',
+]
+
+
+def _esperar_servicio(host, puerto, timeout=120):
+    limite = time.perf_counter() + timeout
+    while time.perf_counter() < limite:
+        try:
+            conexion = http.client.HTTPConnection(host, puerto, timeout=2)
+            conexion.request('GET', '/health')
+            if conexion.getresponse().status == 200:
+                conexion.close()
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise TimeoutError(f"La API no respondió en {host}:{puerto}")
+
+
+def _cliente(host, puerto, consultas, fin, desfase, resultados):
+    """Repite la mezcla de consultas hasta ``fin`` y anota (ruta, segundos)"""
+    conexion = http.client.HTTPConnection(host, puerto, timeout=10)
+    i = desfase
+    medidas = []
+    while time.perf_counter() < fin:
+        consulta = consultas[i % len(consultas)]
+        inicio = time.perf_counter()
+        conexion.request('GET', consulta)
+        respuesta = conexion.getresponse()
+        respuesta.read()
+        medidas.append((consulta, time.perf_counter() - inicio, respuesta.status))
+        i += 1
+    conexion.close()
+    resultados.extend(medidas)
+
+
+def prueba_carga(host, puerto, consultas=CONSULTAS, clientes=4, segundos=10):
+    """Ejecuta la prueba y devuelve un dict con el resumen"""
+    # Calentamiento: la primera consulta de cada tipo llena la caché
+    conexion = http.client.HTTPConnection(host, puerto, timeout=30)
+    for consulta in consultas:
+        conexion.request('GET', consulta)
+        respuesta = conexion.getresponse()
+        respuesta.read()
+        if respuesta.status != 200:
+            raise RuntimeError(f"{consulta} respondió {respuesta.status}")
+    conexion.close()
+
+    resultados = []
+    fin = time.perf_counter() + segundos
+    hilos = [threading.Thread(target=_cliente, args=(host, puerto, consultas, fin, k, resultados))
+             for k in range(clientes)]
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    duracion = time.perf_counter() - inicio
+
+    latencias = np.array([r[1] for r in resultados]) * 1000
+    resumen = {
+        'peticiones': len(resultados),
+        'errores': sum(1 for r in resultados if r[2] != 200),
+        'rps': len(resultados) / duracion,
+        'p50_ms': float(np.percentile(latencias, 50)),
+        'p95_ms': float(np.percentile(latencias, 95)),
+        'p99_ms': float(np.percentile(latencias, 99)),
+        'por_ruta': {},
+    }
+    for consulta in consultas:
+        lat = np.array([r[1] for r in resultados if r[0] == consulta]) * 1000
+        if len(lat):
+            resumen['por_ruta'][consulta] = {'n': int(len(lat)),
+                                             'p50_ms': float(np.percentile(lat, 50)),
+                                             'p99_ms': float(np.percentile(lat, 99))}
+    return resumen
+
+
+# ============= CLI =============
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de carga local de la API de pronósticos")
+    parser.add_argument('--url', default=None, help="API ya en marcha (por defecto se levanta una)")
+    parser.add_argument('--clientes', type=int, default=4, help="Clientes concurrentes")
+    parser.add_argument('--segundos', type=float, default=10, help="Duración de la prueba")
+    parser.add_argument('--puerto', type=int, default=PUERTO + 1, help="Puerto de la API levantada")
+    parser.add_argument('--json', default=None, help="Guardar el resumen en este archivo")
+    args = parser.parse_args(argv)
+
+    proceso = None
+    if args.url:
+        partes = urlsplit(args.url)
+        host, puerto = partes.hostname, partes.port or 80
+    else:
+        host, puerto = '127.0.0.1', args.puerto
+        proceso = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api.py'),
+                                    '--puerto', str(puerto)], stdout=subprocess.DEVNULL)
+    try:
+        _esperar_servicio(host, puerto)
+        r = prueba_carga(host, puerto, clientes=args.clientes, segundos=args.segundos)
+    finally:
+        if proceso is not None:
+            proceso.terminate()
+            proceso.wait()
+
+    print(f"✅ {r['peticiones']:,} peticiones en {args.segundos:.0f} s con {args.clientes} clientes "
+          f"({r['rps']:.0f} req/s, {r['errores']} errores)")
+    print(f"   Latencia: p50={r['p50_ms']:.2f} ms | p95={r['p95_ms']:.2f} ms | p99={r['p99_ms']:.2f} ms")
+    for consulta, m in r['por_ruta'].items():
+        print(f"   {consulta:<40} p50={m['p50_ms']:.2f} ms  p99={m['p99_ms']:.2f} ms")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(r, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,296 @@
+"""
+🗂️ Datos Compartidos entre Procesos - Predicción de Roturas en Red de Gas
+Universidad Tecnológica de Bolívar
+
+Publica una sola vez en disco el DataFrame limpio y sus agregados para que
+todos los procesos de Streamlit (y sus sesiones) los lean mapeados en
+memoria, de solo lectura y sin copia:
+- el DataFrame en un archivo Arrow IPC sin compresión; las categóricas se
+  guardan como códigos enteros y los flotantes con NaN (no como nulos) para
+  que cada columna se pueda envolver sin convertirla
+- el cubo de conteos en arreglos ``.npy`` que se abren con
+  ``np.load(mmap_mode='r')``
+
+Las páginas del archivo quedan en la caché del sistema operativo y las
+comparten todos los procesos: la memoria privada de cada trabajador no
+crece con el tamaño de los datos. El primer proceso que no encuentra una
+publicación vigente la construye (con un candado de archivo para que los
+demás esperen en lugar de repetir el trabajo); la publicación se identifica
+por ruta, tamaño y mtime del archivo fuente, y las versiones anteriores se
+borran al publicar una nueva.
+
+Uso desde la línea de comandos (p. ej. antes de levantar los trabajadores):
+
+    python compartido.py                               # publica el Excel del proyecto
+    python compartido.py --ruta 100M.parquet --modo agregado
+"""
+
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from agregados import CuboRoturas, construir_cubo
+from datos import DIR_CACHE, RUTA_EXCEL, VERSION_CACHE, cargar_incidencias, huella_archivo, huella_datos
+from ingesta import MODOS, huella_cubo, ingerir
+
+DIR_COMPARTIDO = os.path.join(DIR_CACHE, 'compartido')
+
+# Versión del formato publicado: incrementar si cambia la disposición en disco
+VERSION_COMPARTIDO = 2
+
+ARCHIVO_DATOS = 'incidencias.arrow'
+ARCHIVO_META = 'meta.json'
+ARREGLOS_CUBO = ('datos', 'indices', 'indptr', 'mes_barrio', 'mes_dia_hora')
+
+
+class DatosCompartidos:
+    """DataFrame (o None en modo agregado), cubo y huella ya publicados"""
+
+    def __init__(self, df, cubo, huella, directorio=None):
+        self.df = df
+        self.cubo = cubo
+        self.huella = huella
+        self.directorio = directorio
+
+
+# ============= ARROW =============
+def _tabla_arrow(df):
+    """DataFrame → tabla Arrow cuyas columnas se pueden volver a envolver sin copia"""
+    import pyarrow as pa
+
+    campos, columnas = [], []
+    for nombre in df.columns:
+        serie, metadatos = df[nombre], None
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            # Códigos con -1 para faltantes: un diccionario de Arrow con
+            # nulos no se puede convertir sin copia
+            columna = pa.array(serie.cat.codes.to_numpy())
+            metadatos = {'categorias': json.dumps(serie.cat.categories.tolist(), ensure_ascii=False),
+                         'ordenada': json.dumps(bool(serie.cat.ordered))}
+        elif isinstance(serie.dtype, pd.StringDtype) or serie.dtype == object:
+            columna = pa.array(serie.array, type=pa.string(), from_pandas=True)
+        else:
+            # from_pandas=False conserva los NaN como valores (sin máscara de nulos)
+            columna = pa.array(serie.to_numpy(), from_pandas=False)
+        campos.append(pa.field(nombre, columna.type, metadata=metadatos))
+        columnas.append(columna)
+    return pa.Table.from_arrays(columnas, schema=pa.schema(campos))
+
+
+def _columna_pandas(campo, columna):
+    """Columna Arrow mapeada → arreglo de pandas que apunta a la misma memoria"""
+    import pyarrow as pa
+
+    metadatos = campo.metadata or {}
+    if b'categorias' in metadatos:
+        tipo = pd.CategoricalDtype(json.loads(metadatos[b'categorias']), json.loads(metadatos[b'ordenada']))
+        return pd.Categorical.from_codes(_numpy(columna), dtype=tipo, validate=False)
+    if pa.types.is_string(campo.type):
+        return pd.arrays.ArrowStringArray(columna)
+    try:
+        return _numpy(columna)
+    except pa.ArrowInvalid:
+        # Tipos sin representación directa en numpy (p. ej. booleanos): se convierten
+        return columna.to_pandas().array
+
+
+def _numpy(columna):
+    if columna.num_chunks == 1:
+        return columna.chunk(0).to_numpy(zero_copy_only=True)
+    return columna.to_numpy()
+
+
+def _leer_arrow(ruta):
+    import pyarrow as pa
+
+    tabla = pa.ipc.open_file(pa.memory_map(ruta, 'r')).read_all()
+    return pd.DataFrame({campo.name: _columna_pandas(campo, columna)
+                         for campo, columna in zip(tabla.schema, tabla.columns)}, copy=False)
+
+
+def _escribir_arrow(df, ruta):
+    import pyarrow as pa
+
+    tabla = _tabla_arrow(df)
+    with pa.OSFile(ruta, 'wb') as archivo, pa.ipc.new_file(archivo, tabla.schema) as escritor:
+        escritor.write_table(tabla)
+
+
+# ============= PUBLICACIÓN =============
+def _directorio_publicacion(ruta, clave, dir_compartido):
+    """``<fuente>_<versión>``: el prefijo identifica la fuente para borrar versiones viejas"""
+    huella = huella_archivo(ruta, con_hash=False)
+    fuente = hashlib.sha1(f"{huella['ruta']}|{clave}".encode('utf-8')).hexdigest()[:12]
+    version = hashlib.sha1(json.dumps(
+        [huella['tamano'], huella['mtime_ns'], VERSION_CACHE, VERSION_COMPARTIDO]).encode()).hexdigest()[:12]
+    return os.path.join(dir_compartido, f"{fuente}_{version}")
+
+
+def publicar(directorio, df, cubo, huella=None):
+    """
+    Escribe ``df`` (puede ser None) y el cubo en ``directorio``. Se escribe
+    en un directorio temporal que se renombra al final: los lectores nunca
+    ven una publicación a medias.
+    """
+    if huella is None:
+        huella = huella_datos(df) if df is not None else huella_cubo(cubo)
+    temporal = f"{directorio}.{os.getpid()}.tmp"
+    shutil.rmtree(temporal, ignore_errors=True)
+    os.makedirs(temporal)
+    try:
+        arreglos = {'datos': cubo.conteos.data, 'indices': cubo.conteos.indices, 'indptr': cubo.conteos.indptr,
+                    'mes_barrio': cubo.mes_barrio, 'mes_dia_hora': cubo.mes_dia_hora}
+        if df is not None:
+            _escribir_arrow(df, os.path.join(temporal, ARCHIVO_DATOS))
+        for nombre, arreglo in arreglos.items():
+            np.save(os.path.join(temporal, f"{nombre}.npy"), np.ascontiguousarray(arreglo))
+
+        meta = {
+            'version': VERSION_COMPARTIDO,
+            'huella': huella,
+            'filas': None if df is None else len(df),
+            'fechas_invalidas': None if df is None else df.attrs.get('fechas_invalidas'),
+            'primer_mes': str(cubo.meses[0]),
+            'meses': len(cubo.meses),
+            'barrios': cubo.barrios.tolist(),
+            'forma_conteos': list(cubo.conteos.shape),
+            'creado': time.time(),
+        }
+        with open(os.path.join(temporal, ARCHIVO_META), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        try:
+            os.replace(temporal, directorio)
+        except OSError:
+            # Sin candado entre procesos, otro pudo publicar la misma versión primero
+            if not os.path.exists(os.path.join(directorio, ARCHIVO_META)):
+                raise
+    finally:
+        shutil.rmtree(temporal, ignore_errors=True)
+
+
+def abrir(directorio):
+    """Abre una publicación mapeando sus archivos en memoria (solo lectura, sin copia)"""
+    with open(os.path.join(directorio, ARCHIVO_META), encoding='utf-8') as f:
+        meta = json.load(f)
+
+    def mapear(nombre):
+        return np.load(os.path.join(directorio, f"{nombre}.npy"), mmap_mode='r')
+
+    datos, indices, indptr, mes_barrio, mes_dia_hora = map(mapear, ARREGLOS_CUBO)
+    conteos = sparse.csr_matrix((datos, indices, indptr), shape=tuple(meta['forma_conteos']), copy=False)
+    meses = pd.period_range(meta['primer_mes'], periods=meta['meses'], freq='M')
+    cubo = CuboRoturas.desde_marginales(meses, pd.Index(meta['barrios'], name='Barrio'),
+                                        conteos, mes_barrio, mes_dia_hora)
+
+    df = None
+    if meta['filas'] is not None:
+        df = _leer_arrow(os.path.join(directorio, ARCHIVO_DATOS))
+        df.attrs['fechas_invalidas'] = meta['fechas_invalidas']
+    return DatosCompartidos(df, cubo, meta['huella'], directorio)
+
+
+@contextlib.contextmanager
+def _candado(ruta):
+    """Candado exclusivo entre procesos (fcntl); sin fcntl no se bloquea"""
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    with open(ruta, 'w') as archivo:
+        fcntl.flock(archivo, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(archivo, fcntl.LOCK_UN)
+
+
+def _borrar_anteriores(directorio):
+    """Borra otras versiones de la misma fuente (los procesos que las tengan mapeadas siguen leyendo)"""
+    base, nombre = os.path.split(directorio)
+    prefijo = nombre.split('_')[0] + '_'
+    for otro in os.listdir(base):
+        if otro.startswith(prefijo) and otro != nombre and not otro.endswith('.tmp'):
+            shutil.rmtree(os.path.join(base, otro), ignore_errors=True)
+
+
+def cargar_compartido(ruta, leer, clave='', dir_compartido=DIR_COMPARTIDO):
+    """
+    Devuelve los datos de ``ruta`` mapeados desde la publicación vigente.
+
+    ``leer(ruta)`` devuelve ``(df, cubo)`` y solo se llama si hay que
+    publicar; ``clave`` distingue publicaciones de la misma fuente (p. ej.
+    el modo de ingesta). Sin pyarrow se usa ``leer`` directamente.
+    Lanza FileNotFoundError si el archivo fuente no existe.
+    """
+    if not os.path.exists(ruta):
+        raise FileNotFoundError(ruta)
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        df, cubo = leer(ruta)
+        return DatosCompartidos(df, cubo, huella_datos(df) if df is not None else huella_cubo(cubo))
+
+    directorio = _directorio_publicacion(ruta, clave, dir_compartido)
+    if not os.path.exists(os.path.join(directorio, ARCHIVO_META)):
+        os.makedirs(dir_compartido, exist_ok=True)
+        with _candado(os.path.join(dir_compartido, os.path.basename(directorio).split('_')[0] + '.lock')):
+            # Otro proceso pudo publicar mientras se esperaba el candado
+            if not os.path.exists(os.path.join(directorio, ARCHIVO_META)):
+                df, cubo = leer(ruta)
+                publicar(directorio, df, cubo)
+                _borrar_anteriores(directorio)
+    return abrir(directorio)
+
+
+def leer_incidencias(ruta, modo='completo'):
+    """Lectura por defecto: caché Parquet para el Excel, ``ingesta.py`` para el resto"""
+    if modo == 'agregado':
+        return None, ingerir(ruta, modo='agregado').cubo
+    df = cargar_incidencias(ruta) if ruta.lower().endswith('.xlsx') else ingerir(ruta).df
+    return df, construir_cubo(df)
+
+
+# ============= CLI =============
+def _memoria_proceso():
+    """(privada, compartida) en MB del proceso actual, si el sistema la informa"""
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            campos = {linea.split(':')[0]: int(linea.split()[1]) for linea in f if linea.split()[-1] == 'kB'}
+    except OSError:
+        return None
+    privada = campos.get('Private_Clean', 0) + campos.get('Private_Dirty', 0)
+    compartida = campos.get('Shared_Clean', 0) + campos.get('Shared_Dirty', 0)
+    return privada / 1024, compartida / 1024
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Publica los datos limpios para compartirlos entre procesos")
+    parser.add_argument('--ruta', default=RUTA_EXCEL, help="Archivo fuente (.xlsx, .csv o .parquet)")
+    parser.add_argument('--modo', choices=MODOS, default='completo', help="Publicar el detalle o solo los agregados")
+    parser.add_argument('--dir', default=DIR_COMPARTIDO, help="Directorio de publicaciones")
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    datos = cargar_compartido(args.ruta, lambda ruta: leer_incidencias(ruta, args.modo), args.modo, args.dir)
+    tamano = sum(os.path.getsize(os.path.join(datos.directorio, n)) for n in os.listdir(datos.directorio))
+    print(f"✅ Publicación vigente: {datos.directorio} ({tamano / 1e6:.1f} MB, "
+          f"{time.perf_counter() - inicio:.2f} s, huella {datos.huella})")
+    filas = 'solo agregados' if datos.df is None else f"{len(datos.df):,} filas"
+    print(f"   {filas} | {len(datos.cubo.meses)} meses | {len(datos.cubo.barrios):,} barrios")
+    memoria = _memoria_proceso()
+    if memoria is not None:
+        print(f"   Memoria del proceso: {memoria[0]:.0f} MB privada, {memoria[1]:.0f} MB compartida")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
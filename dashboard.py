@@ -7,13 +7,28 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
-import plotly.express as px
-from plotly.subplots import make_subplots
-from datetime import datetime
-import pickle
+import os
+import time
 import warnings
+from datos import RUTA_EXCEL, huella_datos
+from ingesta import MODOS
+from compartido import cargar_compartido, leer_incidencias
+from esquema import nombre_mes
+from agregados import construir_cubo
+from pronostico import RUTA_ARTEFACTO, cargar_artefacto, ajustar_modelo, extraer_artefacto, pronosticar
+from simulacion import Simulacion
+from diagnostico import RUTA_DIAGNOSTICO, cargar_diagnostico, corresponde
+from flota import RUTA_FLOTA, FlotaPronosticos
+from reportes import ServicioReportes, preparar_datos_reporte, clave_reporte
+from generador import GeneradorIncidencias
+from figuras import CacheFiguras, mostrar_figura, traza_linea
+from metricas import medidor
 warnings.filterwarnings('ignore')
 
+# Un widget dentro de un fragmento vuelve a ejecutar solo ese fragmento
+# (st.fragment, disponible desde Streamlit 1.37; ver requirements.txt)
+fragmento = st.fragment
+
 # Configuración de la página
 st.set_page_config(
     page_title="Dashboard - Predicción de Roturas",
@@ -22,6 +37,10 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
+# Métricas de rendimiento opcionales (DASHBOARD_METRICAS=1, ver metricas.py)
+medidor.rerun()
+inicio_script = time.perf_counter()
+
 # CSS personalizado
 st.markdown("""
 <style>
@@ -47,187 +66,181 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Fuente de datos: el Excel del proyecto o una exportación grande (.csv/.parquet)
+RUTA_DATOS = os.environ.get('DASHBOARD_DATOS') or RUTA_EXCEL
+# 'agregado' solo conserva el cubo de conteos (sin el detalle por fila)
+MODO_INGESTA = os.environ.get('DASHBOARD_INGESTA') or 'completo'
+
 # Cargar datos
-@st.cache_data
+# cache_resource: todas las sesiones reciben el mismo objeto por referencia
+# (cache_data lo copiaría en cada ejecución); el DataFrame y el cubo son de
+# solo lectura y están mapeados desde la publicación compartida de disco
+@medidor.cacheada(st.cache_resource)
 def cargar_datos():
-    """Carga los datos procesados del análisis"""
+    """Carga los datos procesados, su cubo de conteos y su huella"""
     try:
-        df = pd.read_excel('Copia de base_datos.xlsx')
-        df.columns = df.columns.str.strip()
-        df['Fecha de Creación'] = pd.to_datetime(df['Fecha de Creación'], errors='coerce')
-        df = df.dropna(subset=['Fecha de Creación']).sort_values('Fecha de Creación')
-        
-        # Variables temporales
-        df['Año'] = df['Fecha de Creación'].dt.year
-        df['Mes'] = df['Fecha de Creación'].dt.month
-        df['Mes_Nombre'] = df['Fecha de Creación'].dt.strftime('%B')
-        df['Dia_Semana'] = df['Fecha de Creación'].dt.dayofweek
-        df['Hora'] = df['Fecha de Creación'].dt.hour
+        if MODO_INGESTA not in MODOS:
+            raise ValueError(f"DASHBOARD_INGESTA debe ser uno de: {', '.join(MODOS)}")
+        # El primer proceso publica los datos limpios; los demás los mapean.
+        # En modo agregado no hay DataFrame, solo el cubo
+        datos = cargar_compartido(RUTA_DATOS, lambda ruta: leer_incidencias(ruta, MODO_INGESTA), MODO_INGESTA)
         
-        # Serie mensual
-        df_mensual = df.groupby(pd.Grouper(key='Fecha de Creación', freq='M')).size()
-        df_mensual = pd.DataFrame(df_mensual, columns=['Num_Roturas'])
-        
-        return df, df_mensual
+        return datos.df, datos.cubo.serie_mensual(), datos.cubo, datos.huella
         
     except FileNotFoundError:
         # Generar datos simulados si no existe el archivo
         st.warning("⚠️ Usando datos simulados para demostración. Para datos reales, configura el archivo Excel en Streamlit Cloud.")
-        fechas = pd.date_range(start='2019-01-01', end='2025-07-31', freq='D')
-        np.random.seed(42)
-        n_registros = 4162
-        df = pd.DataFrame({
-            'Fecha de Creación': np.random.choice(fechas, n_registros),
-            'Barrio': np.random.choice(['BARRIO ABAJO', 'CENTRO', 'MANGA', 'PIE DE LA POPA', 'SAN DIEGO', 
-                                       'ESPINAL', 'BOSTON', 'CABRERO', 'TORICES', 'CRESPO'], n_registros),
-            'Distrito': np.random.choice(['CARTAGENA', 'TURBACO', 'ARJONA'], n_registros, p=[0.8, 0.15, 0.05])
-        })
-        df = df.sort_values('Fecha de Creación')
-        
-        # Variables temporales
-        df['Año'] = df['Fecha de Creación'].dt.year
-        df['Mes'] = df['Fecha de Creación'].dt.month
-        df['Mes_Nombre'] = df['Fecha de Creación'].dt.strftime('%B')
-        df['Dia_Semana'] = df['Fecha de Creación'].dt.dayofweek
-        df['Hora'] = df['Fecha de Creación'].dt.hour
-        
-        # Serie mensual
-        df_mensual = df.groupby(pd.Grouper(key='Fecha de Creación', freq='M')).size()
-        df_mensual = pd.DataFrame(df_mensual, columns=['Num_Roturas'])
-        
-        return df, df_mensual
+        df = GeneradorIncidencias(
+            semilla=42,
+            nombres_barrios=['BARRIO ABAJO', 'CENTRO', 'MANGA', 'PIE DE LA POPA', 'SAN DIEGO',
+                             'ESPINAL', 'BOSTON', 'CABRERO', 'TORICES', 'CRESPO'],
+            nombres_distritos=['CARTAGENA', 'TURBACO', 'ARJONA'],
+        ).dataframe(4162)
+        cubo = construir_cubo(df)
+        
+        return df, cubo.serie_mensual(), cubo, huella_datos(df)
     except Exception as e:
         st.error(f"Error al cargar datos: {e}")
-        return None, None
-
-# Cargar modelo y predicciones (simuladas por ahora)
-@st.cache_data
-def cargar_predicciones():
-    """Genera predicciones para los próximos meses"""
-    # Datos de ejemplo - en producción cargarías del modelo entrenado
-    fechas_futuras = pd.date_range(start='2025-08-01', periods=12, freq='M')
-    predicciones = [64, 48, 52, 76, 69, 58, 45, 51, 63, 72, 67, 54]
-    ic_inferior = [33, 23, 24, 33, 28, 23, 20, 22, 28, 32, 29, 24]
-    ic_superior = [123, 99, 114, 174, 168, 148, 112, 125, 145, 165, 158, 132]
-    
-    # Nombres de meses en español
-    meses_es = {
-        1: 'Enero', 2: 'Febrero', 3: 'Marzo', 4: 'Abril',
-        5: 'Mayo', 6: 'Junio', 7: 'Julio', 8: 'Agosto',
-        9: 'Septiembre', 10: 'Octubre', 11: 'Noviembre', 12: 'Diciembre'
-    }
+        return None, None, None, None
+
+# Cargar modelo entrenado (artefacto generado con `python pronostico.py`)
+def version_modelo():
+    """mtime del artefacto: cambia cuando `python actualizacion.py` lo reescribe"""
+    try:
+        return os.stat(RUTA_ARTEFACTO).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+@medidor.cacheada(st.cache_resource)
+def cargar_modelo(_df_mensual, version):
+    """Carga el artefacto del modelo SARIMA sin reajustarlo (``version`` solo invalida la caché)"""
+    try:
+        return cargar_artefacto(RUTA_ARTEFACTO)
+    except FileNotFoundError:
+        # Sin artefacto: se ajusta una sola vez por proceso con los datos cargados
+        st.warning(f"⚠️ No se encontró '{RUTA_ARTEFACTO}'. Ajustando el modelo con los datos actuales; ejecuta `python pronostico.py` para evitarlo.")
+        serie = _df_mensual['Num_Roturas']
+        return extraer_artefacto(ajustar_modelo(serie), serie)
+
+@medidor.cacheada(st.cache_data)
+def cargar_predicciones(horizonte, confianza, version):
+    """Genera predicciones para los próximos meses a partir del modelo entrenado"""
+    df_pred = pronosticar(cargar_modelo(df_mensual, version), horizonte, confianza)
+    fechas_futuras = df_pred['Fecha']
     
-    df_pred = pd.DataFrame({
-        'Fecha': fechas_futuras,
-        'Prediccion': predicciones,
-        'IC_Inferior': ic_inferior,
-        'IC_Superior': ic_superior,
-        'Mes_Nombre': [f"{meses_es[f.month]} {f.year}" for f in fechas_futuras],
-        'Año': [f.year for f in fechas_futuras],
-        'Mes': [f.month for f in fechas_futuras]
-    })
+    df_pred['Mes_Nombre'] = [f"{nombre_mes(f.month)} {f.year}" for f in fechas_futuras]
+    df_pred['Año'] = fechas_futuras.dt.year
+    df_pred['Mes'] = fechas_futuras.dt.month
     
     return df_pred
 
-df, df_mensual = cargar_datos()
-df_predicciones = cargar_predicciones()
-
-# ============= HEADER =============
-st.markdown('<p class="main-header">🔮 Sistema de Predicción de Roturas en Red de Gas</p>', unsafe_allow_html=True)
-st.markdown("**Universidad Tecnológica de Bolívar** | Modelo SARIMA(0,1,1)(0,1,1,12)")
-st.markdown("")
+@medidor.cacheada(st.cache_resource)
+def cargar_simulacion(version):
+    """Trayectorias Monte Carlo a 12 meses: las probabilidades de cualquier umbral u horizonte salen de ellas"""
+    return Simulacion.desde_artefacto(cargar_modelo(df_mensual, version))
 
-# ============= FILTROS EN LÍNEA =============
-st.markdown("#### ⚙️ Configuración y Filtros")
-col1, col2, col3 = st.columns(3, gap="large")
+# Diagnóstico del modelo (artefacto generado al guardar el modelo o con `python diagnostico.py`)
+def version_diagnostico():
+    """mtime del artefacto de diagnóstico: cambia cuando se regenera"""
+    try:
+        return os.stat(RUTA_DIAGNOSTICO).st_mtime_ns
+    except FileNotFoundError:
+        return None
 
-with col1:
-    # Selector de horizonte de predicción
-    horizonte = st.selectbox(
-        "Horizonte de predicción",
-        options=[3, 6, 9, 12],
-        index=1,
-        help="Número de meses a predecir",
-        key="horizonte_select"
-    )
+@medidor.cacheada(st.cache_resource)
+def cargar_diagnostico_modelo(version):
+    """Carga el diagnóstico precalculado, o None si no existe (nunca lo recalcula)"""
+    try:
+        return cargar_diagnostico(RUTA_DIAGNOSTICO)
+    except FileNotFoundError:
+        return None
 
-with col2:
-    # Selector de mes específico - incluir meses históricos
-    # Obtener meses históricos únicos
-    meses_es = {
-        1: 'Enero', 2: 'Febrero', 3: 'Marzo', 4: 'Abril',
-        5: 'Mayo', 6: 'Junio', 7: 'Julio', 8: 'Agosto',
-        9: 'Septiembre', 10: 'Octubre', 11: 'Noviembre', 12: 'Diciembre'
-    }
-    
-    df_meses_hist = df.copy()
-    df_meses_hist['Año_Mes'] = df_meses_hist['Fecha de Creación'].dt.to_period('M')
-    meses_historicos = df_meses_hist['Año_Mes'].unique()
-    meses_hist_nombres = [f"{meses_es[pd.Period(m).month]} {pd.Period(m).year}" for m in sorted(meses_historicos, reverse=True)[:12]]
-    
-    meses_disponibles = ['Todos'] + meses_hist_nombres
-    
-    mes_seleccionado = st.selectbox(
-        "Mes a analizar (histórico)",
-        options=meses_disponibles,
-        help="Selecciona un mes histórico para ver detalles específicos",
-        key="mes_select"
-    )
+# Pronósticos por barrio y distrito (artefacto generado con `python flota.py`)
+@medidor.cacheada(st.cache_resource)
+def cargar_flota():
+    """Carga la flota de pronósticos por barrio, o None si no se ha entrenado"""
+    try:
+        return FlotaPronosticos.cargar(RUTA_FLOTA)
+    except FileNotFoundError:
+        return None
 
-with col3:
-    # Filtro de barrios
-    top_n_barrios = st.slider(
-        "Top N barrios",
-        min_value=3,
-        max_value=15,
-        value=6,
-        help="Número de barrios con mayor incidencia",
-        key="barrios_slider"
-    )
+df, df_mensual, cubo, huella = cargar_datos()
+# Un artefacto actualizado se toma en la siguiente ejecución, sin reiniciar el servidor
+modelo_version = version_modelo()
 
 # Nivel de confianza fijo en 95%
 confianza = 95
 
-st.markdown("")
+# ============= CÁLCULOS EN CACHÉ =============
+# Cada pestaña solo lee sus propios cálculos: un widget invalida únicamente
+# las entradas de caché que dependen de él
+
+def opciones_meses():
+    """Opciones del selector de mes: 'Todos' y los últimos 12 meses históricos"""
+    # Los meses salen del cubo (también disponible en la ingesta agregada)
+    meses_hist_nombres = [f"{nombre_mes(m.month)} {m.year}" for m in cubo.ultimos_meses(12)]
+    
+    return ['Todos'] + meses_hist_nombres
+
+@medidor.cacheada(st.cache_data)
+def conteos_barrios(pos_mes):
+    """Roturas por barrio del mes (None = histórico completo), de mayor a menor"""
+    return cubo.conteo_barrios(pos_mes)
+
+@medidor.cacheada(st.cache_data)
+def patrones_temporales():
+    """Roturas por hora, por día de la semana y matriz día × hora del histórico"""
+    dia_hora = cubo.dia_hora()
+    return pd.Series(dia_hora.sum(axis=0)), pd.Series(dia_hora.sum(axis=1)), dia_hora
+
+# ============= HEADER =============
+st.markdown('<p class="main-header">🔮 Sistema de Predicción de Roturas en Red de Gas</p>', unsafe_allow_html=True)
+st.markdown("**Universidad Tecnológica de Bolívar** | Modelo SARIMA(0,1,1)(0,1,1,12)")
 st.markdown("")
 
-# Métricas principales
-col1, col2, col3, col4 = st.columns(4, gap="medium")
+with medidor.seccion('encabezado'):
+    # Métricas principales (independientes de los filtros de cada pestaña)
+    df_resumen = cargar_predicciones(12, confianza, modelo_version)
 
-with col1:
-    total_historico = len(df)
-    st.metric(
-        "Total Roturas Históricas",
-        f"{total_historico:,}",
-        help="Roturas registradas 2019-2025"
-    )
+    st.markdown("")
+    st.markdown("")
 
-with col2:
-    promedio_mensual = df_mensual['Num_Roturas'].mean()
-    st.metric(
-        "Promedio Mensual",
-        f"{promedio_mensual:.1f}",
-        help="Promedio histórico de roturas/mes"
-    )
+    col1, col2, col3, col4 = st.columns(4, gap="medium")
 
-with col3:
-    pred_proximo = df_predicciones.iloc[0]['Prediccion']
-    st.metric(
-        "Próximo Mes Predicho",
-        f"{pred_proximo:.0f}",
-        f"{((pred_proximo - promedio_mensual)/promedio_mensual*100):+.1f}%",
-        help="Predicción para el próximo mes"
-    )
+    with col1:
+        total_historico = cubo.total()
+        st.metric(
+            "Total Roturas Históricas",
+            f"{total_historico:,}",
+            help="Roturas registradas 2019-2025"
+        )
 
-with col4:
-    mes_critico = df_predicciones.head(horizonte).loc[df_predicciones.head(horizonte)['Prediccion'].idxmax(), 'Mes_Nombre']
-    max_pred = df_predicciones.head(horizonte)['Prediccion'].max()
-    st.metric(
-        "Mes Crítico",
-        mes_critico.split()[0],
-        f"{max_pred:.0f} roturas",
-        help="Mes con mayor predicción de roturas"
-    )
+    with col2:
+        promedio_mensual = df_mensual['Num_Roturas'].mean()
+        st.metric(
+            "Promedio Mensual",
+            f"{promedio_mensual:.1f}",
+            help="Promedio histórico de roturas/mes"
+        )
+
+    with col3:
+        pred_proximo = df_resumen.iloc[0]['Prediccion']
+        st.metric(
+            "Próximo Mes Predicho",
+            f"{pred_proximo:.0f}",
+            f"{((pred_proximo - promedio_mensual)/promedio_mensual*100):+.1f}%",
+            help="Predicción para el próximo mes"
+        )
+
+    with col4:
+        mes_critico = df_resumen.loc[df_resumen['Prediccion'].idxmax(), 'Mes_Nombre']
+        max_pred = df_resumen['Prediccion'].max()
+        st.metric(
+            "Mes Crítico",
+            mes_critico.split()[0],
+            f"{max_pred:.0f} roturas",
+            help="Mes con mayor predicción de roturas en los próximos 12 meses"
+        )
 
 st.markdown("---")
 
@@ -239,66 +252,98 @@ tab1, tab2, tab3, tab4 = st.tabs([
     "🔬 Diagnóstico del Modelo"
 ])
 
+@medidor.cacheada(st.cache_resource)
+def cache_figuras():
+    """Figuras ya construidas, compartidas por todas las sesiones"""
+    return CacheFiguras.desde_entorno()
+
+def graficar(nombre, parametros, construir, **kwargs):
+    """
+    Muestra la figura ``nombre`` para ``parametros`` (todo aquello de lo que
+    depende): ``construir()`` solo se llama si la figura no está en la caché
+    de figuras. El tiempo se mide como la sección 'plotly:<nombre>'.
+    """
+    with medidor.seccion(f"plotly:{nombre}"):
+        mostrar_figura(cache_figuras().obtener(nombre, parametros, construir), **kwargs)
+
 # ============= TAB 1: PREDICCIONES =============
-with tab1:
+@fragmento
+@medidor.medida()
+def panel_predicciones():
     st.markdown("### 📊 Predicciones Futuras")
     
+    # Selector de horizonte de predicción
+    horizonte = st.selectbox(
+        "Horizonte de predicción",
+        options=[3, 6, 9, 12],
+        index=1,
+        help="Número de meses a predecir",
+        key="horizonte_select"
+    )
+    
+    # Predicciones del modelo para el horizonte elegido (caché por horizonte y confianza)
+    df_predicciones = cargar_predicciones(horizonte, confianza, modelo_version)
+    
+    df_pred_filtrado = df_predicciones
+    
     col1, col2 = st.columns([2, 1])
     
     with col1:
         # Gráfico de serie temporal con predicciones
-        fig = go.Figure()
-        
-        # Histórico
-        fig.add_trace(go.Scatter(
-            x=df_mensual.index,
-            y=df_mensual['Num_Roturas'],
-            mode='lines',
-            name='Histórico',
-            line=dict(color='#2E86AB', width=2)
-        ))
-        
-        # Predicciones
-        df_pred_filtrado = df_predicciones.head(horizonte)
-        fig.add_trace(go.Scatter(
-            x=df_pred_filtrado['Fecha'],
-            y=df_pred_filtrado['Prediccion'],
-            mode='lines+markers',
-            name='Predicción',
-            line=dict(color='#D90429', width=3, dash='dash'),
-            marker=dict(size=8)
-        ))
-        
-        # Intervalo de confianza
-        fig.add_trace(go.Scatter(
-            x=df_pred_filtrado['Fecha'].tolist() + df_pred_filtrado['Fecha'].tolist()[::-1],
-            y=df_pred_filtrado['IC_Superior'].tolist() + df_pred_filtrado['IC_Inferior'].tolist()[::-1],
-            fill='toself',
-            fillcolor='rgba(217, 4, 41, 0.2)',
-            line=dict(color='rgba(255,255,255,0)'),
-            name='IC 95%',
-            showlegend=True
-        ))
-        
-        # Línea de promedio histórico
-        fig.add_hline(
-            y=promedio_mensual,
-            line_dash="dot",
-            line_color="gray",
-            annotation_text=f"Promedio: {promedio_mensual:.1f}",
-            annotation_position="right"
-        )
-        
-        fig.update_layout(
-            title=f"Serie Temporal y Predicciones ({horizonte} meses)",
-            xaxis_title="Fecha",
-            yaxis_title="Roturas/Mes",
-            hovermode='x unified',
-            height=500,
-            template='plotly_white'
-        )
+        def figura():
+            fig = go.Figure()
+            
+            # Histórico (reducido con LTTB y en WebGL si llega a ser muy largo)
+            fig.add_trace(traza_linea(
+                x=df_mensual.index,
+                y=df_mensual['Num_Roturas'],
+                mode='lines',
+                name='Histórico',
+                line=dict(color='#2E86AB', width=2)
+            ))
+            
+            # Predicciones
+            fig.add_trace(go.Scatter(
+                x=df_pred_filtrado['Fecha'],
+                y=df_pred_filtrado['Prediccion'],
+                mode='lines+markers',
+                name='Predicción',
+                line=dict(color='#D90429', width=3, dash='dash'),
+                marker=dict(size=8)
+            ))
+            
+            # Intervalo de confianza
+            fig.add_trace(go.Scatter(
+                x=df_pred_filtrado['Fecha'].tolist() + df_pred_filtrado['Fecha'].tolist()[::-1],
+                y=df_pred_filtrado['IC_Superior'].tolist() + df_pred_filtrado['IC_Inferior'].tolist()[::-1],
+                fill='toself',
+                fillcolor='rgba(217, 4, 41, 0.2)',
+                line=dict(color='rgba(255,255,255,0)'),
+                name=f'IC {confianza}%',
+                showlegend=True
+            ))
+            
+            # Línea de promedio histórico
+            fig.add_hline(
+                y=promedio_mensual,
+                line_dash="dot",
+                line_color="gray",
+                annotation_text=f"Promedio: {promedio_mensual:.1f}",
+                annotation_position="right"
+            )
+            
+            fig.update_layout(
+                title=f"Serie Temporal y Predicciones ({horizonte} meses)",
+                xaxis_title="Fecha",
+                yaxis_title="Roturas/Mes",
+                hovermode='x unified',
+                height=500,
+                template='plotly_white'
+            )
+            
+            return fig
         
-        st.plotly_chart(fig, use_column_width=True)
+        graficar('prediccion', (horizonte, confianza, modelo_version, huella), figura, use_container_width=True)
     
     with col2:
         # Tabla de predicciones
@@ -319,11 +364,64 @@ with tab1:
         # Resumen
         total_pred = df_pred_filtrado['Prediccion'].sum()
         st.info(f"**Total {horizonte} meses:** {total_pred:.0f} roturas")
+    
+    # Probabilidades con las trayectorias simuladas (un cambio de umbral no vuelve a simular)
+    st.markdown("#### 🎲 Probabilidades por Simulación")
+    simulacion = cargar_simulacion(modelo_version)
+    
+    col_umbral, col_total = st.columns(2)
+    with col_umbral:
+        umbral = st.number_input("Umbral de roturas en un mes", min_value=0, value=70, step=5)
+    with col_total:
+        umbral_total = st.number_input(f"Umbral del total en {horizonte} meses", min_value=0,
+                                       value=int(round(total_pred, -1)), step=10)
+    
+    tabla_sim = simulacion.resumen(umbral, horizonte)
+    tabla_sim['Fecha'] = [f"{nombre_mes(f.month)} {f.year}" for f in tabla_sim['Fecha']]
+    tabla_sim['Prob_Excede'] = tabla_sim['Prob_Excede'].apply(lambda p: f"{p:.0%}")
+    for columna in ('P10', 'P50', 'P90'):
+        tabla_sim[columna] = tabla_sim[columna].apply(lambda x: f"{x:.0f}")
+    tabla_sim.columns = ['Mes', f'P(> {umbral})', 'P10', 'Mediana', 'P90']
+    
+    col_tabla, col_resumen = st.columns([2, 1])
+    with col_tabla:
+        st.dataframe(tabla_sim, hide_index=True)
+    with col_resumen:
+        p10, p50, p90 = simulacion.cuantiles_total(horizonte=horizonte)
+        st.info(f"**Total {horizonte} meses:** mediana {p50:.0f} roturas; "
+                f"80% de los escenarios entre {p10:.0f} y {p90:.0f}")
+        st.info(f"**P(total > {umbral_total}):** {simulacion.prob_total(umbral_total, horizonte):.0%}")
+    st.caption(f"{simulacion.n:,} trayectorias simuladas del modelo SARIMA. "
+               f"P10 y P90: 10% de los escenarios queda por debajo o por encima.")
 
 # ============= TAB 2: ANÁLISIS ESPACIAL =============
-with tab2:
+@fragmento
+@medidor.medida()
+def panel_espacial():
     st.markdown("### 🗺️ Distribución Espacial de Roturas")
     
+    col_mes, col_barrios = st.columns(2, gap="large")
+    
+    with col_mes:
+        # Selector de mes específico - incluir meses históricos
+        mes_seleccionado = st.selectbox(
+            "Mes a analizar (histórico)",
+            options=opciones_meses(),
+            help="Selecciona un mes histórico para ver detalles específicos",
+            key="mes_select"
+        )
+    
+    with col_barrios:
+        # Filtro de barrios
+        top_n_barrios = st.slider(
+            "Top N barrios",
+            min_value=3,
+            max_value=15,
+            value=6,
+            help="Número de barrios con mayor incidencia",
+            key="barrios_slider"
+        )
+    
     # Filtrar datos según mes seleccionado
     if mes_seleccionado != 'Todos':
         try:
@@ -337,78 +435,79 @@ with tab2:
             mes_num = meses_inv[partes[0]]
             año_num = int(partes[1])
             
-            df_filtrado = df[
-                (df['Fecha de Creación'].dt.year == año_num) &
-                (df['Fecha de Creación'].dt.month == mes_num)
-            ]
+            # Posición del mes en el cubo (None = histórico completo)
+            pos_mes = cubo.posicion_mes(año_num, mes_num)
             titulo_adicional = f" - {mes_seleccionado}"
             
-            if len(df_filtrado) == 0:
+            if pos_mes is None or cubo.total(pos_mes) == 0:
                 st.warning(f"⚠️ No hay datos para {mes_seleccionado}")
-                df_filtrado = df
+                pos_mes = None
                 titulo_adicional = " - Histórico Completo"
         except Exception as e:
             st.error(f"Error al filtrar por mes: {e}")
-            df_filtrado = df
+            pos_mes = None
             titulo_adicional = " - Histórico Completo"
     else:
-        df_filtrado = df
+        pos_mes = None
         titulo_adicional = " - Histórico Completo"
     
     # Análisis por barrio
-    barrio_counts = df_filtrado['Barrio'].value_counts().head(top_n_barrios)
+    barrio_counts = conteos_barrios(pos_mes).head(top_n_barrios)
     total_meses = len(df_mensual)
     
     col1, col2 = st.columns([3, 2], gap="large")
     
     with col1:
         # Gráfico de barrios
-        fig = go.Figure()
-        
-        promedio_mensual_barrios = barrio_counts / total_meses if mes_seleccionado == 'Todos' else barrio_counts
-        
-        # Definir colores según nivel de riesgo
-        colors = []
-        for val in promedio_mensual_barrios:
-            if mes_seleccionado == 'Todos':
-                if val > 2:
-                    colors.append('#D90429')  # Muy Alto
-                elif val > 1.5:
-                    colors.append('#F18F01')  # Alto
-                elif val > 1:
-                    colors.append('#FFD93D')  # Medio
+        def figura():
+            fig = go.Figure()
+            
+            promedio_mensual_barrios = barrio_counts / total_meses if mes_seleccionado == 'Todos' else barrio_counts
+            
+            # Definir colores según nivel de riesgo
+            colors = []
+            for val in promedio_mensual_barrios:
+                if mes_seleccionado == 'Todos':
+                    if val > 2:
+                        colors.append('#D90429')  # Muy Alto
+                    elif val > 1.5:
+                        colors.append('#F18F01')  # Alto
+                    elif val > 1:
+                        colors.append('#FFD93D')  # Medio
+                    else:
+                        colors.append('#06A77D')  # Bajo
                 else:
-                    colors.append('#06A77D')  # Bajo
-            else:
-                colors.append('#2E86AB')
-        
-        fig.add_trace(go.Bar(
-            y=barrio_counts.index[::-1],
-            x=promedio_mensual_barrios[::-1],
-            orientation='h',
-            marker=dict(color=colors[::-1]),
-            text=promedio_mensual_barrios[::-1].round(2),
-            textposition='outside',
-            hovertemplate='<b>%{y}</b><br>Roturas: %{x:.2f}<extra></extra>'
-        ))
-        
-        fig.update_layout(
-            title=f"Top {top_n_barrios} Barrios con Mayor Incidencia{titulo_adicional}",
-            xaxis_title="Roturas" + ("/Mes" if mes_seleccionado == 'Todos' else ""),
-            yaxis_title="Barrio",
-            height=400,
-            template='plotly_white',
-            showlegend=False
-        )
+                    colors.append('#2E86AB')
+            
+            fig.add_trace(go.Bar(
+                y=barrio_counts.index[::-1],
+                x=promedio_mensual_barrios[::-1],
+                orientation='h',
+                marker=dict(color=colors[::-1]),
+                text=promedio_mensual_barrios[::-1].round(2),
+                textposition='outside',
+                hovertemplate='<b>%{y}</b><br>Roturas: %{x:.2f}<extra></extra>'
+            ))
+            
+            fig.update_layout(
+                title=f"Top {top_n_barrios} Barrios con Mayor Incidencia{titulo_adicional}",
+                xaxis_title="Roturas" + ("/Mes" if mes_seleccionado == 'Todos' else ""),
+                yaxis_title="Barrio",
+                height=400,
+                template='plotly_white',
+                showlegend=False
+            )
+            
+            return fig
         
-        st.plotly_chart(fig, use_column_width=True)
+        graficar('barrios', (mes_seleccionado, top_n_barrios, huella), figura, use_container_width=True)
     
     with col2:
         # Estadísticas por barrio
         st.markdown("#### 📊 Estadísticas")
         
         total_top = barrio_counts.sum()
-        total_general = len(df_filtrado)
+        total_general = cubo.total(pos_mes)
         concentracion = (total_top / total_general) * 100
         
         st.metric(
@@ -428,11 +527,19 @@ with tab2:
         
         # Predicción para próximo mes en barrio crítico
         if mes_seleccionado == 'Todos':
-            pred_barrio = roturas_max / total_meses
+            flota = cargar_flota()
+            pred_barrio = flota.proximo_mes([barrio_mas_afectado])[0] if flota is not None else np.nan
+            if np.isnan(pred_barrio):
+                pred_barrio = roturas_max / total_meses
+                ayuda_pred = "Promedio mensual esperado en el barrio más afectado"
+            else:
+                ayuda_pred = f"Pronóstico del próximo mes en el barrio más afectado (modelo: {flota.modelo(barrio_mas_afectado)})"
+                if flota.reconciliacion != 'ninguna':
+                    ayuda_pred += f"; reconciliado ({flota.reconciliacion}) para que los barrios sumen el total de la ciudad"
             st.metric(
                 "Predicción Mensual (Barrio Crítico)",
                 f"{pred_barrio:.2f}",
-                help="Promedio mensual esperado en el barrio más afectado"
+                help=ayuda_pred
             )
     
     # Tabla detallada
@@ -447,113 +554,171 @@ with tab2:
     
     if mes_seleccionado == 'Todos':
         tabla_barrios['Prom/Mes'] = (tabla_barrios['Roturas'] / total_meses).round(2)
+        if cargar_flota() is not None:
+            tabla_barrios['Pred. Próx. Mes'] = cargar_flota().proximo_mes(barrio_counts.index).round(2)
     
     st.dataframe(
         tabla_barrios,
         hide_index=True,
         height=300
     )
+    
+    # Horizonte propio de la pestaña: el selector de predicciones vive en otro
+    # fragmento y su valor no se refleja aquí hasta la siguiente ejecución completa
+    horizonte_reporte = st.selectbox(
+        "Horizonte del reporte",
+        options=[3, 6, 9, 12],
+        index=1,
+        help="Meses de predicción incluidos en el PDF",
+        key="reporte_horizonte"
+    )
+    seccion_reporte(None if pos_mes is None else cubo.meses[pos_mes], top_n_barrios, horizonte_reporte)
+
+# ============= REPORTE PDF =============
+@medidor.cacheada(st.cache_resource)
+def servicio_reportes():
+    """Pool de renderizado de reportes compartido por todas las sesiones"""
+    return ServicioReportes()
+
+def seccion_reporte(mes, top_n_barrios, horizonte):
+    """Descarga inmediata si el reporte ya existe; si no, se encola en segundo plano"""
+    st.markdown("#### 📄 Reporte PDF")
+    
+    datos_reporte = preparar_datos_reporte(cubo, cargar_predicciones(horizonte, confianza, modelo_version), mes, top_n_barrios,
+                                           diagnostico=cargar_diagnostico_modelo(version_diagnostico()))
+    clave = clave_reporte(datos_reporte, huella)
+    servicio = servicio_reportes()
+    estado = servicio.estado(clave)
+    
+    st.caption(f"{datos_reporte['periodo']} · Top {top_n_barrios} barrios · Horizonte {horizonte} meses")
+    
+    if estado == 'listo':
+        st.download_button(
+            label="📥 Descargar PDF",
+            data=servicio.leer(clave),
+            file_name=f"reporte_prediccion_{datos_reporte['parametros']['mes']}_top{top_n_barrios}_h{horizonte}.pdf",
+            mime="application/pdf",
+            key="reporte_descarga"
+        )
+    elif estado == 'en_proceso':
+        st.info("⏳ El reporte se está generando en segundo plano.")
+        st.button("🔄 Actualizar", key="reporte_actualizar")
+    else:
+        if estado == 'error':
+            st.error(f"Error al generar PDF: {servicio.error(clave)}")
+        if st.button("📄 Generar reporte PDF", key="reporte_generar"):
+            servicio.solicitar(clave, datos_reporte)
+            st.info("⏳ El reporte se está generando en segundo plano.")
+            st.button("🔄 Actualizar", key="reporte_actualizar")
 
 # ============= TAB 3: ANÁLISIS TEMPORAL =============
-with tab3:
+@medidor.medida()
+def panel_temporal():
     st.markdown("### ⏰ Patrones Temporales de Roturas")
     
+    # Matriz día × hora del cubo: todas las vistas de la pestaña son sumas de ella
+    hora_counts, dia_counts, dia_hora = patrones_temporales()
+    
     col1, col2 = st.columns(2, gap="large")
     
     with col1:
         # Distribución por hora
-        hora_counts = df.groupby('Hora').size()
-        
-        fig = go.Figure()
-        fig.add_trace(go.Bar(
-            x=hora_counts.index,
-            y=hora_counts.values,
-            marker=dict(
-                color=hora_counts.values,
-                colorscale='Reds',
-                showscale=True,
-                colorbar=dict(title="Roturas")
-            ),
-            hovertemplate='<b>Hora %{x}:00</b><br>Roturas: %{y}<extra></extra>'
-        ))
-        
-        fig.update_layout(
-            title="Distribución por Hora del Día",
-            xaxis_title="Hora",
-            yaxis_title="Número de Roturas",
-            height=400,
-            template='plotly_white',
-            xaxis=dict(tickmode='linear', tick0=0, dtick=2)
-        )
+        def figura():
+            fig = go.Figure()
+            fig.add_trace(go.Bar(
+                x=hora_counts.index,
+                y=hora_counts.values,
+                marker=dict(
+                    color=hora_counts.values,
+                    colorscale='Reds',
+                    showscale=True,
+                    colorbar=dict(title="Roturas")
+                ),
+                hovertemplate='<b>Hora %{x}:00</b><br>Roturas: %{y}<extra></extra>'
+            ))
+            
+            fig.update_layout(
+                title="Distribución por Hora del Día",
+                xaxis_title="Hora",
+                yaxis_title="Número de Roturas",
+                height=400,
+                template='plotly_white',
+                xaxis=dict(tickmode='linear', tick0=0, dtick=2)
+            )
+            
+            return fig
         
-        st.plotly_chart(fig, use_column_width=True)
+        graficar('horas', (huella,), figura, use_container_width=True)
         
         # Estadísticas horarias
         hora_critica = hora_counts.idxmax()
         roturas_hora_critica = hora_counts.max()
-        prob_hora = (roturas_hora_critica / len(df) * 100)
+        prob_hora = (roturas_hora_critica / total_historico * 100)
         
         st.info(f"🕐 **Hora crítica:** {hora_critica}:00 - {(hora_critica+1)%24}:00 hrs ({roturas_hora_critica} roturas, {prob_hora:.1f}%)")
     
     with col2:
         # Distribución por día de la semana
         dias_nombres = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
-        dia_counts = df.groupby('Dia_Semana').size().reindex(range(7), fill_value=0)
-        
-        fig = go.Figure()
-        fig.add_trace(go.Bar(
-            x=dias_nombres,
-            y=dia_counts.values,
-            marker=dict(
-                color=dia_counts.values,
-                colorscale='Blues',
-                showscale=True,
-                colorbar=dict(title="Roturas")
-            ),
-            hovertemplate='<b>%{x}</b><br>Roturas: %{y}<extra></extra>'
-        ))
-        
-        fig.update_layout(
-            title="Distribución por Día de la Semana",
-            xaxis_title="Día",
-            yaxis_title="Número de Roturas",
-            height=400,
-            template='plotly_white'
-        )
+        def figura():
+            fig = go.Figure()
+            fig.add_trace(go.Bar(
+                x=dias_nombres,
+                y=dia_counts.values,
+                marker=dict(
+                    color=dia_counts.values,
+                    colorscale='Blues',
+                    showscale=True,
+                    colorbar=dict(title="Roturas")
+                ),
+                hovertemplate='<b>%{x}</b><br>Roturas: %{y}<extra></extra>'
+            ))
+            
+            fig.update_layout(
+                title="Distribución por Día de la Semana",
+                xaxis_title="Día",
+                yaxis_title="Número de Roturas",
+                height=400,
+                template='plotly_white'
+            )
+            
+            return fig
         
-        st.plotly_chart(fig, use_column_width=True)
+        graficar('dias', (huella,), figura, use_container_width=True)
         
         # Estadísticas semanales
         dia_critico = dias_nombres[dia_counts.idxmax()]
         roturas_dia_critico = dia_counts.max()
-        prob_dia = (roturas_dia_critico / len(df) * 100)
+        prob_dia = (roturas_dia_critico / total_historico * 100)
         
         st.info(f"📅 **Día crítico:** {dia_critico} ({roturas_dia_critico} roturas, {prob_dia:.1f}%)")
     
     # Mapa de calor
     st.markdown("#### 🔥 Mapa de Calor: Día × Hora")
     
-    heatmap_data = df.groupby(['Dia_Semana', 'Hora']).size().unstack(fill_value=0)
-    heatmap_data.index = dias_nombres
-    
-    fig = go.Figure(data=go.Heatmap(
-        z=heatmap_data.values,
-        x=heatmap_data.columns,
-        y=heatmap_data.index,
-        colorscale='YlOrRd',
-        hovertemplate='<b>%{y}</b> - Hora %{x}:00<br>Roturas: %{z}<extra></extra>',
-        colorbar=dict(title="Roturas")
-    ))
-    
-    fig.update_layout(
-        title="Concentración de Roturas por Día y Hora",
-        xaxis_title="Hora del Día",
-        yaxis_title="Día de la Semana",
-        height=400,
-        template='plotly_white'
-    )
+    heatmap_data = pd.DataFrame(dia_hora, index=dias_nombres)
     
-    st.plotly_chart(fig, use_column_width=True)
+    def figura():
+        fig = go.Figure(data=go.Heatmap(
+            z=heatmap_data.values,
+            x=heatmap_data.columns,
+            y=heatmap_data.index,
+            colorscale='YlOrRd',
+            hovertemplate='<b>%{y}</b> - Hora %{x}:00<br>Roturas: %{z}<extra></extra>',
+            colorbar=dict(title="Roturas")
+        ))
+        
+        fig.update_layout(
+            title="Concentración de Roturas por Día y Hora",
+            xaxis_title="Hora del Día",
+            yaxis_title="Día de la Semana",
+            height=400,
+            template='plotly_white'
+        )
+        
+        return fig
+    
+    graficar('mapa_calor', (huella,), figura, use_container_width=True)
     
     # Recomendaciones
     st.markdown("#### 💡 Recomendaciones Operativas")
@@ -570,10 +735,10 @@ with tab3:
     
     with col2:
         # Períodos del día
-        madrugada = df[df['Hora'].between(0, 5)].shape[0]
-        manana = df[df['Hora'].between(6, 11)].shape[0]
-        tarde = df[df['Hora'].between(12, 17)].shape[0]
-        noche = df[df['Hora'].between(18, 23)].shape[0]
+        madrugada = hora_counts[0:6].sum()
+        manana = hora_counts[6:12].sum()
+        tarde = hora_counts[12:18].sum()
+        noche = hora_counts[18:24].sum()
         
         periodo_critico = max(
             [('Madrugada', madrugada), ('Mañana', manana), ('Tarde', tarde), ('Noche', noche)],
@@ -588,8 +753,8 @@ with tab3:
         """)
     
     with col3:
-        semana_laboral = df[df['Dia_Semana'].between(0, 4)].shape[0]
-        fin_semana = df[df['Dia_Semana'].between(5, 6)].shape[0]
+        semana_laboral = dia_counts[0:5].sum()
+        fin_semana = dia_counts[5:7].sum()
         ratio = semana_laboral / fin_semana if fin_semana > 0 else 0
         
         st.info(f"""
@@ -600,22 +765,44 @@ with tab3:
         """)
 
 # ============= TAB 4: DIAGNÓSTICO =============
-with tab4:
+@medidor.medida()
+def panel_diagnostico():
     st.markdown("### 🔬 Diagnóstico del Modelo SARIMA")
     
+    # Todo sale del artefacto de diagnóstico: la pestaña no ajusta ni recalcula pruebas
+    version = version_diagnostico()
+    diagnostico = cargar_diagnostico_modelo(version)
+    if diagnostico is None:
+        st.info(f"ℹ️ No se encontró '{RUTA_DIAGNOSTICO}'. Ejecuta `python diagnostico.py` para calcular el diagnóstico del modelo desplegado.")
+        return
+    
+    meta = diagnostico['meta']
+    modelo, pruebas, bt = meta['modelo'], meta['pruebas'], meta['backtest']
+    comparacion = pd.DataFrame(meta['comparacion'])
+    baseline = comparacion.iloc[0]
+    ljung_box, shapiro = pruebas['ljung_box'], pruebas['shapiro_wilk']
+    lb_aprobado = ljung_box['p'] > meta['alfa']
+    sw_aprobado = shapiro['p'] > meta['alfa']
+    reduccion_mae = (baseline['MAE'] - bt['MAE']) / baseline['MAE'] * 100
+    nombre_modelo = f"SARIMA{tuple(modelo['order'])}{tuple(modelo['seasonal_order'])}".replace(' ', '')
+    
+    artefacto = cargar_modelo(df_mensual, modelo_version)
+    if not corresponde(diagnostico, artefacto):
+        st.warning(f"⚠️ El diagnóstico corresponde al modelo con datos hasta {modelo['ultimo_mes']} y el modelo desplegado llega hasta {artefacto['meta']['ultimo_mes']}. Ejecuta `python diagnostico.py` para actualizarlo.")
+    
     col1, col2, col3 = st.columns(3, gap="medium")
     
     with col1:
-        st.metric("Precisión del Modelo", "79.69%", "+1.60%")
-        st.caption("Intervalo de Confianza 95%: [72.35%, 87.03%]")
+        st.metric("Precisión del Modelo", f"{bt['Precision']:.2f}%", f"{bt['Precision'] - baseline['Precision']:+.2f}%")
+        st.caption(f"Intervalo de Confianza 95%: [{bt['IC95_Precision'][0]:.2f}%, {bt['IC95_Precision'][1]:.2f}%]")
     
     with col2:
-        st.metric("Error Absoluto Medio (MAE)", "10.70", "-21.7%")
+        st.metric("Error Absoluto Medio (MAE)", f"{bt['MAE']:.2f}", f"{-reduccion_mae:+.1f}%")
         st.caption("Reducción vs baseline")
     
     with col3:
-        st.metric("Test Ljung-Box", "✅ APROBADO", "p = 0.9665")
-        st.caption("Sin autocorrelación en residuos")
+        st.metric("Test Ljung-Box", "✅ APROBADO" if lb_aprobado else "⚠️ NO APROBADO", f"p = {ljung_box['p']:.4f}")
+        st.caption("Sin autocorrelación en residuos" if lb_aprobado else "Autocorrelación en residuos")
     
     st.markdown("---")
     
@@ -627,7 +814,9 @@ with tab4:
         
         modelo_info = pd.DataFrame({
             'Parámetro': ['Orden (p,d,q)', 'Orden Estacional (P,D,Q,s)', 'Transformación', 'Validación', 'Ventanas de Validación'],
-            'Valor': ['(0, 1, 1)', '(0, 1, 1, 12)', 'Logarítmica (log1p)', 'Rolling Window', '14 ventanas']
+            'Valor': [str(tuple(modelo['order'])), str(tuple(modelo['seasonal_order'])),
+                      'Logarítmica (log1p)' if modelo['transformacion'] == 'log1p' else 'Ninguna',
+                      'Rolling Window', f"{bt['ventanas']} ventanas"]
         })
         
         st.dataframe(modelo_info, hide_index=True, use_container_width=True)
@@ -636,8 +825,10 @@ with tab4:
         
         validaciones = pd.DataFrame({
             'Test': ['Ljung-Box (Autocorrelación)', 'Shapiro-Wilk (Normalidad)', 'Media de Residuos'],
-            'Resultado': ['✅ Aprobado (p > 0.05)', '⚠️ No aprobado (outliers)', '✅ ≈ 0 (sin sesgo)'],
-            'p-value': ['0.9665', '0.0000', 'Media: 0.0267']
+            'Resultado': ['✅ Aprobado (p > 0.05)' if lb_aprobado else '⚠️ No aprobado (p < 0.05)',
+                          '✅ Aprobado (p > 0.05)' if sw_aprobado else '⚠️ No aprobado (outliers)',
+                          '✅ ≈ 0 (sin sesgo)' if abs(pruebas['media']) < 0.1 else '⚠️ Sesgo'],
+            'p-value': [f"{ljung_box['p']:.4f}", f"{shapiro['p']:.4f}", f"Media: {pruebas['media']:.4f}"]
         })
         
         st.dataframe(validaciones, hide_index=True, use_container_width=True)
@@ -645,51 +836,105 @@ with tab4:
     with col2:
         st.markdown("#### 🎯 Comparación de Modelos")
         
-        comparacion = pd.DataFrame({
-            'Modelo': ['Baseline', 'Óptimo', '+ Log', '+ Rolling'],
-            'Precisión': [78.09, 78.27, 78.20, 79.69],
-            'MAE': [13.67, 13.26, 13.22, 10.70]
-        })
-        
-        fig = go.Figure()
-        
-        fig.add_trace(go.Scatter(
-            x=comparacion['Modelo'],
-            y=comparacion['Precisión'],
-            mode='lines+markers',
-            name='Precisión (%)',
-            line=dict(color='#2E86AB', width=3),
-            marker=dict(size=10)
-        ))
-        
-        fig.update_layout(
-            title={
-                'text': "Evolución de Precisión",
-                'font': {'size': 14, 'color': '#2E86AB'}
-            },
-            yaxis_title="Precisión (%)",
-            height=350,
-            template='plotly_white',
-            showlegend=False,
-            margin=dict(l=50, r=30, t=50, b=50)
-        )
-        
-        st.plotly_chart(fig, use_container_width=True)
+        def figura():
+            fig = go.Figure()
+            
+            fig.add_trace(go.Scatter(
+                x=comparacion['Modelo'],
+                y=comparacion['Precision'].round(2),
+                mode='lines+markers',
+                name='Precisión (%)',
+                line=dict(color='#2E86AB', width=3),
+                marker=dict(size=10),
+                customdata=comparacion[['MAE', 'Configuracion', 'Evaluacion']],
+                hovertemplate='<b>%{x}</b><br>Precisión: %{y:.2f}%<br>MAE: %{customdata[0]:.2f}<br>%{customdata[1]} · %{customdata[2]}<extra></extra>'
+            ))
+            
+            fig.update_layout(
+                title={
+                    'text': "Evolución de Precisión",
+                    'font': {'size': 14, 'color': '#2E86AB'}
+                },
+                yaxis_title="Precisión (%)",
+                height=350,
+                template='plotly_white',
+                showlegend=False,
+                margin=dict(l=50, r=30, t=50, b=50)
+            )
+            
+            return fig
+        
+        graficar('precision', (version,), figura, use_container_width=True)
+    
+    with st.expander("📋 Métricas por ventana del backtest"):
+        folds = pd.DataFrame(meta['folds'])
+        st.dataframe(folds[['fold', 'fin_train', 'MAE', 'RMSE', 'MAPE']].rename(columns={
+            'fold': 'Ventana', 'fin_train': 'Entrenado hasta', 'MAPE': 'MAPE (%)'}).round(2),
+            hide_index=True, use_container_width=True)
+        st.caption(f"Ventanas expansivas desde {bt['min_train_size']} meses, horizonte de {bt['horizonte']} meses. "
+                   f"MAE {bt['MAE']:.2f} ± {bt['MAE_std']:.2f}")
+    
+    with st.expander("📉 Residuos del modelo"):
+        fechas_residuos = pd.period_range(meta['primer_mes'], periods=len(diagnostico['residuos']), freq='M').to_timestamp()
+        col1, col2 = st.columns(2, gap="large")
+        with col1:
+            def figura():
+                fig_res = go.Figure(traza_linea(fechas_residuos, diagnostico['residuos'], mode='lines',
+                                                line=dict(color='steelblue', width=1.5)))
+                fig_res.add_hline(y=0, line_dash='dash', line_color='red')
+                fig_res.update_layout(title="Residuos en el Tiempo", height=300, template='plotly_white',
+                                      margin=dict(l=50, r=30, t=50, b=40))
+                return fig_res
+            graficar('residuos', (version,), figura, use_container_width=True)
+        with col2:
+            def figura():
+                acf = diagnostico['acf'][1:]
+                banda = 1.96 / np.sqrt(len(diagnostico['residuos']))
+                fig_acf = go.Figure(go.Bar(x=np.arange(1, len(acf) + 1), y=acf, marker_color='#2E86AB'))
+                fig_acf.add_hline(y=banda, line_dash='dot', line_color='gray')
+                fig_acf.add_hline(y=-banda, line_dash='dot', line_color='gray')
+                fig_acf.update_layout(title="ACF de Residuos", xaxis_title="Rezago", height=300,
+                                      template='plotly_white', margin=dict(l=50, r=30, t=50, b=40))
+                return fig_acf
+            graficar('acf_residuos', (version,), figura, use_container_width=True)
+        st.caption(f"Residuos en escala del modelo ({modelo['transformacion'] or 'original'}): "
+                   f"desv. {pruebas['desviacion']:.2f}, rango [{pruebas['minimo']:.2f}, {pruebas['maximo']:.2f}]. "
+                   f"Diagnóstico calculado el {meta['calculado'][:10]}.")
     
     # Conclusión
     st.markdown("#### 💡 Conclusión del Diagnóstico")
     
-    st.success("""
-    **✅ El modelo SARIMA(0,1,1)(0,1,1,12) es ADECUADO para predicción operativa:**
-    
-    - ✅ **Ljung-Box aprobado:** Sin autocorrelación en residuos (modelo capturó toda la información)
-    - ✅ **Media de residuos ≈ 0:** Sin sesgo sistemático en las predicciones
-    - ✅ **Precisión 79.69%:** Supera benchmarks típicos para series con CV > 40% (70-75%)
-    - ✅ **Reducción MAE 21.7%:** Mejora significativa vs modelo baseline
-    - ⚠️ **Shapiro-Wilk no aprobado:** Esperado con outliers, no invalida el modelo
-    
-    **Recomendación:** Implementar en producción con actualización trimestral.
-    """)
+    hallazgos = [
+        f"- {'✅' if lb_aprobado else '⚠️'} **Ljung-Box {'aprobado' if lb_aprobado else 'no aprobado'}:** "
+        + ("Sin autocorrelación en residuos (modelo capturó toda la información)" if lb_aprobado
+           else "Queda autocorrelación en los residuos; revisar el orden del modelo"),
+        f"- {'✅' if abs(pruebas['media']) < 0.1 else '⚠️'} **Media de residuos {pruebas['media']:.4f}:** "
+        + ("Sin sesgo sistemático en las predicciones" if abs(pruebas['media']) < 0.1 else "Sesgo sistemático en las predicciones"),
+        f"- {'✅' if bt['Precision'] >= 70 else '⚠️'} **Precisión {bt['Precision']:.2f}%:** "
+        + ("Supera" if bt['Precision'] >= 70 else "Por debajo de") + " benchmarks típicos para series con CV > 40% (70-75%)",
+        f"- {'✅' if reduccion_mae > 0 else '⚠️'} **Reducción MAE {reduccion_mae:.1f}%:** "
+        + ("Mejora significativa vs modelo baseline" if reduccion_mae > 0 else "Sin mejora vs modelo baseline"),
+        f"- {'✅' if sw_aprobado else '⚠️'} **Shapiro-Wilk {'aprobado' if sw_aprobado else 'no aprobado'}:** "
+        + ("Residuos compatibles con normalidad" if sw_aprobado else "Esperado con outliers, no invalida el modelo"),
+    ]
+    adecuado = lb_aprobado and abs(pruebas['media']) < 0.1
+    mensaje = (f"**{'✅' if adecuado else '⚠️'} El modelo {nombre_modelo} "
+               f"{'es ADECUADO' if adecuado else 'requiere revisión'} para predicción operativa:**\n\n"
+               + "\n".join(hallazgos)
+               + "\n\n**Recomendación:** Implementar en producción con actualización mensual incremental (`python actualizacion.py`); los parámetros se re-estiman solo si los residuos muestran deriva.")
+    (st.success if adecuado else st.warning)(mensaje)
+
+with tab1:
+    panel_predicciones()
+
+with tab2:
+    panel_espacial()
+
+with tab3:
+    panel_temporal()
+
+with tab4:
+    panel_diagnostico()
 
 # ============= FOOTER =============
 st.markdown("---")
@@ -701,198 +946,45 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
+# ============= DIAGNÓSTICO DE RENDIMIENTO =============
+# Panel oculto: solo aparece con la medición activa y ?diagnostico=1 en la URL
+def parametro_url(nombre):
+    """Valor de un parámetro de la URL (st.query_params desde Streamlit 1.30)"""
+    if hasattr(st, 'query_params'):
+        return st.query_params.get(nombre)
+    valores = st.experimental_get_query_params().get(nombre)
+    return valores[0] if valores else None
 
-# ============= FUNCIÓN PARA GENERAR PDF =============
-def generar_pdf_reporte(df, df_predicciones, mes_seleccionado, top_n_barrios):
-    """
-    Genera un reporte PDF con los resultados del análisis
-    """
-    try:
-        from reportlab.lib.pagesizes import letter, A4
-        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak, Image
-        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-        from reportlab.lib.units import inch
-        from reportlab.lib import colors
-        from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_JUSTIFY
-        from datetime import datetime
-        import io
-        
-        # Crear buffer para el PDF
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=letter, topMargin=0.5*inch, bottomMargin=0.5*inch)
-        
-        # Estilos
-        styles = getSampleStyleSheet()
-        titulo_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=24,
-            textColor=colors.HexColor('#2E86AB'),
-            spaceAfter=30,
-            alignment=TA_CENTER,
-            fontName='Helvetica-Bold'
-        )
-        
-        subtitulo_style = ParagraphStyle(
-            'CustomSubtitle',
-            parent=styles['Heading2'],
-            fontSize=16,
-            textColor=colors.HexColor('#D90429'),
-            spaceAfter=12,
-            spaceBefore=12,
-            fontName='Helvetica-Bold'
-        )
-        
-        # Contenido
-        elementos = []
-        
-        # Portada
-        elementos.append(Spacer(1, 1.5*inch))
-        elementos.append(Paragraph("🔮 REPORTE DE PREDICCIÓN", titulo_style))
-        elementos.append(Paragraph("Roturas en Red de Gas de Bolívar", styles['Heading2']))
-        elementos.append(Spacer(1, 0.5*inch))
-        elementos.append(Paragraph(f"<b>Fecha de generación:</b> {datetime.now().strftime('%d de %B de %Y, %H:%M')}", styles['Normal']))
-        elementos.append(Paragraph("<b>Modelo:</b> SARIMA(0,1,1)(0,1,1,12)", styles['Normal']))
-        elementos.append(Paragraph(f"<b>Precisión:</b> 79.69% (±3.75%)", styles['Normal']))
-        elementos.append(Paragraph("<b>Universidad Tecnológica de Bolívar</b>", styles['Normal']))
-        
-        elementos.append(PageBreak())
-        
-        # Resumen Ejecutivo
-        elementos.append(Paragraph("1. RESUMEN EJECUTIVO", subtitulo_style))
-        
-        resumen_texto = f"""
-        El presente reporte presenta los resultados del modelo predictivo SARIMA aplicado a las roturas 
-        causadas por terceros en la red de gas de Bolívar. El modelo alcanzó una precisión del 79.69%, 
-        superando el benchmark esperado para series temporales con alta variabilidad.
-        <br/><br/>
-        <b>Métricas principales:</b><br/>
-        • Precisión: 79.69% (IC 95%: [72.35%, 87.03%])<br/>
-        • MAE: 10.70 roturas (reducción del 21.7% vs baseline)<br/>
-        • Total de observaciones históricas: {len(df):,} roturas (79 meses)<br/>
-        • Promedio mensual histórico: {df.groupby(pd.Grouper(key='Fecha de Creación', freq='M')).size().mean():.1f} roturas/mes
-        """
-        
-        elementos.append(Paragraph(resumen_texto, styles['Normal']))
-        elementos.append(Spacer(1, 0.3*inch))
-        
-        # Tabla de predicciones
-        elementos.append(Paragraph("2. PREDICCIONES PRÓXIMOS MESES", subtitulo_style))
-        
-        tabla_data = [['Mes', 'Predicción', 'IC Inferior', 'IC Superior']]
-        for _, row in df_predicciones.iterrows():
-            tabla_data.append([
-                row['Mes_Nombre'],
-                f"{row['Prediccion']:.0f}",
-                f"{row['IC_Inferior']:.0f}",
-                f"{row['IC_Superior']:.0f}"
-            ])
-        
-        tabla = Table(tabla_data, colWidths=[2.5*inch, 1.5*inch, 1.5*inch, 1.5*inch])
-        tabla.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2E86AB')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey])
-        ]))
-        
-        elementos.append(tabla)
-        elementos.append(Spacer(1, 0.3*inch))
-        
-        # Análisis por barrios
-        elementos.append(Paragraph("3. ANÁLISIS ESPACIAL", subtitulo_style))
-        
-        barrio_counts = df['Barrio'].value_counts().head(top_n_barrios)
-        total_meses = len(df.groupby(pd.Grouper(key='Fecha de Creación', freq='M')).size())
-        
-        tabla_barrios_data = [['Ranking', 'Barrio', 'Roturas', 'Prom/Mes', '% Total']]
-        total_roturas = len(df)
-        
-        for i, (barrio, count) in enumerate(barrio_counts.items(), 1):
-            promedio = count / total_meses
-            porcentaje = (count / total_roturas) * 100
-            nombre_corto = barrio[:35] + "..." if len(barrio) > 35 else barrio
-            tabla_barrios_data.append([
-                str(i),
-                nombre_corto,
-                str(count),
-                f"{promedio:.2f}",
-                f"{porcentaje:.1f}%"
-            ])
-        
-        tabla_barrios = Table(tabla_barrios_data, colWidths=[0.6*inch, 3*inch, 1*inch, 1*inch, 1*inch])
-        tabla_barrios.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#D90429')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey])
-        ]))
-        
-        elementos.append(tabla_barrios)
-        elementos.append(Spacer(1, 0.3*inch))
-        
-        # Recomendaciones
-        elementos.append(PageBreak())
-        elementos.append(Paragraph("4. RECOMENDACIONES OPERATIVAS", subtitulo_style))
-        
-        recomendaciones_texto = """
-        <b>4.1 Planificación de Recursos</b><br/>
-        • Incrementar recursos preventivos en meses de noviembre y diciembre (pico estacional)<br/>
-        • Mantener cuadrillas de respuesta rápida en barrios de mayor incidencia<br/>
-        • Programar mantenimiento preventivo en agosto-septiembre (baja incidencia)<br/><br/>
-        
-        <b>4.2 Vigilancia y Monitoreo</b><br/>
-        • Reforzar inspecciones en horario de 8:00-12:00 hrs (horario crítico)<br/>
-        • Priorizar días laborables (5x mayor incidencia vs fines de semana)<br/>
-        • Implementar sistema de alertas tempranas basado en predicciones<br/><br/>
-        
-        <b>4.3 Actualización del Modelo</b><br/>
-        • Re-entrenar modelo cada 3 meses con datos nuevos<br/>
-        • Incorporar variables exógenas (clima, festividades) para mejorar precisión<br/>
-        • Monitorear métricas de desempeño continuamente<br/><br/>
-        
-        <b>4.4 Inversión en Infraestructura</b><br/>
-        • Renovar tuberías en los 6 barrios de mayor riesgo identificados<br/>
-        • Implementar señalización preventiva en zonas críticas<br/>
-        • Coordinar con entidades de obras civiles para minimizar daños
-        """
-        
-        elementos.append(Paragraph(recomendaciones_texto, styles['Normal']))
-        
-        # Construir PDF
-        doc.build(elementos)
-        
-        # Guardar archivo
-        pdf_filename = f"reporte_prediccion_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-        buffer.seek(0)
-        
-        with open(pdf_filename, 'wb') as f:
-            f.write(buffer.read())
-        
-        # Botón de descarga en Streamlit
-        buffer.seek(0)
-        st.download_button(
-            label="📥 Descargar PDF",
-            data=buffer,
-            file_name=pdf_filename,
-            mime="application/pdf"
-        )
-        
-        return pdf_filename
-        
-    except ImportError:
-        st.warning("⚠️ La librería reportlab no está instalada. Instálala con: `pip install reportlab`")
-        return None
-    except Exception as e:
-        st.error(f"Error al generar PDF: {e}")
-        return None
+def panel_metricas():
+    """Tiempos por sección, aciertos de caché y reruns del proceso"""
+    datos = medidor.instantanea()
+    with st.expander("🩺 Diagnóstico de rendimiento", expanded=True):
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Reruns (proceso)", f"{datos['reruns']['total']:,}")
+        col2.metric("Sesiones", f"{datos['reruns']['sesiones']:,}")
+        col3.metric("Último script", f"{datos['secciones'].get('script', {}).get('ultimo_s', 0):.3f} s")
+
+        secciones = pd.DataFrame(datos['secciones']).T
+        if not secciones.empty:
+            st.markdown("**Secciones** (segundos)")
+            st.dataframe(secciones.sort_values('total_s', ascending=False), use_container_width=True)
+
+        caches = pd.DataFrame(datos['caches']).T
+        if not caches.empty:
+            caches['% aciertos'] = 100 * caches['aciertos'] / caches['llamadas']
+            st.markdown("**Funciones cacheadas**")
+            st.dataframe(caches, use_container_width=True)
+
+        figuras = cache_figuras().estadisticas()
+        st.caption(f"Caché de figuras: {figuras['figuras']} figuras, {figuras['bytes'] / 2 ** 20:.1f} de "
+                   f"{figuras['presupuesto'] / 2 ** 20:.0f} MB, {figuras['aciertos']:,} aciertos y {figuras['fallos']:,} fallos")
+
+        st.download_button("⬇️ Métricas (Prometheus)", medidor.prometheus(), file_name="metricas.prom")
+        if st.button("🔄 Reiniciar métricas", key="metricas_reiniciar"):
+            medidor.reiniciar()
+
+if medidor.habilitado:
+    medidor.registrar('script', time.perf_counter() - inicio_script)
+    medidor.exportar()
+    if parametro_url('diagnostico') in ('1', 'true', 'si'):
+        panel_metricas()
@@ -0,0 +1,250 @@
+"""
+💾 Carga de Datos con Caché Columnar - Predicción de Roturas en Red de Gas
+Universidad Tecnológica de Bolívar
+
+Lee el Excel de incidencias, lo limpia y guarda el DataFrame resultante en
+un archivo Parquet. Las siguientes cargas leen el Parquet directamente y solo
+se vuelve a procesar el Excel cuando el archivo fuente cambia.
+
+Uso desde la línea de comandos (por ejemplo, durante el despliegue):
+
+    python datos.py                      # construye la caché si no está vigente
+    python datos.py --forzar             # reconstruye la caché siempre
+    python datos.py --ruta otro.xlsx     # usa otro archivo fuente
+    python datos.py --memoria            # memoria por columna del DataFrame cargado
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+import warnings
+
+import pandas as pd
+
+from esquema import (TIPOS_CALENDARIO, aplicar_esquema, columna_mes_nombre, filas_invalidas,
+                     parsear_fechas, reporte_memoria)
+
+RUTA_EXCEL = 'Copia de base_datos.xlsx'
+DIR_CACHE = '.cache'
+
+# Versión del formato de la caché: incrementar si cambia la limpieza
+VERSION_CACHE = 2
+
+
+# ============= LIMPIEZA =============
+def agregar_variables_temporales(df):
+    """
+    Agrega las columnas Año, Mes, Mes_Nombre, Dia_Semana y Hora con tipos
+    compactos; Mes_Nombre es una categórica con los nombres en español
+    """
+    fechas = df['Fecha de Creación'].dt
+    df['Año'] = fechas.year.astype(TIPOS_CALENDARIO['Año'])
+    df['Mes'] = fechas.month.astype(TIPOS_CALENDARIO['Mes'])
+    df['Mes_Nombre'] = columna_mes_nombre(df['Mes'])
+    df['Dia_Semana'] = fechas.dayofweek.astype(TIPOS_CALENDARIO['Dia_Semana'])
+    df['Hora'] = fechas.hour.astype(TIPOS_CALENDARIO['Hora'])
+    return df
+
+
+def limpiar_datos(df):
+    """
+    Limpia el DataFrame crudo del Excel, agrega las variables temporales y
+    aplica el esquema tipado. Las filas cuya fecha no se puede leer se
+    descartan con un aviso; sus ejemplos quedan en ``df.attrs['fechas_invalidas']``.
+    """
+    df.columns = df.columns.str.strip()
+    fechas, invalidas = parsear_fechas(df['Fecha de Creación'])
+    df['Fecha de Creación'] = fechas
+    if len(invalidas):
+        ejemplos = ', '.join(map(str, filas_invalidas(invalidas, 5)))
+        warnings.warn(f"{len(invalidas):,} filas sin 'Fecha de Creación' válida descartadas "
+                      f"(filas {ejemplos}{'...' if len(invalidas) > 5 else ''})")
+        df = df[fechas.notna()]
+    df = df.sort_values('Fecha de Creación')
+
+    # Columnas de texto con tipos mezclados (p. ej. 'Diámetro' con números y
+    # textos) se normalizan a texto para que el formato columnar las acepte
+    for col in df.columns:
+        if df[col].dtype == object:
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+
+    df = aplicar_esquema(agregar_variables_temporales(df))
+    df.attrs['fechas_invalidas'] = {'total': len(invalidas), 'ejemplos': filas_invalidas(invalidas)}
+    return df
+
+
+def serie_mensual(df):
+    """Agrupa las roturas por mes (serie usada por el modelo SARIMA)"""
+    df_mensual = df.groupby(pd.Grouper(key='Fecha de Creación', freq='M')).size()
+    return pd.DataFrame(df_mensual, columns=['Num_Roturas'])
+
+
+def cargar_excel(ruta=RUTA_EXCEL):
+    """Lee y limpia el Excel sin pasar por la caché"""
+    return limpiar_datos(pd.read_excel(ruta))
+
+
+# ============= CACHÉ PARQUET =============
+def _hash_contenido(ruta, tam_bloque=1 << 20):
+    """SHA-256 del contenido del archivo, leído por bloques"""
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(tam_bloque), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def huella_archivo(ruta, con_hash=True):
+    """Identifica una versión del archivo fuente: ruta, tamaño, mtime y hash"""
+    info = os.stat(ruta)
+    huella = {
+        'ruta': os.path.abspath(ruta),
+        'tamano': info.st_size,
+        'mtime_ns': info.st_mtime_ns,
+        'version': VERSION_CACHE,
+    }
+    if con_hash:
+        huella['sha256'] = _hash_contenido(ruta)
+    return huella
+
+
+def huella_datos(df, columnas=('Fecha de Creación', 'Barrio', 'Distrito')):
+    """Huella del contenido ya cargado (sirve también para datos simulados)"""
+    columnas = [c for c in columnas if c in df.columns]
+    h = hashlib.sha256()
+    h.update(pd.util.hash_pandas_object(df[columnas], index=False).to_numpy().tobytes())
+    return h.hexdigest()[:16]
+
+
+def rutas_cache(ruta, dir_cache=DIR_CACHE):
+    """Rutas del Parquet y de sus metadatos para un archivo fuente"""
+    clave = hashlib.sha1(os.path.abspath(ruta).encode('utf-8')).hexdigest()[:12]
+    base = os.path.join(dir_cache, f"incidencias_{clave}")
+    return base + '.parquet', base + '.json'
+
+
+def _leer_meta(ruta_meta):
+    try:
+        with open(ruta_meta, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _guardar_meta(ruta_meta, meta):
+    with open(ruta_meta, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+
+
+def _escribir_atomico(ruta_destino, escribir):
+    """Escribe en un temporal y lo renombra, para no dejar archivos a medias"""
+    temporal = f"{ruta_destino}.{os.getpid()}.tmp"
+    try:
+        escribir(temporal)
+        os.replace(temporal, ruta_destino)
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+
+
+def cache_vigente(ruta, dir_cache=DIR_CACHE):
+    """
+    Indica si la caché corresponde al archivo fuente actual.
+
+    Si coinciden ruta, tamaño y mtime no se calcula el hash. Si solo cambió
+    el mtime (p. ej. tras copiar el archivo) se compara el hash del contenido
+    y, si coincide, se actualizan los metadatos sin reconstruir.
+    """
+    ruta_parquet, ruta_meta = rutas_cache(ruta, dir_cache)
+    meta = _leer_meta(ruta_meta)
+    if meta is None or not os.path.exists(ruta_parquet):
+        return False
+
+    actual = huella_archivo(ruta, con_hash=False)
+    if all(meta.get(k) == v for k, v in actual.items()):
+        return True
+    if meta.get('tamano') != actual['tamano'] or meta.get('version') != VERSION_CACHE:
+        return False
+
+    actual['sha256'] = _hash_contenido(ruta)
+    if meta.get('sha256') != actual['sha256']:
+        return False
+
+    _escribir_atomico(ruta_meta, lambda tmp: _guardar_meta(tmp, {**meta, **actual}))
+    return True
+
+
+def construir_cache(ruta=RUTA_EXCEL, dir_cache=DIR_CACHE):
+    """Procesa el Excel y guarda el DataFrame limpio en Parquet"""
+    huella = huella_archivo(ruta)
+    df = cargar_excel(ruta)
+
+    os.makedirs(dir_cache, exist_ok=True)
+    ruta_parquet, ruta_meta = rutas_cache(ruta, dir_cache)
+    _escribir_atomico(ruta_parquet, lambda tmp: df.to_parquet(tmp, index=False))
+    _escribir_atomico(ruta_meta, lambda tmp: _guardar_meta(
+        tmp, {**huella, 'filas': len(df), 'fechas_invalidas': df.attrs.get('fechas_invalidas')}))
+    return df
+
+
+def cargar_incidencias(ruta=RUTA_EXCEL, dir_cache=DIR_CACHE):
+    """
+    Carga el DataFrame limpio de incidencias.
+
+    Usa la caché Parquet cuando está vigente y la reconstruye en caso
+    contrario. Si pyarrow no está instalado se lee el Excel directamente.
+    Lanza FileNotFoundError si el archivo fuente no existe.
+    """
+    if not os.path.exists(ruta):
+        raise FileNotFoundError(ruta)
+
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return cargar_excel(ruta)
+
+    if cache_vigente(ruta, dir_cache):
+        ruta_parquet, _ = rutas_cache(ruta, dir_cache)
+        # Las cadenas se guardan como 'string': se restauran sobre Arrow
+        with pd.option_context('mode.string_storage', 'pyarrow'):
+            return pd.read_parquet(ruta_parquet)
+    return construir_cache(ruta, dir_cache)
+
+
+# ============= CLI =============
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Construye la caché Parquet de incidencias a partir del Excel"
+    )
+    parser.add_argument('--ruta', default=RUTA_EXCEL, help="Archivo Excel de origen")
+    parser.add_argument('--dir-cache', default=DIR_CACHE, help="Directorio de la caché")
+    parser.add_argument('--forzar', action='store_true', help="Reconstruir aunque esté vigente")
+    parser.add_argument('--memoria', action='store_true', help="Mostrar la memoria por columna del DataFrame cargado")
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    if not args.forzar and cache_vigente(args.ruta, args.dir_cache):
+        print(f"✅ Caché vigente para '{args.ruta}'")
+        df = cargar_incidencias(args.ruta, args.dir_cache) if args.memoria else None
+    else:
+        df = construir_cache(args.ruta, args.dir_cache)
+        ruta_parquet, _ = rutas_cache(args.ruta, args.dir_cache)
+        print(f"✅ Caché construida: {ruta_parquet} ({len(df):,} registros, "
+              f"{time.perf_counter() - inicio:.2f} s)")
+        invalidas = df.attrs['fechas_invalidas']
+        if invalidas['total']:
+            print(f"⚠️ {invalidas['total']:,} filas con fecha inválida descartadas:")
+            for fila, valor in invalidas['ejemplos'].items():
+                print(f"   fila {fila}: {valor!r}")
+
+    if args.memoria:
+        reporte = reporte_memoria(df)
+        print(reporte.to_string(float_format=lambda x: f"{x:,.2f}"))
+        print(f"Total: {reporte['MB'].sum():,.2f} MB")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,244 @@
+"""
+🔬 Diagnóstico del Modelo - Predicción de Roturas en Red de Gas
+Universidad Tecnológica de Bolívar
+
+Calcula fuera de línea todo lo que muestra la pestaña de diagnóstico del
+dashboard para el modelo desplegado (``modelos/sarima_final.npz``) y lo
+guarda en un artefacto compacto (``modelos/diagnostico.npz``):
+- residuos y valores ajustados del modelo con sus parámetros (sin
+  re-estimarlos) y la ACF de los residuos
+- pruebas de Ljung-Box (autocorrelación) y Shapiro-Wilk (normalidad)
+- métricas de cada ventana del backtest rolling window y su resumen
+- la comparación de modelos del notebook: baseline SARIMA(1,1,1)(1,1,1,12),
+  orden óptimo, + log1p (los tres sobre los últimos 6 meses) y + rolling
+  window
+
+El dashboard solo lee el artefacto: abrir la pestaña no ajusta modelos ni
+repite pruebas. ``python pronostico.py`` y ``python actualizacion.py`` lo
+regeneran cada vez que guardan el modelo; los ajustes y las ventanas del
+backtest salen de la caché de ajustes si ya se calcularon.
+
+Uso desde la línea de comandos:
+
+    python diagnostico.py                        # recalcula para el modelo desplegado
+    python diagnostico.py --mostrar              # imprime el artefacto guardado
+"""
+
+import argparse
+import json
+import os
+import time
+import warnings
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from pronostico import RUTA_ARTEFACTO, ajustar_modelo, cargar_artefacto, escala_modelo, guardar_artefacto
+from validacion import backtest, resumen_backtest
+
+RUTA_DIAGNOSTICO = os.path.join('modelos', 'diagnostico.npz')
+
+# Versión del formato del artefacto de diagnóstico
+VERSION_DIAGNOSTICO = 1
+
+# Configuración del notebook (celdas 10, 18 y 33)
+ORDEN_BASELINE = (1, 1, 1)
+ORDEN_ESTACIONAL_BASELINE = (1, 1, 1, 12)
+MESES_TEST = 6
+MIN_TRAIN_SIZE = 60
+HORIZONTE = 6
+REZAGOS_LJUNG_BOX = 10
+REZAGOS_ACF = 20
+ALFA = 0.05
+
+
+# ============= MÉTRICAS =============
+def metricas_test(real, prediccion):
+    """Precisión (100 - MAPE sin meses en cero), MAE y RMSE como en el notebook"""
+    real = np.asarray(real, dtype=float)
+    prediccion = np.asarray(prediccion, dtype=float)
+    no_cero = real != 0
+    mape = float(np.mean(np.abs((real[no_cero] - prediccion[no_cero]) / real[no_cero])) * 100) if no_cero.any() else 0.0
+    return {'Precision': 100 - mape, 'MAE': float(np.mean(np.abs(real - prediccion))),
+            'RMSE': float(np.sqrt(np.mean((real - prediccion) ** 2))), 'MAPE': mape}
+
+
+def comparar_modelos(serie, order, seasonal_order, resumen_rolling, meses_test=MESES_TEST, cache=None):
+    """
+    Filas de la comparación del notebook (celda 20): baseline, orden óptimo
+    y + log1p evaluados sobre los últimos ``meses_test`` meses, y el
+    resumen del backtest rolling window.
+    """
+    train, test = serie[:-meses_test], serie[-meses_test:]
+    modelos = [
+        ('Baseline', ORDEN_BASELINE, ORDEN_ESTACIONAL_BASELINE, None),
+        ('Óptimo', order, seasonal_order, None),
+        ('+ Log', order, seasonal_order, 'log1p'),
+    ]
+    filas = []
+    for nombre, orden, estacional, transformacion in modelos:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            resultado = ajustar_modelo(train, orden, estacional, transformacion, cache=cache)
+        prediccion = np.asarray(resultado.forecast(steps=meses_test), dtype=float)
+        if transformacion == 'log1p':
+            prediccion = np.expm1(prediccion)
+        filas.append({'Modelo': nombre, 'Configuracion': f"SARIMA{tuple(orden)}{tuple(estacional)}",
+                      'Evaluacion': f"Últimos {meses_test} meses", **metricas_test(test, prediccion)})
+    filas.append({'Modelo': '+ Rolling', 'Configuracion': filas[-1]['Configuracion'],
+                  'Evaluacion': f"{resumen_rolling['ventanas']} ventanas",
+                  **{k: resumen_rolling[k] for k in ('Precision', 'MAE', 'RMSE', 'MAPE')}})
+    return filas
+
+
+# ============= RESIDUOS =============
+def pruebas_residuos(residuos, rezagos=REZAGOS_LJUNG_BOX):
+    """Ljung-Box, Shapiro-Wilk y estadísticas descriptivas de los residuos"""
+    from scipy import stats
+    from statsmodels.stats.diagnostic import acorr_ljungbox
+
+    residuos = np.asarray(residuos, dtype=float)
+    ljung_box = acorr_ljungbox(residuos, lags=[rezagos], return_df=True)
+    shapiro = stats.shapiro(residuos)
+    return {
+        'ljung_box': {'rezagos': rezagos, 'estadistico': float(ljung_box['lb_stat'].iloc[0]),
+                      'p': float(ljung_box['lb_pvalue'].iloc[0])},
+        'shapiro_wilk': {'estadistico': float(shapiro.statistic), 'p': float(shapiro.pvalue)},
+        'media': float(residuos.mean()),
+        'desviacion': float(residuos.std(ddof=1)),
+        'minimo': float(residuos.min()),
+        'maximo': float(residuos.max()),
+    }
+
+
+def residuos_modelo(artefacto, serie):
+    """Residuos y valores ajustados del modelo del artefacto, filtrando con sus parámetros"""
+    from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+    meta = artefacto['meta']
+    modelo = SARIMAX(escala_modelo(serie.to_numpy(dtype=float), meta['transformacion']),
+                     order=tuple(meta['order']), seasonal_order=tuple(meta['seasonal_order']))
+    resultado = modelo.filter(artefacto['parametros'])
+    return np.asarray(resultado.resid, dtype=float), np.asarray(resultado.fittedvalues, dtype=float)
+
+
+# ============= ARTEFACTO =============
+def calcular_diagnostico(artefacto, serie, meses_test=MESES_TEST, min_train_size=MIN_TRAIN_SIZE,
+                         horizon=HORIZONTE, max_workers=None, cache=None):
+    """
+    Diagnóstico completo del modelo del artefacto sobre la serie mensual
+    (indexada por fecha de fin de mes, como ``datos.serie_mensual``), hasta
+    el último mes incorporado al modelo.
+    """
+    from statsmodels.tsa.stattools import acf
+
+    meta_modelo = artefacto['meta']
+    order, seasonal_order = tuple(meta_modelo['order']), tuple(meta_modelo['seasonal_order'])
+    transformacion = meta_modelo['transformacion']
+    ultimo_mes = pd.Period(meta_modelo['ultimo_mes'], freq='M')
+    serie = serie[serie.index.to_period('M') <= ultimo_mes]
+
+    residuos, ajustados = residuos_modelo(artefacto, serie)
+    df_folds = backtest(serie, order, seasonal_order, min_train_size=min_train_size, horizon=horizon,
+                        transformacion=transformacion, max_workers=max_workers, cache=cache)
+    resumen = resumen_backtest(df_folds)
+    folds = [{'fold': int(f['fold']), 'fin_train': str(pd.Timestamp(f['fin_train']).to_period('M')),
+              'estado': f['estado'], 'MAE': float(f['MAE']), 'RMSE': float(f['RMSE']), 'MAPE': float(f['MAPE'])}
+             for _, f in df_folds.iterrows()]
+
+    meta = {
+        'version': VERSION_DIAGNOSTICO,
+        'modelo': {'order': list(order), 'seasonal_order': list(seasonal_order),
+                   'transformacion': transformacion, 'ultimo_mes': meta_modelo['ultimo_mes'],
+                   'estimado_hasta': meta_modelo['estimado_hasta'],
+                   'parametros': [float(p) for p in artefacto['parametros']]},
+        'primer_mes': str(serie.index[0].to_period('M')),
+        'pruebas': pruebas_residuos(residuos),
+        'alfa': ALFA,
+        'backtest': {'min_train_size': min_train_size, 'horizonte': horizon, 'ventana': 'expansiva', **resumen},
+        'folds': folds,
+        'comparacion': comparar_modelos(serie, order, seasonal_order, resumen, meses_test, cache),
+        'calculado': datetime.now().isoformat(timespec='seconds'),
+    }
+    return {
+        'meta': meta,
+        'residuos': residuos,
+        'ajustados': ajustados,
+        'acf': acf(residuos, nlags=min(REZAGOS_ACF, len(residuos) - 1), fft=True),
+    }
+
+
+def guardar_diagnostico(diagnostico, ruta=RUTA_DIAGNOSTICO):
+    """Guarda el diagnóstico con el mismo formato que el artefacto del modelo"""
+    guardar_artefacto(diagnostico, ruta)
+
+
+def cargar_diagnostico(ruta=RUTA_DIAGNOSTICO):
+    """Carga un diagnóstico guardado con guardar_diagnostico"""
+    with np.load(ruta, allow_pickle=False) as datos_npz:
+        diagnostico = {k: datos_npz[k] for k in datos_npz.files if k != 'meta'}
+        diagnostico['meta'] = json.loads(str(datos_npz['meta']))
+    if diagnostico['meta'].get('version') != VERSION_DIAGNOSTICO:
+        raise ValueError(f"Versión de diagnóstico no soportada: {diagnostico['meta'].get('version')}")
+    return diagnostico
+
+
+def corresponde(diagnostico, artefacto):
+    """Indica si el diagnóstico se calculó para este modelo (mismos órdenes, parámetros y meses)"""
+    modelo, meta = diagnostico['meta']['modelo'], artefacto['meta']
+    return (modelo['order'] == list(meta['order']) and modelo['seasonal_order'] == list(meta['seasonal_order'])
+            and modelo['ultimo_mes'] == meta['ultimo_mes']
+            and np.allclose(modelo['parametros'], artefacto['parametros'], rtol=0, atol=1e-12))
+
+
+def actualizar_diagnostico(artefacto, serie, ruta=RUTA_DIAGNOSTICO, **opciones):
+    """Recalcula y guarda el diagnóstico del modelo; lo usan los CLI que guardan el modelo"""
+    diagnostico = calcular_diagnostico(artefacto, serie, **opciones)
+    guardar_diagnostico(diagnostico, ruta)
+    return diagnostico
+
+
+# ============= CLI =============
+def _imprimir(diagnostico):
+    meta = diagnostico['meta']
+    modelo, pruebas, bt = meta['modelo'], meta['pruebas'], meta['backtest']
+    print(f"🔬 SARIMA{tuple(modelo['order'])}{tuple(modelo['seasonal_order'])} "
+          f"({modelo['transformacion'] or 'sin transformación'}), datos {meta['primer_mes']} a {modelo['ultimo_mes']}")
+    print(f"   Ljung-Box (rezago {pruebas['ljung_box']['rezagos']}): p = {pruebas['ljung_box']['p']:.4f}")
+    print(f"   Shapiro-Wilk: p = {pruebas['shapiro_wilk']['p']:.4f}")
+    print(f"   Media de residuos: {pruebas['media']:.4f} (desv. {pruebas['desviacion']:.2f})")
+    print(f"   Rolling window ({bt['ventanas']} ventanas): precisión {bt['Precision']:.2f}% "
+          f"(IC 95%: [{bt['IC95_Precision'][0]:.2f}%, {bt['IC95_Precision'][1]:.2f}%]), MAE {bt['MAE']:.2f}")
+    print(f"\n{'Modelo':<12} {'Precisión':>10} {'MAE':>8}")
+    print("-" * 32)
+    for fila in meta['comparacion']:
+        print(f"{fila['Modelo']:<12} {fila['Precision']:>9.2f}% {fila['MAE']:>8.2f}")
+
+
+def main(argv=None):
+    from datos import RUTA_EXCEL, cargar_incidencias, serie_mensual
+
+    parser = argparse.ArgumentParser(description="Calcula el artefacto de diagnóstico del modelo desplegado")
+    parser.add_argument('--ruta', default=RUTA_EXCEL, help="Archivo Excel de origen")
+    parser.add_argument('--artefacto', default=RUTA_ARTEFACTO, help="Ruta del artefacto del modelo")
+    parser.add_argument('--salida', default=RUTA_DIAGNOSTICO, help="Ruta del artefacto de diagnóstico")
+    parser.add_argument('--workers', type=int, default=None, help="Procesos para el backtest")
+    parser.add_argument('--mostrar', action='store_true', help="Solo imprimir el diagnóstico guardado")
+    args = parser.parse_args(argv)
+
+    if args.mostrar:
+        _imprimir(cargar_diagnostico(args.salida))
+        return 0
+
+    inicio = time.perf_counter()
+    serie = serie_mensual(cargar_incidencias(args.ruta))['Num_Roturas']
+    diagnostico = actualizar_diagnostico(cargar_artefacto(args.artefacto), serie, args.salida,
+                                         max_workers=args.workers)
+    _imprimir(diagnostico)
+    print(f"\n✅ Diagnóstico guardado en: {args.salida} ({time.perf_counter() - inicio:.2f} s)")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
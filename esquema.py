@@ -0,0 +1,107 @@
+"""
+📐 Esquema Tipado de Incidencias - Predicción de Roturas en Red de Gas
+Universidad Tecnológica de Bolívar
+
+Define los tipos del DataFrame de incidencias para que ocupe poca memoria en
+cada proceso de Streamlit y se agrupe rápido:
+- fechas leídas con un formato fijo, informando las filas que no se pueden leer
+- columnas de ubicación y atributos repetidos como categóricas
+- texto libre en cadenas de Arrow (si pyarrow está instalado)
+- campos de calendario en enteros pequeños (int16 para el año, int8 el resto)
+- nombre del mes como categórica sobre una tabla de 12 nombres en español
+- reporte de memoria por columna del DataFrame cargado
+"""
+
+import numpy as np
+import pandas as pd
+
+FORMATO_FECHA = '%Y-%m-%d %H:%M:%S'
+
+# Columnas de texto con pocos valores distintos que se repiten fila a fila
+COLUMNAS_CATEGORICAS = ('Distrito', 'Localidad', 'Barrio', 'Sector Operativo',
+                        'Segmento del incidente', 'Diámetro')
+
+# Texto libre: casi todos los valores son distintos, una categórica no ahorra
+COLUMNAS_TEXTO = ('Dirección', 'Observaciones Emergencia')
+
+TIPOS_CALENDARIO = {'Año': np.int16, 'Mes': np.int8, 'Dia_Semana': np.int8, 'Hora': np.int8}
+
+MESES_ES = ('Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio',
+            'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre')
+
+# Filas inválidas que se guardan como ejemplo en los metadatos de la caché
+MAX_EJEMPLOS_INVALIDOS = 20
+
+
+# ============= FECHAS =============
+def parsear_fechas(valores, formato=FORMATO_FECHA):
+    """
+    Convierte la columna de fechas con un formato fijo.
+
+    Devuelve ``(fechas, invalidas)``: la serie datetime64 (NaT donde no se
+    pudo leer) y una serie con el valor original de las filas vacías o que
+    no cumplen el formato, indexada como la entrada. Si la columna ya es
+    datetime (p. ej. celdas de fecha de Excel) no se vuelve a convertir.
+    """
+    if pd.api.types.is_datetime64_any_dtype(valores):
+        fechas = valores
+    else:
+        fechas = pd.to_datetime(valores, format=formato, errors='coerce')
+    return fechas, valores[fechas.isna()]
+
+
+def filas_invalidas(invalidas, maximo=MAX_EJEMPLOS_INVALIDOS):
+    """Ejemplos de filas inválidas como ``{fila: valor}`` (fila 1 = encabezado del archivo)"""
+    return {int(i) + 2: (None if pd.isna(v) else str(v)) for i, v in invalidas.iloc[:maximo].items()}
+
+
+# ============= CALENDARIO =============
+def nombre_mes(mes):
+    """Nombre en español del mes (1-12)"""
+    return MESES_ES[mes - 1]
+
+
+def columna_mes_nombre(meses):
+    """Categórica de nombres de mes a partir de los números 1-12 (tabla de 12 entradas)"""
+    return pd.Categorical.from_codes(np.asarray(meses, dtype=np.int8) - 1, categories=MESES_ES, ordered=True)
+
+
+# ============= TIPOS =============
+def _tipo_texto():
+    """Cadenas de Arrow si pyarrow está instalado; si no, se deja object"""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return None
+    return pd.StringDtype('pyarrow')
+
+
+def aplicar_esquema(df):
+    """
+    Convierte a categóricas las columnas de ``COLUMNAS_CATEGORICAS``, el
+    texto libre a cadenas de Arrow y los campos de calendario a sus tipos
+    compactos. Las columnas ausentes se ignoran, de modo que sirve para
+    extractos del DataFrame.
+    """
+    for col in COLUMNAS_CATEGORICAS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    tipo_texto = _tipo_texto()
+    for col in COLUMNAS_TEXTO:
+        if tipo_texto is not None and col in df.columns and df[col].dtype == object:
+            df[col] = df[col].astype(tipo_texto)
+    for col, tipo in TIPOS_CALENDARIO.items():
+        if col in df.columns:
+            df[col] = df[col].astype(tipo)
+    return df
+
+
+def reporte_memoria(df):
+    """Memoria por columna (MB y % del total) y tipo, de mayor a menor"""
+    bytes_col = df.memory_usage(deep=True, index=True)
+    reporte = pd.DataFrame({
+        'Tipo': [str(df[c].dtype) if c in df.columns else 'índice' for c in bytes_col.index],
+        'MB': bytes_col.to_numpy() / 1e6,
+    }, index=bytes_col.index)
+    reporte['%'] = 100 * reporte['MB'] / reporte['MB'].sum()
+    return reporte.sort_values('MB', ascending=False)
@@ -0,0 +1,219 @@
+"""
+📊 Capa de Figuras del Dashboard - Predicción de Roturas en Red de Gas
+Universidad Tecnológica de Bolívar
+
+Construcción y envío de las figuras Plotly del dashboard:
+- cada figura se construye una vez por combinación de parámetros y se
+  guarda el ``go.Figure`` ya armado: una ejecución repetida lo envía con
+  ``st.plotly_chart`` sin volver a agregar datos, reducir series ni validar
+  las trazas
+- las series largas se reducen en el servidor con LTTB (Largest Triangle
+  Three Buckets) a la resolución visible de la gráfica, conservando picos
+  y valles
+- las trazas que siguen siendo grandes se dibujan con ``Scattergl`` (WebGL)
+  en vez de SVG
+
+La caché es única por proceso y la comparten todas las sesiones; las
+figuras guardadas no se modifican después de construirlas. Se limita por
+tamaño (el de la figura serializada) con desalojo LRU. Se configura con
+variables de entorno:
+
+    DASHBOARD_FIGURAS=0          desactiva la caché
+    DASHBOARD_FIGURAS_MB=64      presupuesto de memoria en MB
+"""
+
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+PRESUPUESTO_MB = 64
+
+# Puntos por traza tras la reducción: del orden del ancho de la gráfica en píxeles
+PUNTOS_VISIBLES = 1200
+# Trazas con más puntos que esto se dibujan con WebGL. Es mayor que
+# PUNTOS_VISIBLES porque los navegadores limitan los contextos WebGL por
+# página: las trazas ya reducidas siguen en SVG y WebGL queda para las que
+# no se reducen (``puntos=None``)
+UMBRAL_WEBGL = 2000
+
+# Argumentos de una traza alineados punto a punto con x e y
+ALINEADOS = ('customdata', 'text', 'hovertext')
+
+
+# ============= REDUCCIÓN LTTB =============
+def lttb(x, y, puntos):
+    """
+    Índices de los ``puntos`` puntos que elige LTTB (Steinarsson, 2013).
+
+    El primer y el último punto se conservan; el resto se divide en
+    ``puntos - 2`` cubetas y de cada una se toma el punto que forma el
+    triángulo de mayor área con el punto elegido en la cubeta anterior y el
+    promedio de la siguiente. Los promedios de todas las cubetas salen de
+    sumas acumuladas; el recorrido es un bucle por cubeta con operaciones
+    vectorizadas dentro de ella.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if puntos >= n or puntos < 3:
+        return np.arange(n)
+
+    bordes = np.linspace(1, n - 1, puntos - 1).astype(np.int64)
+    inicio, fin = bordes[:-1], bordes[1:]
+    suma_x = np.concatenate([[0.0], np.cumsum(x)])
+    suma_y = np.concatenate([[0.0], np.cumsum(np.nan_to_num(y))])
+    tamanos = fin - inicio
+    # Promedio de la cubeta siguiente; la de la última cubeta es el último punto
+    siguiente_x = np.append(((suma_x[fin] - suma_x[inicio]) / tamanos)[1:], x[-1])
+    siguiente_y = np.append(((suma_y[fin] - suma_y[inicio]) / tamanos)[1:], y[-1])
+
+    indices = np.empty(puntos, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for i in range(puntos - 2):
+        xs, ys = x[inicio[i]:fin[i]], y[inicio[i]:fin[i]]
+        area = np.abs((x[a] - siguiente_x[i]) * (ys - y[a]) - (x[a] - xs) * (siguiente_y[i] - y[a]))
+        a = inicio[i] + int(np.argmax(np.nan_to_num(area, nan=-1.0)))
+        indices[i + 1] = a
+    return indices
+
+
+def _numerico(x):
+    """Eje x como números para calcular áreas (fechas en nanosegundos)"""
+    x = pd.Index(x)
+    if isinstance(x, pd.DatetimeIndex):
+        return x.asi8.astype(float)
+    if pd.api.types.is_numeric_dtype(x):
+        return x.to_numpy(dtype=float)
+    return np.arange(len(x), dtype=float)
+
+
+def traza_linea(x, y, puntos=PUNTOS_VISIBLES, umbral_webgl=UMBRAL_WEBGL, **kwargs):
+    """
+    ``go.Scatter`` de una serie, reducida con LTTB a ``puntos`` si es más
+    larga (``puntos=None`` no reduce) y como ``go.Scattergl`` si aún
+    supera ``umbral_webgl`` puntos. Los argumentos de ``ALINEADOS`` con un
+    valor por punto se reducen con los mismos índices.
+    """
+    import plotly.graph_objects as go
+
+    x = pd.Index(x)
+    y = np.asarray(y)
+    if puntos is not None and len(x) > puntos:
+        indices = lttb(_numerico(x), y, puntos)
+        for nombre in ALINEADOS:
+            valor = kwargs.get(nombre)
+            if valor is not None and not isinstance(valor, str) and len(valor) == len(x):
+                kwargs[nombre] = np.asarray(valor)[indices]
+        x, y = x[indices], y[indices]
+    clase = go.Scattergl if len(x) > umbral_webgl else go.Scatter
+    return clase(x=x, y=y, **kwargs)
+
+
+# ============= CACHÉ =============
+def serializar(fig):
+    """Spec JSON de la figura, con el mismo codificador que usa ``st.plotly_chart``"""
+    import plotly.utils
+
+    return json.dumps(fig.to_dict(), cls=plotly.utils.PlotlyJSONEncoder)
+
+
+def _activado(valor):
+    return (valor or '1').strip().lower() not in ('0', 'false', 'no', 'off')
+
+
+class CacheFiguras:
+    """
+    Figuras por ``(nombre, parámetros)`` con desalojo LRU por tamaño.
+
+    ``parametros`` debe incluir todo aquello de lo que depende la figura
+    (selecciones de la interfaz, huella de los datos, versión del modelo);
+    debe ser hashable.
+    """
+
+    def __init__(self, presupuesto_mb=PRESUPUESTO_MB, habilitada=True):
+        self.presupuesto = int(presupuesto_mb * 2 ** 20)
+        self.habilitada = habilitada
+        self.aciertos = 0
+        self.fallos = 0
+        self._figuras = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def desde_entorno(cls, entorno=None):
+        """Crea la caché según las variables ``DASHBOARD_FIGURAS*``"""
+        entorno = os.environ if entorno is None else entorno
+        return cls(
+            presupuesto_mb=float(entorno.get('DASHBOARD_FIGURAS_MB') or PRESUPUESTO_MB),
+            habilitada=_activado(entorno.get('DASHBOARD_FIGURAS')),
+        )
+
+    def obtener(self, nombre, parametros, construir):
+        """Figura guardada; si no está, ``construir()`` la crea y se mide una vez"""
+        clave = (nombre, parametros)
+        if self.habilitada:
+            with self._lock:
+                entrada = self._figuras.get(clave)
+                if entrada is not None:
+                    self._figuras.move_to_end(clave)
+                    self.aciertos += 1
+                    return entrada[0]
+                self.fallos += 1
+
+        # Se construye fuera del lock: dos sesiones pueden construir la misma
+        # figura a la vez, pero ninguna espera a otra
+        fig = construir()
+        if self.habilitada:
+            tamano = len(serializar(fig))
+            if tamano <= self.presupuesto:
+                with self._lock:
+                    anterior = self._figuras.pop(clave, None)
+                    if anterior is not None:
+                        self._bytes -= anterior[1]
+                    self._figuras[clave] = (fig, tamano)
+                    self._bytes += tamano
+                    while self._bytes > self.presupuesto:
+                        _, (_, desalojada) = self._figuras.popitem(last=False)
+                        self._bytes -= desalojada
+        return fig
+
+    def vaciar(self):
+        with self._lock:
+            self._figuras.clear()
+            self._bytes = 0
+
+    def estadisticas(self):
+        with self._lock:
+            return {'figuras': len(self._figuras), 'bytes': self._bytes, 'presupuesto': self.presupuesto,
+                    'aciertos': self.aciertos, 'fallos': self.fallos}
+
+
+# ============= ENVÍO A STREAMLIT =============
+def _ancho_con_width(plotly_chart):
+    """Indica si ``st.plotly_chart`` recibe el ancho como ``width='stretch'`` (Streamlit 1.46+)"""
+    import inspect
+
+    parametro = inspect.signature(plotly_chart).parameters.get('width')
+    return parametro is not None and isinstance(parametro.default, str)
+
+
+def mostrar_figura(fig, use_container_width=None, **kwargs):
+    """
+    ``st.plotly_chart`` de una figura guardada. Como ya es un ``go.Figure``
+    validado, Streamlit solo la convierte a JSON, sin volver a validarla.
+    ``use_container_width`` se traduce a ``width`` en las versiones que
+    lo declaran obsoleto.
+    """
+    import streamlit as st
+
+    if use_container_width is not None:
+        if _ancho_con_width(st.plotly_chart):
+            kwargs.setdefault('width', 'stretch' if use_container_width else 'content')
+        else:
+            kwargs['use_container_width'] = use_container_width
+    return st.plotly_chart(fig, **kwargs)
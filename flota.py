@@ -0,0 +1,381 @@
+"""
+🏘️ Flota de Pronósticos por Barrio y Distrito - Predicción de Roturas en Red de Gas
+Universidad Tecnológica de Bolívar
+
+Construye la serie mensual de cada Barrio, cada Distrito y el total de la
+ciudad y ajusta un modelo por serie en paralelo. El modelo se elige según la
+densidad de la serie:
+
+- 'sarima': SARIMA(0,1,1)(0,1,1,12) sobre log1p, para series con roturas en
+  la mayoría de los meses.
+- 'ets': suavizamiento exponencial simple, para series con al menos un año
+  de meses con roturas.
+- 'naive_estacional': promedio del mismo mes en las últimas temporadas, para
+  series muy escasas.
+
+Las incidencias sin barrio forman un nodo ``SIN BARRIO (<distrito>)`` por
+distrito, así que los barrios cubren todo el total de la ciudad. Como cada
+serie se ajusta por separado, los barrios no suman su distrito ni los
+distritos el total. Antes de guardar, los pronósticos se reconcilian en
+la jerarquía barrio → distrito → total (``reconciliacion.py``, MinT con
+shrinkage por defecto, a partir de los residuos de un paso de cada modelo).
+
+Los pronósticos de todas las series se guardan en un único artefacto .npz que
+consulta la pestaña de análisis espacial del dashboard.
+
+Uso desde la línea de comandos:
+
+    python flota.py                          # todos los núcleos, horizonte 12
+    python flota.py --workers 4 --lote 32
+    python flota.py --reconciliacion ols     # bottom_up, ols, mint_shrink o ninguna
+"""
+
+import argparse
+import json
+import os
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from busqueda_grid import limitar_hilos_blas
+from pronostico import ORDEN, ORDEN_ESTACIONAL
+from reconciliacion import METODOS, Reconciliador, completar_jerarquia, jerarquia_desde_incidencias
+
+RUTA_FLOTA = os.path.join('modelos', 'flota_barrios.npz')
+
+NIVELES = ('Barrio', 'Distrito', 'Total')
+TOTAL = 'Total'
+MODELOS = ('sarima', 'ets', 'naive_estacional')
+
+# Criterios de densidad para elegir el modelo
+MIN_MESES_SARIMA = 36
+MIN_PROPORCION_SARIMA = 0.5
+MIN_MESES_CON_ROTURAS_ETS = 12
+TEMPORADAS_NAIVE = 3
+PERIODO = 12
+
+# Versión del formato del artefacto (2: residuos y nodos SIN BARRIO)
+VERSION_FLOTA = 2
+
+
+# ============= SERIES =============
+def series_por_nivel(df, columna):
+    """
+    Matriz de conteos (grupos × meses) de la columna indicada, o de toda la
+    ciudad con ``columna='Total'``.
+
+    Devuelve los nombres de los grupos, el rango de meses y la matriz int32.
+    Las filas sin valor en la columna se descartan.
+    """
+    periodos = df['Fecha de Creación'].dt.to_period('M')
+    meses = pd.period_range(periodos.min(), periodos.max(), freq='M')
+    pos_mes = ((df['Año'].to_numpy(np.int64) - meses[0].year) * 12
+               + df['Mes'].to_numpy(np.int64) - meses[0].month)
+
+    if columna == TOTAL:
+        codigos, nombres = np.zeros(len(df), dtype=np.int64), np.array([TOTAL])
+    else:
+        codigos, nombres = pd.factorize(df[columna], sort=True)
+    validos = codigos >= 0
+    clave = codigos[validos] * len(meses) + pos_mes[validos]
+    matriz = np.bincount(clave, minlength=len(nombres) * len(meses))
+    return np.asarray(nombres, dtype=str), meses, matriz.reshape(len(nombres), len(meses)).astype(np.int32)
+
+
+def clasificar_serie(y):
+    """Modelo a usar según la longitud y la proporción de meses con roturas"""
+    con_roturas = np.count_nonzero(y)
+    if len(y) >= MIN_MESES_SARIMA and con_roturas / len(y) >= MIN_PROPORCION_SARIMA:
+        return 'sarima'
+    if con_roturas >= MIN_MESES_CON_ROTURAS_ETS:
+        return 'ets'
+    return 'naive_estacional'
+
+
+# ============= MODELOS =============
+# Cada ajustador devuelve media, inferior, superior y los residuos de un paso
+# dentro de la muestra en roturas/mes (NaN donde el modelo aún no pronostica)
+def _pronostico_sarima(y, horizonte, z):
+    from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+    resultado = SARIMAX(np.log1p(y), order=ORDEN, seasonal_order=ORDEN_ESTACIONAL).fit(disp=False)
+    prediccion = resultado.get_forecast(steps=horizonte)
+    media = prediccion.predicted_mean
+    desv = np.sqrt(prediccion.var_pred_mean)
+    residuos = y - np.expm1(np.asarray(resultado.fittedvalues))
+    # Los primeros meses solo alimentan las diferencias regular y estacional
+    residuos[:ORDEN[1] + ORDEN_ESTACIONAL[1] * ORDEN_ESTACIONAL[3]] = np.nan
+    return np.expm1(media), np.expm1(media - z * desv), np.expm1(media + z * desv), residuos
+
+
+def _pronostico_ets(y, horizonte, z):
+    from statsmodels.tsa.holtwinters import SimpleExpSmoothing
+
+    resultado = SimpleExpSmoothing(y.astype(float), initialization_method='estimated').fit()
+    alpha = resultado.params['smoothing_level']
+    media = np.repeat(resultado.forecast(1)[0], horizonte)
+    sigma = np.std(resultado.resid, ddof=1)
+    desv = sigma * np.sqrt(1 + np.arange(horizonte) * alpha ** 2)
+    return media, media - z * desv, media + z * desv, y - np.asarray(resultado.fittedvalues)
+
+
+def _pronostico_naive_estacional(y, horizonte, z):
+    temporadas = min(TEMPORADAS_NAIVE, len(y) // PERIODO) or 1
+    ultimos = y[-temporadas * PERIODO:].astype(float)
+    if len(ultimos) < PERIODO:
+        ultimos = np.pad(ultimos, (PERIODO - len(ultimos), 0))
+    perfil = ultimos.reshape(-1, PERIODO).mean(axis=0)
+    media = np.resize(perfil, horizonte)
+
+    errores = y[PERIODO:] - y[:-PERIODO] if len(y) > PERIODO else y
+    sigma = np.std(errores, ddof=1) if len(errores) > 1 else 0.0
+    desv = sigma * np.sqrt(1 + np.arange(horizonte) // PERIODO)
+    residuos = np.full(len(y), np.nan)
+    if len(y) > PERIODO:
+        residuos[PERIODO:] = errores
+    return media, media - z * desv, media + z * desv, residuos
+
+
+_AJUSTADORES = {
+    'sarima': _pronostico_sarima,
+    'ets': _pronostico_ets,
+    'naive_estacional': _pronostico_naive_estacional,
+}
+
+
+def pronosticar_serie(y, horizonte=12, confianza=95):
+    """
+    Pronóstico de una serie con el modelo que le corresponde.
+
+    Si el modelo elegido falla se recurre al siguiente más simple. Devuelve
+    (modelo, media, inferior, superior, residuos) en roturas/mes; el
+    pronóstico y el intervalo no tienen valores negativos.
+    """
+    z = stats.norm.ppf(0.5 + confianza / 200)
+    modelo = clasificar_serie(y)
+    for candidato in MODELOS[MODELOS.index(modelo):]:
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                media, inferior, superior, residuos = _AJUSTADORES[candidato](y, horizonte, z)
+        except Exception:
+            continue
+        if np.all(np.isfinite(media)):
+            return (candidato, np.maximum(media, 0), np.maximum(inferior, 0),
+                    np.maximum(superior, 0), residuos)
+    raise RuntimeError("Ningún modelo pudo ajustar la serie")
+
+
+def _ajustar_lote(matriz, horizonte, confianza):
+    """Ajusta un lote de series (filas de la matriz) dentro de un trabajador"""
+    n = len(matriz)
+    modelos = np.empty(n, dtype=np.int8)
+    pred = np.empty((n, horizonte), dtype=np.float32)
+    inferior = np.empty((n, horizonte), dtype=np.float32)
+    superior = np.empty((n, horizonte), dtype=np.float32)
+    residuos = np.empty(matriz.shape, dtype=np.float32)
+    for i, y in enumerate(matriz):
+        modelo, pred[i], inferior[i], superior[i], residuos[i] = pronosticar_serie(y, horizonte, confianza)
+        modelos[i] = MODELOS.index(modelo)
+    return modelos, pred, inferior, superior, residuos
+
+
+# ============= ENTRENAMIENTO EN LOTE =============
+def entrenar_flota(df, horizonte=12, confianza=95, max_workers=None, tam_lote=32,
+                   reconciliacion='mint_shrink'):
+    """
+    Ajusta un modelo por cada Barrio, cada Distrito y el total, y reconcilia
+    los pronósticos con el método ``reconciliacion`` (o no, con 'ninguna').
+
+    Las series se envían a los trabajadores en lotes de ``tam_lote`` filas y
+    cada proceso se recicla tras unos pocos lotes, de modo que la memoria por
+    trabajador queda acotada por el tamaño del lote y no por el total de
+    series. Devuelve el artefacto como diccionario; los pronósticos sin
+    reconciliar quedan en ``prediccion_base``.
+    """
+    if {'Barrio', 'Distrito'} <= set(df.columns):
+        df = completar_jerarquia(df)
+    niveles, nombres, filas = [], [], []
+    meses = None
+    for nivel in NIVELES:
+        if nivel != TOTAL and nivel not in df.columns:
+            continue
+        nombres_nivel, meses, matriz = series_por_nivel(df, nivel)
+        niveles += [nivel] * len(nombres_nivel)
+        nombres += list(nombres_nivel)
+        filas.append(matriz)
+    matriz = np.vstack(filas)
+
+    lotes = [matriz[i:i + tam_lote] for i in range(0, len(matriz), tam_lote)]
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers == 1:
+        limitar_hilos_blas()
+        resultados = [_ajustar_lote(lote, horizonte, confianza) for lote in lotes]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=limitar_hilos_blas,
+                                 max_tasks_per_child=8) as pool:
+            resultados = list(pool.map(_ajustar_lote, lotes, [horizonte] * len(lotes),
+                                       [confianza] * len(lotes)))
+
+    modelos, pred, inferior, superior, residuos = (np.concatenate(partes) for partes in zip(*resultados))
+    flota = {
+        'meta': {
+            'version': VERSION_FLOTA,
+            'ultimo_mes': str(meses[-1]),
+            'horizonte': horizonte,
+            'confianza': confianza,
+            'modelos': list(MODELOS),
+            'reconciliacion': 'ninguna',
+        },
+        'niveles': np.array(niveles),
+        'nombres': np.array(nombres),
+        'modelos': modelos,
+        'historico_total': matriz.sum(axis=1).astype(np.int32),
+        'prediccion': pred,
+        'ic_inferior': inferior,
+        'ic_superior': superior,
+        'residuos': residuos,
+    }
+    if reconciliacion != 'ninguna' and {'Barrio', 'Distrito'} <= set(df.columns):
+        reconciliar_flota(flota, df, reconciliacion)
+    return flota
+
+
+def reconciliar_flota(flota, df, metodo='mint_shrink'):
+    """
+    Reemplaza pronósticos e intervalos de la flota por los reconciliados en
+    la jerarquía barrio → distrito → total (conserva los originales como
+    ``prediccion_base``, ``ic_inferior_base`` e ``ic_superior_base``).
+    """
+    barrios, distritos = jerarquia_desde_incidencias(df)
+    reconciliador = Reconciliador.desde_jerarquia(barrios, distritos, metodo)
+    posiciones = {clave: i for i, clave in enumerate(zip(flota['niveles'], flota['nombres']))}
+    # Nodos de la jerarquía en el orden de la flota (total, distritos y barrios)
+    filas = np.array([posiciones[clave] for clave in zip(reconciliador.niveles, reconciliador.nombres)])
+
+    reconciliador.ajustar_covarianza(flota['residuos'][filas].astype(float))
+    base = [flota[k][filas].astype(float) for k in ('prediccion', 'ic_inferior', 'ic_superior')]
+    media, inferior, superior = reconciliador.reconciliar(*base)
+
+    for clave in ('prediccion', 'ic_inferior', 'ic_superior'):
+        flota[f"{clave}_base"] = flota[clave].copy()
+    flota['prediccion'][filas] = media
+    flota['ic_inferior'][filas] = inferior
+    flota['ic_superior'][filas] = superior
+    flota['meta'].update(reconciliacion=metodo, **reconciliador.resumen())
+    return flota
+
+
+def guardar_flota(flota, ruta=RUTA_FLOTA):
+    """Guarda el artefacto de la flota en un .npz comprimido"""
+    directorio = os.path.dirname(ruta)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+    arrays = {k: v for k, v in flota.items() if k != 'meta'}
+    temporal = f"{ruta}.{os.getpid()}.tmp.npz"
+    np.savez_compressed(temporal, meta=np.array(json.dumps(flota['meta'])), **arrays)
+    os.replace(temporal, ruta)
+
+
+# ============= CONSULTA =============
+class FlotaPronosticos:
+    """Consulta de los pronósticos por barrio o distrito guardados en el artefacto"""
+
+    def __init__(self, flota):
+        self.meta = flota['meta']
+        self.niveles = flota['niveles']
+        self.nombres = flota['nombres']
+        self.modelos = flota['modelos']
+        self.prediccion = flota['prediccion']
+        self.ic_inferior = flota['ic_inferior']
+        self.ic_superior = flota['ic_superior']
+        # Sin reconciliación (--reconciliacion ninguna) no hay pronósticos base aparte
+        self.prediccion_base = flota.get('prediccion_base', self.prediccion)
+        self.residuos = flota['residuos']
+        self._posiciones = {(n, b): i for i, (n, b) in enumerate(zip(self.niveles, self.nombres))}
+
+    @classmethod
+    def cargar(cls, ruta=RUTA_FLOTA):
+        with np.load(ruta, allow_pickle=False) as datos_npz:
+            flota = {k: datos_npz[k] for k in datos_npz.files if k != 'meta'}
+            flota['meta'] = json.loads(str(datos_npz['meta']))
+        if flota['meta'].get('version') != VERSION_FLOTA:
+            raise ValueError(f"Versión de flota no soportada: {flota['meta'].get('version')}")
+        return cls(flota)
+
+    def fechas(self, horizonte=None):
+        """Fechas (fin de mes) de los pasos del pronóstico"""
+        horizonte = horizonte or self.meta['horizonte']
+        primero = pd.Period(self.meta['ultimo_mes'], freq='M') + 1
+        return pd.date_range(start=primero.start_time, periods=horizonte, freq='M')
+
+    def pronostico(self, nombre, nivel='Barrio', horizonte=None):
+        """DataFrame con Fecha, Prediccion, IC_Inferior e IC_Superior, o None"""
+        i = self._posiciones.get((nivel, nombre))
+        if i is None:
+            return None
+        horizonte = horizonte or self.meta['horizonte']
+        return pd.DataFrame({
+            'Fecha': self.fechas(horizonte),
+            'Prediccion': self.prediccion[i, :horizonte],
+            'IC_Inferior': self.ic_inferior[i, :horizonte],
+            'IC_Superior': self.ic_superior[i, :horizonte],
+        })
+
+    def proximo_mes(self, nombres, nivel='Barrio'):
+        """Predicción del próximo mes para una lista de nombres (NaN si no existe)"""
+        pos = [self._posiciones.get((nivel, n), -1) for n in nombres]
+        valores = self.prediccion[pos, 0].astype(float)
+        valores[np.asarray(pos) < 0] = np.nan
+        return valores
+
+    def modelo(self, nombre, nivel='Barrio'):
+        """Nombre del modelo usado para la serie"""
+        i = self._posiciones.get((nivel, nombre))
+        return None if i is None else self.meta['modelos'][self.modelos[i]]
+
+    @property
+    def reconciliacion(self):
+        """Método de reconciliación de los pronósticos ('ninguna' si no se reconciliaron)"""
+        return self.meta.get('reconciliacion', 'ninguna')
+
+
+# ============= CLI =============
+def main(argv=None):
+    from datos import RUTA_EXCEL, cargar_incidencias
+
+    parser = argparse.ArgumentParser(description="Entrena un modelo por barrio y distrito en paralelo")
+    parser.add_argument('--ruta', default=RUTA_EXCEL, help="Archivo Excel de origen")
+    parser.add_argument('--salida', default=RUTA_FLOTA, help="Ruta del artefacto .npz")
+    parser.add_argument('--horizonte', type=int, default=12, help="Meses a pronosticar")
+    parser.add_argument('--workers', type=int, default=None, help="Procesos (por defecto, todos los núcleos)")
+    parser.add_argument('--lote', type=int, default=32, help="Series por tarea enviada a cada proceso")
+    parser.add_argument('--reconciliacion', choices=('ninguna',) + METODOS, default='mint_shrink',
+                        help="Método de reconciliación barrio → distrito → total")
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    flota = entrenar_flota(cargar_incidencias(args.ruta), horizonte=args.horizonte,
+                           max_workers=args.workers, tam_lote=args.lote,
+                           reconciliacion=args.reconciliacion)
+    guardar_flota(flota, args.salida)
+
+    print(f"✅ {len(flota['nombres'])} series ajustadas ({time.perf_counter() - inicio:.1f} s)")
+    for nivel in NIVELES:
+        del_nivel = flota['niveles'] == nivel
+        conteo = pd.Series(flota['modelos'][del_nivel]).map(dict(enumerate(MODELOS))).value_counts()
+        if len(conteo):
+            print(f"   {nivel}: " + ", ".join(f"{m}={n}" for m, n in conteo.items()))
+    if flota['meta']['reconciliacion'] != 'ninguna':
+        print(f"   Reconciliación {flota['meta']['reconciliacion']}: {flota['meta']['hojas']} barrios, "
+              f"{flota['meta']['agregados']} agregados ({flota['meta']['segundos_reconciliacion']:.2f} s)")
+    print(f"   Artefacto guardado en: {args.salida}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
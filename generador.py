@@ -0,0 +1,290 @@
+"""
+🧪 Generador de Incidencias Sintéticas - Predicción de Roturas en Red de Gas
+Universidad Tecnológica de Bolívar
+
+Produce flujos de roturas con la forma del histórico real para pruebas de
+escala y de carga:
+- número configurable de filas, barrios y distritos
+- concentración tipo Zipf entre barrios (pocos barrios concentran muchas roturas)
+- estacionalidad por hora, día de la semana y mes medida en el histórico
+- tendencia anual multiplicativa
+
+Las filas se generan por bloques en orden cronológico y se escriben en
+Parquet, CSV o XLSX a medida que se producen, así que la memoria depende del
+tamaño del bloque y no del total (100M filas caben con bloques de 1M). Las
+columnas son las del Excel original que usa el proyecto, de modo que los
+archivos se pueden cargar con ``cargar_incidencias``.
+
+Uso desde la línea de comandos:
+
+    python generador.py --filas 1000000 --salida .cache/sinteticos/1M.parquet
+    python generador.py --filas 100000000 --barrios 2000 --distritos 12 --salida 100M.parquet
+    python generador.py --filas 50000 --salida prueba.xlsx --tendencia 0.05
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from datos import agregar_variables_temporales
+from esquema import aplicar_esquema
+
+# ============= PERFILES DEL HISTÓRICO =============
+# Intensidad relativa (media 1) medida en las 4.162 roturas de 2019-2025
+
+PERFIL_HORA = (0.18, 0.07, 0.03, 0.05, 0.07, 0.07, 0.13, 0.51, 1.70, 2.80, 3.28, 2.81,
+               1.74, 1.64, 2.49, 2.19, 1.64, 1.17, 0.50, 0.37, 0.24, 0.13, 0.11, 0.07)
+PERFIL_DIA = (1.03, 1.21, 1.12, 1.17, 1.10, 0.90, 0.47)  # lunes=0
+PERFIL_MES = (1.07, 1.04, 1.19, 1.00, 1.00, 0.80, 1.09, 0.98, 0.75, 0.78, 1.16, 1.14)
+
+# Pendiente del log-conteo contra el log-rango de los 100 barrios con más roturas
+EXPONENTE_ZIPF = 0.57
+
+DIAMETROS = {'3/4"': 0.67, '1/2"': 0.27, '2"': 0.02, '1"': 0.015, '4"': 0.01, '3"': 0.0075, '6"': 0.0075}
+SEGMENTOS = {'Obra': 0.57, 'Tercero': 0.43}
+# Gas liberado: lognormal con la mediana (~105 m³) del histórico
+GAS_MEDIANA_M3 = 105.0
+GAS_SIGMA = 1.3
+
+ORDEN_INICIAL = 90_000_000
+TAM_BLOQUE = 1_000_000
+# Filas por hoja de Excel, sin contar el encabezado
+MAX_FILAS_XLSX = 1_048_575
+
+FORMATOS = ('parquet', 'csv', 'xlsx')
+
+
+def _normalizar(pesos):
+    pesos = np.asarray(pesos, dtype=float)
+    return pesos / pesos.sum()
+
+
+# ============= GENERADOR =============
+class GeneradorIncidencias:
+    """
+    Generador reproducible de roturas sintéticas.
+
+    El total de filas se reparte primero entre los días del rango con una
+    multinomial cuya intensidad combina tendencia, mes y día de la semana;
+    después cada bloque de días recibe hora, barrio y atributos. Con la misma
+    semilla y el mismo tamaño de bloque la salida es idéntica.
+    """
+
+    def __init__(self, n_barrios=354, n_distritos=1, inicio='2019-01-01', fin='2025-07-31',
+                 exponente_zipf=EXPONENTE_ZIPF, tendencia=-0.10, semilla=0,
+                 perfil_hora=PERFIL_HORA, perfil_dia=PERFIL_DIA, perfil_mes=PERFIL_MES,
+                 nombres_barrios=None, nombres_distritos=None):
+        # Con nombres explícitos, el número de barrios o distritos es su longitud
+        if nombres_barrios is not None:
+            n_barrios = len(nombres_barrios)
+        if nombres_distritos is not None:
+            n_distritos = len(nombres_distritos)
+        if n_barrios < 1 or n_distritos < 1:
+            raise ValueError("Se necesita al menos un barrio y un distrito")
+        if n_distritos > n_barrios:
+            raise ValueError("No puede haber más distritos que barrios")
+        if tendencia <= -1:
+            raise ValueError("La tendencia anual debe ser mayor que -100%")
+
+        self.n_barrios = n_barrios
+        self.n_distritos = n_distritos
+        self.dias = pd.date_range(pd.Timestamp(inicio).normalize(), pd.Timestamp(fin).normalize(), freq='D')
+        if len(self.dias) == 0:
+            raise ValueError("El rango de fechas está vacío")
+        self.exponente_zipf = exponente_zipf
+        self.tendencia = tendencia
+        self.semilla = semilla
+
+        self.p_hora = _normalizar(perfil_hora)
+        self.p_dia = _normalizar(self._intensidad_dias(perfil_dia, perfil_mes))
+        self.barrios, self.distritos, self.p_barrio = self._catalogo_barrios(nombres_barrios, nombres_distritos)
+
+    def _intensidad_dias(self, perfil_dia, perfil_mes):
+        """Intensidad relativa de cada día: tendencia × mes × día de la semana"""
+        años = (self.dias - self.dias[0]).days.to_numpy() / 365.25
+        return ((1 + self.tendencia) ** años
+                * np.asarray(perfil_mes, dtype=float)[self.dias.month - 1]
+                * np.asarray(perfil_dia, dtype=float)[self.dias.dayofweek])
+
+    def _catalogo_barrios(self, nombres_barrios=None, nombres_distritos=None):
+        """Nombres, distrito de cada barrio y probabilidades tipo Zipf"""
+        rng = np.random.default_rng([self.semilla, 1])
+        if nombres_barrios is None:
+            ancho = len(str(self.n_barrios))
+            nombres_barrios = [f"BARRIO {k + 1:0{ancho}d}" for k in range(self.n_barrios)]
+        if nombres_distritos is None:
+            ancho = len(str(self.n_distritos))
+            nombres_distritos = [f"DISTRITO {k + 1:0{ancho}d}" for k in range(self.n_distritos)]
+        nombres_distritos = np.array(nombres_distritos, dtype=object)
+
+        # El rango Zipf se asigna al azar para que el barrio 1 no sea siempre el mayor
+        rango = rng.permutation(self.n_barrios) + 1
+        p_barrio = _normalizar(rango.astype(float) ** -self.exponente_zipf)
+        # Todo distrito recibe al menos un barrio
+        distrito = rng.permutation(np.arange(self.n_barrios) % self.n_distritos)
+
+        return np.array(nombres_barrios, dtype=object), nombres_distritos[distrito], p_barrio
+
+    def catalogo(self):
+        """Barrios con su distrito y probabilidad, de mayor a menor"""
+        return pd.DataFrame({
+            'Barrio': self.barrios, 'Distrito': self.distritos, 'Probabilidad': self.p_barrio,
+        }).sort_values('Probabilidad', ascending=False, ignore_index=True)
+
+    def bloques(self, n_filas, tam_bloque=TAM_BLOQUE):
+        """
+        Genera DataFrames de aproximadamente ``tam_bloque`` filas en orden
+        cronológico. Un bloque abarca días completos, así que puede superar
+        ``tam_bloque`` cuando un solo día tiene más roturas que eso.
+        """
+        rng = np.random.default_rng(self.semilla)
+        por_dia = rng.multinomial(n_filas, self.p_dia)
+        fin_bloque = np.searchsorted(np.cumsum(por_dia), np.arange(tam_bloque, n_filas, tam_bloque), side='left')
+        cortes = np.unique(np.concatenate([[0], fin_bloque + 1, [len(por_dia)]]))
+
+        dias_ns = self.dias.asi8
+        diametros, segmentos = list(DIAMETROS), list(SEGMENTOS)
+        p_diametro, p_segmento = _normalizar(list(DIAMETROS.values())), _normalizar(list(SEGMENTOS.values()))
+        orden = ORDEN_INICIAL
+        for desde, hasta in zip(cortes[:-1], cortes[1:]):
+            n = int(por_dia[desde:hasta].sum())
+            if n == 0:
+                continue
+            dia = np.repeat(dias_ns[desde:hasta], por_dia[desde:hasta])
+            segundo = rng.choice(24, n, p=self.p_hora) * 3600 + rng.integers(0, 3600, n)
+            fechas = np.sort(dia + segundo * 1_000_000_000).astype('datetime64[ns]')
+            barrio = rng.choice(self.n_barrios, n, p=self.p_barrio)
+
+            yield pd.DataFrame({
+                'Fecha de Creación': fechas,
+                'Distrito': self.distritos[barrio],
+                'Orden': np.arange(orden, orden + n, dtype=np.int64),
+                'Diámetro': np.array(diametros, dtype=object)[rng.choice(len(diametros), n, p=p_diametro)],
+                'Barrio': self.barrios[barrio],
+                'Segmento del incidente': np.array(segmentos, dtype=object)[rng.choice(len(segmentos), n, p=p_segmento)],
+                'Gas Liberado [M3]': np.round(rng.lognormal(np.log(GAS_MEDIANA_M3), GAS_SIGMA, n), 3),
+            })
+            orden += n
+
+    def dataframe(self, n_filas, tam_bloque=TAM_BLOQUE):
+        """DataFrame completo en memoria, con el esquema de ``cargar_incidencias``"""
+        partes = list(self.bloques(n_filas, tam_bloque))
+        if not partes:
+            df = next(self.bloques(1)).iloc[:0]
+        else:
+            df = pd.concat(partes, ignore_index=True)
+        return aplicar_esquema(agregar_variables_temporales(df))
+
+
+# ============= ESCRITURA POR BLOQUES =============
+def _formato(ruta, formato=None):
+    formato = formato or os.path.splitext(ruta)[1].lstrip('.').lower()
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato no soportado: '{formato}' (use {', '.join(FORMATOS)})")
+    return formato
+
+
+def _escribir_parquet(bloques, ruta):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    escritor = None
+    try:
+        for bloque in bloques:
+            tabla = pa.Table.from_pandas(bloque, preserve_index=False)
+            if escritor is None:
+                escritor = pq.ParquetWriter(ruta, tabla.schema)
+            escritor.write_table(tabla)
+    finally:
+        if escritor is not None:
+            escritor.close()
+
+
+def _escribir_csv(bloques, ruta):
+    with open(ruta, 'w', encoding='utf-8', newline='') as f:
+        for i, bloque in enumerate(bloques):
+            bloque.to_csv(f, index=False, header=(i == 0))
+
+
+def _escribir_xlsx(bloques, ruta):
+    from openpyxl import Workbook
+
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet('Incidencias')
+    for i, bloque in enumerate(bloques):
+        if i == 0:
+            hoja.append(list(bloque.columns))
+        bloque = bloque.astype({'Fecha de Creación': object})
+        for fila in bloque.itertuples(index=False, name=None):
+            hoja.append(fila)
+    libro.save(ruta)
+
+
+def escribir(generador, ruta, n_filas, formato=None, tam_bloque=TAM_BLOQUE, progreso=None):
+    """
+    Escribe ``n_filas`` roturas en ``ruta`` bloque a bloque y devuelve el
+    número de filas escritas. El formato se deduce de la extensión si no se
+    indica; XLSX admite como máximo 1.048.575 filas.
+    """
+    formato = _formato(ruta, formato)
+    if formato == 'xlsx' and n_filas > MAX_FILAS_XLSX:
+        raise ValueError(f"XLSX admite como máximo {MAX_FILAS_XLSX:,} filas por hoja")
+
+    escritas = 0
+
+    def contar(bloques):
+        nonlocal escritas
+        for bloque in bloques:
+            escritas += len(bloque)
+            yield bloque
+            if progreso is not None:
+                progreso(escritas, n_filas)
+
+    directorio = os.path.dirname(ruta)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    try:
+        {'parquet': _escribir_parquet, 'csv': _escribir_csv, 'xlsx': _escribir_xlsx}[formato](
+            contar(generador.bloques(n_filas, tam_bloque)), temporal)
+        os.replace(temporal, ruta)
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+    return escritas
+
+
+# ============= CLI =============
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera roturas sintéticas para pruebas de escala")
+    parser.add_argument('--filas', type=int, required=True, help="Número de roturas a generar")
+    parser.add_argument('--salida', required=True, help="Archivo de salida (.parquet, .csv o .xlsx)")
+    parser.add_argument('--formato', choices=FORMATOS, default=None, help="Formato (por defecto, la extensión)")
+    parser.add_argument('--barrios', type=int, default=354, help="Número de barrios")
+    parser.add_argument('--distritos', type=int, default=1, help="Número de distritos")
+    parser.add_argument('--inicio', default='2019-01-01', help="Primer día del rango")
+    parser.add_argument('--fin', default='2025-07-31', help="Último día del rango")
+    parser.add_argument('--zipf', type=float, default=EXPONENTE_ZIPF, help="Exponente de concentración entre barrios")
+    parser.add_argument('--tendencia', type=float, default=-0.10, help="Cambio anual relativo (p. ej. -0.10)")
+    parser.add_argument('--semilla', type=int, default=0, help="Semilla aleatoria")
+    parser.add_argument('--bloque', type=int, default=TAM_BLOQUE, help="Filas por bloque")
+    args = parser.parse_args(argv)
+
+    generador = GeneradorIncidencias(args.barrios, args.distritos, args.inicio, args.fin,
+                                     args.zipf, args.tendencia, args.semilla)
+    inicio = time.perf_counter()
+
+    def progreso(escritas, total):
+        print(f"   {escritas:,}/{total:,} filas ({time.perf_counter() - inicio:.1f} s)")
+
+    filas = escribir(generador, args.salida, args.filas, args.formato, args.bloque, progreso)
+    print(f"✅ {filas:,} roturas escritas en '{args.salida}' "
+          f"({os.path.getsize(args.salida) / 1e6:.1f} MB, {time.perf_counter() - inicio:.1f} s)")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,343 @@
+"""
+🖼️ Figuras Estáticas del Modelo - Predicción de Roturas en Red de Gas
+Universidad Tecnológica de Bolívar
+
+Las cuatro figuras PNG que generaba ``modelo.ipynb`` en ``Imagenes/``,
+como funciones que reciben los datos ya calculados y guardan el archivo:
+
+- ``descomposicion_estacional.png``: observado, tendencia, estacionalidad y
+  residuo (modelo aditivo, periodo 12)
+- ``proceso_estacionariedad.png``: serie original, log1p, d=1 y D=1 con sus
+  distribuciones
+- ``resultados_modelo_final.png``: pronóstico, comparación de modelos,
+  barrios, franjas horarias y mapa de calor día × hora
+- ``diagnostico_residuos.png``: residuos en el tiempo, histograma, Q-Q,
+  ACF, PACF y residuos vs ajustados
+
+Las figuras del modelo se construyen desde los artefactos
+(``modelos/sarima_final.npz`` y ``modelos/diagnostico.npz``), sin volver a
+ajustar el modelo final. Las genera ``pipeline.py``; se dibujan con el
+backend Agg, sin pantalla.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+DIR_IMAGENES = 'Imagenes'
+DPI = 300
+
+FIGURAS = {
+    'descomposicion': 'descomposicion_estacional.png',
+    'estacionariedad': 'proceso_estacionariedad.png',
+    'resultados': 'resultados_modelo_final.png',
+    'residuos': 'diagnostico_residuos.png',
+}
+
+DIAS_CORTOS = ['Lun', 'Mar', 'Mié', 'Jue', 'Vie', 'Sáb', 'Dom']
+TOP_BARRIOS = 6
+MESES_PRONOSTICO = 6
+
+
+def _pyplot():
+    """pyplot con el backend sin pantalla"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def guardar_figura(fig, ruta, dpi=DPI):
+    """Guarda la figura en un temporal y lo renombra, y la cierra"""
+    plt = _pyplot()
+    directorio = os.path.dirname(ruta)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    try:
+        fig.tight_layout()
+        fig.savefig(temporal, format='png', dpi=dpi, bbox_inches='tight', facecolor='white')
+        os.replace(temporal, ruta)
+    finally:
+        plt.close(fig)
+        if os.path.exists(temporal):
+            os.remove(temporal)
+
+
+# ============= SERIE MENSUAL =============
+def figura_descomposicion(serie, ruta, dpi=DPI):
+    """Descomposición estacional aditiva de la serie mensual (celda 6 del notebook)"""
+    from statsmodels.tsa.seasonal import seasonal_decompose
+
+    plt = _pyplot()
+    descomposicion = seasonal_decompose(serie, model='additive', period=12)
+    fig, axes = plt.subplots(4, 1, figsize=(15, 10))
+
+    descomposicion.observed.plot(ax=axes[0], color='#2E86AB', linewidth=2)
+    axes[0].set_ylabel('Observado', fontweight='bold', fontsize=11)
+    axes[0].set_title('Descomposición Estacional de Roturas (Modelo Aditivo)',
+                      fontweight='bold', fontsize=14, pad=15)
+
+    descomposicion.trend.plot(ax=axes[1], color='#D90429', linewidth=2)
+    axes[1].set_ylabel('Tendencia', fontweight='bold', fontsize=11)
+    axes[1].axhline(y=serie.mean(), color='gray', linestyle='--', linewidth=1.5, alpha=0.5, label='Media')
+    axes[1].legend(fontsize=9)
+
+    descomposicion.seasonal.plot(ax=axes[2], color='#F18F01', linewidth=2)
+    axes[2].set_ylabel('Estacionalidad', fontweight='bold', fontsize=11)
+    axes[2].axhline(y=0, color='black', linestyle='-', linewidth=1, alpha=0.3)
+    axes[2].fill_between(descomposicion.seasonal.index, descomposicion.seasonal, 0, alpha=0.3, color='#F18F01')
+
+    descomposicion.resid.plot(ax=axes[3], color='#06A77D', linewidth=1.5, alpha=0.7)
+    axes[3].set_ylabel('Residuo', fontweight='bold', fontsize=11)
+    axes[3].set_xlabel('Fecha', fontweight='bold', fontsize=11)
+    axes[3].axhline(y=0, color='black', linestyle='-', linewidth=1, alpha=0.3)
+
+    for ax in axes:
+        ax.grid(True, alpha=0.3)
+    guardar_figura(fig, ruta, dpi)
+
+
+def figura_estacionariedad(serie, ruta, dpi=DPI):
+    """Serie original, log1p y diferenciaciones con sus histogramas (celda 9 del notebook)"""
+    plt = _pyplot()
+    serie_log = np.log1p(serie)
+    serie_diff = serie_log.diff().dropna()
+    serie_diff_estacional = serie_diff.diff(12).dropna()
+
+    pasos = [
+        (serie, '#2E86AB', '1. Serie Original (No Estacionaria)', 'Roturas',
+         'Distribución Original', serie.mean()),
+        (serie_log, '#F18F01', '2. Con Transformación Log (Varianza Estabilizada)', 'log(Roturas+1)',
+         'Distribución con Log', serie_log.mean()),
+        (serie_diff, '#06A77D', '3. Con Diferenciación Regular d=1 (Sin Tendencia)', 'Δ log(Roturas)',
+         'Distribución con d=1', 0),
+        (serie_diff_estacional, '#D90429', '4. Con Diferenciación Estacional D=1 (Estacionaria)',
+         'Δ₁₂Δ log(Roturas)', 'Distribución con d=1, D=1 (Estacionaria)', 0),
+    ]
+    fig, axes = plt.subplots(4, 2, figsize=(16, 12))
+    for fila, (valores, color, titulo, etiqueta, titulo_hist, referencia) in enumerate(pasos):
+        ax_serie, ax_hist = axes[fila]
+        ax_serie.plot(valores.index, valores, color=color, linewidth=2 if fila < 2 else 1.5)
+        ax_serie.set_title(titulo, fontweight='bold', fontsize=12)
+        ax_serie.set_ylabel(etiqueta, fontweight='bold')
+        ax_serie.axhline(y=referencia, color='red', linestyle='--', linewidth=1.5, alpha=0.5)
+        ax_serie.grid(True, alpha=0.3)
+
+        decimales = 1 if fila == 0 else 2 if fila == 1 else 4
+        ax_hist.hist(valores, bins=20, color=color, edgecolor='black', alpha=0.7)
+        ax_hist.set_title(titulo_hist, fontweight='bold', fontsize=12)
+        ax_hist.set_xlabel(etiqueta, fontweight='bold')
+        ax_hist.set_ylabel('Frecuencia', fontweight='bold')
+        ax_hist.axvline(x=referencia, color='red', linestyle='--', linewidth=2,
+                        label=f'Media: {valores.mean():.{decimales}f}')
+        if fila == 0:
+            ax_hist.axvline(x=valores.median(), color='green', linestyle='--', linewidth=2,
+                            label=f'Mediana: {valores.median():.1f}')
+        ax_hist.legend(fontsize=9)
+        ax_hist.grid(True, alpha=0.3, axis='y')
+    axes[3, 0].set_xlabel('Fecha', fontweight='bold')
+    guardar_figura(fig, ruta, dpi)
+
+
+# ============= RESULTADOS DEL MODELO =============
+def _barras_con_etiquetas(ax, etiquetas, valores, colores, formato, separacion, **kwargs):
+    barras = ax.bar(etiquetas, valores, color=colores, edgecolor='black', **kwargs)
+    for barra, valor in zip(barras, valores):
+        ax.text(barra.get_x() + barra.get_width() / 2., barra.get_height() + separacion,
+                formato.format(valor), ha='center', fontsize=10, fontweight='bold')
+    ax.grid(True, alpha=0.3, axis='y')
+    return barras
+
+
+def figura_resultados(df, serie, artefacto, diagnostico, ruta, meses_test=None, dpi=DPI):
+    """
+    Resumen del modelo final (celda 31 del notebook): serie con el
+    pronóstico a 6 meses y su IC 95%, precisión y MAE de la comparación de
+    modelos del diagnóstico, top 6 barrios por promedio mensual y
+    distribución por hora, día y periodo del día.
+
+    La predicción del baseline sobre los meses de test sale de la caché de
+    ajustes (``diagnostico.py`` ya la ajustó al calcular la comparación).
+    """
+    import seaborn as sns
+
+    from diagnostico import MESES_TEST, ORDEN_BASELINE, ORDEN_ESTACIONAL_BASELINE
+    from pronostico import ajustar_modelo, pronosticar
+
+    plt = _pyplot()
+    meta = diagnostico['meta']
+    serie = serie[serie.index.to_period('M') <= pd.Period(meta['modelo']['ultimo_mes'], freq='M')]
+    meses_test = meses_test or MESES_TEST
+    train, test = serie[:-meses_test], serie[-meses_test:]
+    pred_test = ajustar_modelo(train, ORDEN_BASELINE, ORDEN_ESTACIONAL_BASELINE, None).forecast(steps=meses_test)
+    futuro = pronosticar(artefacto, MESES_PRONOSTICO, confianza=95)
+
+    total_meses = len(serie)
+    top_barrios = df['Barrio'].value_counts().head(TOP_BARRIOS)
+    promedios = (top_barrios / total_meses).round(2)
+    por_hora = df['Hora'].value_counts().reindex(range(24), fill_value=0)
+    por_dia = df['Dia_Semana'].value_counts().reindex(range(7), fill_value=0)
+    periodos = [int(df['Hora'].between(inicio, inicio + 5).sum()) for inicio in (0, 6, 12, 18)]
+
+    with plt.style.context('seaborn-v0_8-darkgrid'):
+        fig = plt.figure(figsize=(20, 16))
+
+        # ============= FILA 1: PREDICCIÓN MENSUAL =============
+        ax1 = plt.subplot(4, 3, 1)
+        ax1.plot(serie.index, serie, label='Histórico', linewidth=2, color='#2E86AB', alpha=0.8)
+        ax1.plot(test.index, test, label='Test Real', linewidth=3, color='green', marker='o', markersize=6)
+        ax1.plot(test.index, np.asarray(pred_test), label='Baseline', linestyle='--', linewidth=2,
+                 color='red', alpha=0.7)
+        ax1.plot(futuro['Fecha'], futuro['Prediccion'], label='Predicción Final', linestyle='--',
+                 linewidth=3, color='orange', marker='s', markersize=7)
+        ax1.fill_between(futuro['Fecha'], futuro['IC_Inferior'], futuro['IC_Superior'],
+                         alpha=0.2, color='orange', label='IC 95%')
+        ax1.set_title('Serie Temporal y Predicciones', fontweight='bold', fontsize=13)
+        ax1.set_ylabel('Roturas/Mes', fontweight='bold')
+        ax1.legend(loc='best', fontsize=9)
+        ax1.grid(True, alpha=0.3)
+
+        modelos = [fila['Modelo'].replace('+ ', '') for fila in meta['comparacion']]
+        colores = ['#FF6B6B', '#FFA500', '#4ECDC4', '#45B7D1']
+        ax2 = plt.subplot(4, 3, 2)
+        _barras_con_etiquetas(ax2, modelos, [f['Precision'] for f in meta['comparacion']], colores,
+                              '{:.1f}%', 0.5, linewidth=2, alpha=0.8)
+        ax2.axhline(y=80, color='green', linestyle='--', linewidth=2, alpha=0.5, label='Meta 80%')
+        ax2.set_ylabel('Precisión (%)', fontweight='bold')
+        ax2.set_title('Evolución de Precisión', fontweight='bold', fontsize=13)
+        ax2.set_ylim([70, 100])
+        ax2.legend()
+
+        ax3 = plt.subplot(4, 3, 3)
+        _barras_con_etiquetas(ax3, modelos, [f['MAE'] for f in meta['comparacion']], colores,
+                              '{:.2f}', 0.2, linewidth=2, alpha=0.8)
+        ax3.set_ylabel('MAE (roturas)', fontweight='bold')
+        ax3.set_title('Reducción de Error', fontweight='bold', fontsize=13)
+
+        # ============= FILA 2: DISTRIBUCIÓN ESPACIAL =============
+        barrios = [str(b)[:30] for b in top_barrios.index]
+        colores_barrio = ['#D90429', '#F18F01', '#F18F01', '#06A77D', '#06A77D', '#2E86AB'][:len(barrios)]
+        for posicion, valores, titulo, etiqueta, formato in (
+                (4, promedios, f'Top {TOP_BARRIOS} Barrios (Promedio Mensual)', 'Roturas/Mes', '{:.2f}'),
+                (5, promedios * MESES_PRONOSTICO, f'Predicción {MESES_PRONOSTICO} Meses por Barrio',
+                 f'Roturas Esperadas ({MESES_PRONOSTICO} meses)', '{:.1f}')):
+            ax = plt.subplot(4, 3, posicion)
+            ax.barh(barrios, valores, color=colores_barrio, edgecolor='black', linewidth=1.5)
+            ax.set_title(titulo, fontsize=12, fontweight='bold', pad=10)
+            ax.set_xlabel(etiqueta, fontsize=10)
+            ax.invert_yaxis()
+            for i, valor in enumerate(valores):
+                ax.text(valor + 0.05, i, formato.format(valor), va='center', fontweight='bold', fontsize=9)
+            ax.grid(True, alpha=0.3, axis='x')
+
+        ax6 = plt.subplot(4, 3, 6)
+        meses_futuros = [f.strftime('%b\n%Y') for f in futuro['Fecha']]
+        colores_pred = ['#FF6B6B', '#FFA500', '#FFD93D', '#6BCF7F', '#4ECDC4', '#45B7D1']
+        _barras_con_etiquetas(ax6, meses_futuros, futuro['Prediccion'], colores_pred, '{:.0f}', 1.5,
+                              linewidth=1.5, alpha=0.85)
+        ax6.axhline(y=serie.mean(), color='red', linestyle='--', linewidth=2, alpha=0.6,
+                    label=f'Prom. histórico: {serie.mean():.0f}')
+        ax6.set_title(f'Predicción Próximos {MESES_PRONOSTICO} Meses', fontweight='bold', fontsize=13)
+        ax6.set_ylabel('Roturas Predichas', fontweight='bold')
+        ax6.set_xlabel('Mes', fontweight='bold')
+        ax6.legend(fontsize=8)
+        ax6.text(0.5, 0.95, f"Total: {futuro['Prediccion'].sum():.0f}", transform=ax6.transAxes,
+                 fontsize=11, fontweight='bold', ha='center',
+                 bbox=dict(boxstyle='round', facecolor='yellow', alpha=0.7))
+
+        # ============= FILA 3: DISTRIBUCIÓN TEMPORAL =============
+        ax7 = plt.subplot(4, 3, 7)
+        colores_hora = ['#D90429' if c == por_hora.max() else '#2E86AB' for c in por_hora]
+        ax7.bar(por_hora.index, por_hora, color=colores_hora, edgecolor='black', linewidth=0.5, alpha=0.8)
+        ax7.set_title('Distribución por Hora del Día', fontsize=12, fontweight='bold', pad=10)
+        ax7.set_xlabel('Hora', fontsize=10)
+        ax7.set_ylabel('Número de Roturas', fontsize=10)
+        ax7.set_xticks(range(0, 24, 2))
+        ax7.grid(True, alpha=0.3, axis='y')
+        hora_critica = int(por_hora.idxmax())
+        ax7.axvline(x=hora_critica, color='red', linestyle='--', linewidth=2, alpha=0.7)
+        ax7.text(hora_critica, por_hora.max() * 0.9, f'Hora crítica\n{hora_critica}:00', ha='center',
+                 fontsize=8, fontweight='bold', bbox=dict(boxstyle='round', facecolor='yellow', alpha=0.7))
+
+        ax8 = plt.subplot(4, 3, 8)
+        colores_dia = ['#D90429' if c == por_dia.max() else '#2E86AB' for c in por_dia]
+        _barras_con_etiquetas(ax8, DIAS_CORTOS, por_dia, colores_dia, '{:d}', por_dia.max() * 0.02,
+                              linewidth=1, alpha=0.8)
+        ax8.set_title('Distribución por Día de la Semana', fontsize=12, fontweight='bold', pad=10)
+        ax8.set_xlabel('Día', fontsize=10)
+        ax8.set_ylabel('Número de Roturas', fontsize=10)
+
+        ax9 = plt.subplot(4, 3, 9)
+        etiquetas_periodo = ['Madrugada\n(00-05h)', 'Mañana\n(06-11h)', 'Tarde\n(12-17h)', 'Noche\n(18-23h)']
+        _barras_con_etiquetas(ax9, etiquetas_periodo, periodos, ['#2E86AB', '#D90429', '#F18F01', '#06A77D'],
+                              '{:d}', max(periodos) * 0.02, linewidth=1.5, alpha=0.8)
+        ax9.set_title('Distribución por Período del Día', fontsize=12, fontweight='bold', pad=10)
+        ax9.set_ylabel('Número de Roturas', fontsize=10)
+
+        # ============= FILA 4: MAPA DE CALOR DÍA × HORA =============
+        ax10 = plt.subplot(4, 1, 4)
+        mapa = (df.groupby(['Dia_Semana', 'Hora'], observed=True).size().unstack(fill_value=0)
+                .reindex(index=range(7), columns=range(24), fill_value=0))
+        mapa.index = DIAS_CORTOS
+        sns.heatmap(mapa, cmap='YlOrRd', annot=False, cbar_kws={'label': 'Número de Roturas'},
+                    ax=ax10, linewidths=0.5, cbar=True)
+        ax10.set_title('Mapa de Calor: Día de la Semana × Hora del Día', fontsize=14, fontweight='bold', pad=15)
+        ax10.set_xlabel('Hora del Día', fontsize=11, fontweight='bold')
+        ax10.set_ylabel('Día de la Semana', fontsize=11, fontweight='bold')
+        ax10.set_xticklabels(ax10.get_xticklabels(), rotation=0)
+
+        guardar_figura(fig, ruta, dpi)
+
+
+def figura_residuos(diagnostico, ruta, dpi=DPI):
+    """Diagnóstico gráfico de los residuos del modelo final (celda 33 del notebook)"""
+    from scipy import stats
+    from statsmodels.graphics.tsaplots import plot_acf, plot_pacf
+
+    plt = _pyplot()
+    meta = diagnostico['meta']
+    residuos = pd.Series(diagnostico['residuos'],
+                         index=pd.period_range(meta['primer_mes'], periods=len(diagnostico['residuos']),
+                                               freq='M').to_timestamp(how='end').normalize())
+    ajustados = diagnostico['ajustados']
+    rezagos = min(20, len(residuos) // 2 - 1)
+
+    fig = plt.figure(figsize=(15, 8))
+    ax1 = plt.subplot(2, 3, 1)
+    residuos.plot(ax=ax1, color='steelblue', linewidth=1.5)
+    ax1.axhline(0, color='red', linestyle='--', linewidth=1.5)
+    ax1.set_title('Residuos en el Tiempo', fontweight='bold')
+    ax1.set_ylabel('Residuo')
+
+    ax2 = plt.subplot(2, 3, 2)
+    ax2.hist(residuos, bins=15, color='skyblue', edgecolor='black', density=True)
+    x = np.linspace(residuos.min(), residuos.max(), 100)
+    ax2.plot(x, stats.norm.pdf(x, residuos.mean(), residuos.std()), 'r-', linewidth=2, label='Normal')
+    ax2.set_title('Distribución de Residuos', fontweight='bold')
+    ax2.set_xlabel('Residuo')
+    ax2.legend()
+
+    ax3 = plt.subplot(2, 3, 3)
+    stats.probplot(residuos, dist="norm", plot=ax3)
+    ax3.set_title('Q-Q Plot', fontweight='bold')
+
+    ax4 = plt.subplot(2, 3, 4)
+    plot_acf(residuos, ax=ax4, lags=rezagos)
+    ax4.set_title('ACF de Residuos', fontweight='bold')
+
+    ax5 = plt.subplot(2, 3, 5)
+    plot_pacf(residuos, ax=ax5, lags=rezagos)
+    ax5.set_title('PACF de Residuos', fontweight='bold')
+
+    ax6 = plt.subplot(2, 3, 6)
+    ax6.scatter(ajustados, residuos, alpha=0.6, color='steelblue', edgecolor='black')
+    ax6.axhline(0, color='red', linestyle='--', linewidth=1.5)
+    ax6.set_title('Residuos vs Valores Ajustados', fontweight='bold')
+    ax6.set_xlabel('Valores Ajustados')
+    ax6.set_ylabel('Residuo')
+
+    for ax in (ax1, ax2, ax3, ax4, ax5, ax6):
+        ax.grid(True, alpha=0.3)
+    guardar_figura(fig, ruta, dpi)
@@ -0,0 +1,358 @@
+"""
+🌊 Ingesta por Bloques con Memoria Acotada - Predicción de Roturas en Red de Gas
+Universidad Tecnológica de Bolívar
+
+Lee exportaciones de incidencias demasiado grandes para cargarse enteras:
+- XLSX con el iterador de filas de openpyxl en modo solo lectura
+- CSV y Parquet por bloques (``read_csv(chunksize=...)`` y ``iter_batches``)
+
+Cada bloque se limpia y se pliega directamente en el cubo de conteos
+mes × barrio × día × hora (de ahí salen la serie mensual y todos los
+agregados del dashboard). Hay dos modos:
+- ``agregado``: solo se leen fecha y barrio y solo se guardan los conteos;
+  la memoria depende del número de claves (mes, barrio) distintas y no del
+  número de filas.
+- ``completo``: además se conserva el detalle, bloque a bloque en el esquema
+  compacto de ``esquema.py``; nunca se tiene el archivo entero como texto.
+
+Uso desde la línea de comandos:
+
+    python ingesta.py --ruta exportacion.csv --modo agregado
+    python ingesta.py --ruta 100M.parquet --modo agregado --bloque 2000000
+    python ingesta.py --ruta "Copia de base_datos.xlsx" --modo completo
+"""
+
+import argparse
+import hashlib
+import itertools
+import operator
+import os
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+from scipy import sparse
+
+from agregados import FRANJAS, HORAS, CuboRoturas
+from datos import limpiar_datos
+from esquema import MAX_EJEMPLOS_INVALIDOS, filas_invalidas, parsear_fechas
+
+TAM_BLOQUE = 200_000
+MODOS = ('completo', 'agregado')
+FORMATOS = ('xlsx', 'csv', 'parquet')
+
+# Columnas necesarias para el cubo (modo agregado)
+COLUMNAS_CUBO = ('Fecha de Creación', 'Barrio')
+
+# Textos que pandas.read_excel interpreta como vacíos por defecto, más los
+# códigos de error de Excel (#REF!, #N/A, ...): openpyxl los entrega como texto
+VALORES_NULOS = ('', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND',
+                 '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+                 '#NULL!', '#DIV/0!', '#VALUE!', '#REF!', '#NAME?', '#NUM!')
+
+
+# ============= LECTURA POR BLOQUES =============
+def _formato(ruta, formato=None):
+    formato = formato or os.path.splitext(ruta)[1].lstrip('.').lower()
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato no soportado: '{formato}' (use {', '.join(FORMATOS)})")
+    return formato
+
+
+def _bloques_xlsx(ruta, tam_bloque, columnas):
+    """Filas de la primera hoja con el iterador de solo lectura de openpyxl"""
+    from openpyxl import load_workbook
+
+    libro = load_workbook(ruta, read_only=True, data_only=True)
+    try:
+        filas = libro.worksheets[0].iter_rows(values_only=True)
+        encabezado = [('' if c is None else str(c)) for c in next(filas, ())]
+        posiciones = [i for i, c in enumerate(encabezado) if columnas is None or c.strip() in columnas]
+        if not posiciones:
+            return
+        nombres = [encabezado[i] for i in posiciones]
+        extraer = operator.itemgetter(*posiciones)
+        ancho = max(posiciones) + 1
+
+        # El índice es la posición de la fila en el archivo (sin encabezado);
+        # las filas completamente vacías del final de la hoja se omiten
+        numerados = enumerate(filas)
+        while True:
+            lote = list(itertools.islice(numerados, tam_bloque))
+            if not lote:
+                break
+            datos, indice = [], []
+            for i, fila in lote:
+                if not any(v is not None for v in fila):
+                    continue
+                if len(fila) < ancho:
+                    fila = tuple(fila) + (None,) * (ancho - len(fila))
+                valores = extraer(fila)
+                datos.append(valores if len(posiciones) > 1 else (valores,))
+                indice.append(i)
+            if datos:
+                bloque = pd.DataFrame(datos, columns=nombres, index=pd.Index(indice))
+                objetos = bloque.columns[bloque.dtypes == object]
+                bloque[objetos] = bloque[objetos].where(~bloque[objetos].isin(VALORES_NULOS))
+                yield bloque.infer_objects()
+    finally:
+        libro.close()
+
+
+def _bloques_csv(ruta, tam_bloque, columnas):
+    usecols = None if columnas is None else (lambda c: c.strip() in columnas)
+    yield from pd.read_csv(ruta, chunksize=tam_bloque, usecols=usecols)
+
+
+def _bloques_parquet(ruta, tam_bloque, columnas):
+    import pyarrow.parquet as pq
+
+    archivo = pq.ParquetFile(ruta)
+    nombres = None if columnas is None else [c for c in archivo.schema_arrow.names if c.strip() in columnas]
+    inicio = 0
+    for lote in archivo.iter_batches(batch_size=tam_bloque, columns=nombres):
+        bloque = lote.to_pandas()
+        bloque.index = pd.RangeIndex(inicio, inicio + len(bloque))
+        inicio += len(bloque)
+        yield bloque
+
+
+def leer_bloques(ruta, tam_bloque=TAM_BLOQUE, columnas=None, formato=None):
+    """
+    Genera DataFrames crudos de hasta ``tam_bloque`` filas del archivo.
+
+    ``columnas`` limita la lectura a esas columnas (se comparan sin espacios
+    sobrantes). El índice de cada bloque es la posición de la fila en el
+    archivo, de modo que las filas inválidas se informan con su número real.
+    """
+    if not os.path.exists(ruta):
+        raise FileNotFoundError(ruta)
+    lectores = {'xlsx': _bloques_xlsx, 'csv': _bloques_csv, 'parquet': _bloques_parquet}
+    yield from lectores[_formato(ruta, formato)](ruta, tam_bloque, columnas)
+
+
+# ============= ACUMULACIÓN =============
+class AcumuladorCubo:
+    """
+    Conteos por (mes, barrio) × franja día-hora acumulados bloque a bloque.
+
+    Cada par (mes, barrio) distinto ocupa una fila de 168 conteos; la matriz
+    crece por duplicación, así que la memoria es proporcional al número de
+    pares distintos. Los barrios se codifican en orden de aparición y se
+    reordenan alfabéticamente al construir el cubo.
+    """
+
+    def __init__(self, capacidad=1024):
+        self.barrios = {}
+        self._pares = {}
+        self._conteos = np.zeros((capacidad, FRANJAS), dtype=np.int64)
+        self.filas = 0
+
+    def _codigos_barrio(self, valores):
+        """Códigos globales de barrio (-1 = sin barrio)"""
+        codigos, unicos = pd.factorize(valores)
+        if not len(unicos):
+            return codigos
+        globales = np.array([self.barrios.setdefault(u, len(self.barrios)) for u in unicos], dtype=np.int64)
+        return np.where(codigos >= 0, globales[np.maximum(codigos, 0)], -1)
+
+    def agregar(self, meses, franjas, barrios):
+        """
+        Suma un bloque: ``meses`` como meses desde 1970, ``franjas`` como
+        día × 24 + hora y ``barrios`` con los nombres (NaN = sin barrio).
+        """
+        if not len(meses):
+            return
+        codigos = self._codigos_barrio(barrios)
+        # Par (mes, barrio) empaquetado en un entero; el barrio se desplaza en 1 por el -1
+        pares = (np.asarray(meses, dtype=np.int64) << 32) | (codigos + 1)
+        locales, unicos = pd.factorize(pares)
+        filas = np.fromiter((self._pares.setdefault(p, len(self._pares)) for p in unicos.tolist()),
+                            dtype=np.int64, count=len(unicos))
+        if len(self._pares) > len(self._conteos):
+            crecida = np.zeros((max(len(self._pares), 2 * len(self._conteos)), FRANJAS), dtype=np.int64)
+            crecida[:len(self._conteos)] = self._conteos
+            self._conteos = crecida
+
+        bloque = np.bincount(locales * FRANJAS + np.asarray(franjas, dtype=np.int64),
+                             minlength=len(unicos) * FRANJAS).reshape(len(unicos), FRANJAS)
+        self._conteos[filas] += bloque
+        self.filas += len(meses)
+
+    @property
+    def nbytes(self):
+        return self._conteos.nbytes
+
+    def cubo(self):
+        """``CuboRoturas`` equivalente a ``construir_cubo`` sobre todas las filas"""
+        if not self._pares:
+            raise ValueError("No hay filas válidas para construir el cubo")
+        pares = np.fromiter(self._pares.keys(), dtype=np.int64, count=len(self._pares))
+        meses_abs = pares >> 32
+        codigos = (pares & 0xFFFFFFFF) - 1
+
+        nombres = np.array(list(self.barrios), dtype=object)
+        orden = np.argsort(nombres.astype(str), kind='stable')
+        posicion = np.empty(len(nombres), dtype=np.int64)
+        posicion[orden] = np.arange(len(nombres))
+        n_barrios = len(nombres) + 1
+        barrio = np.where(codigos >= 0, posicion[np.maximum(codigos, 0)] if len(nombres) else 0, len(nombres))
+
+        inicio = int(meses_abs.min())
+        meses = pd.period_range(pd.Period(np.datetime64(inicio, 'M'), freq='M'),
+                                pd.Period(np.datetime64(int(meses_abs.max()), 'M'), freq='M'), freq='M')
+        filas_pares = (meses_abs - inicio) * n_barrios + barrio
+
+        conteos = self._conteos[:len(pares)]
+        i, j = np.nonzero(conteos)
+        matriz = sparse.coo_matrix((conteos[i, j].astype(np.int32), (filas_pares[i], j)),
+                                   shape=(len(meses) * n_barrios, FRANJAS))
+        return CuboRoturas(meses, pd.Index(nombres[orden], name='Barrio'), matriz)
+
+
+def _campos_calendario(fechas):
+    """Meses desde 1970 y franja día × 24 + hora, directamente de los datetime64"""
+    valores = fechas.to_numpy(dtype='datetime64[ns]')
+    meses = valores.astype('datetime64[M]').astype(np.int64)
+    dias = valores.astype('datetime64[D]').astype(np.int64)
+    horas = valores.astype('datetime64[h]').astype(np.int64) % 24
+    # 1970-01-01 fue jueves (día 3 con lunes = 0)
+    return meses, ((dias + 3) % 7) * HORAS + horas
+
+
+def _texto(valores):
+    """Normaliza a texto como ``limpiar_datos`` (los NaN se conservan)"""
+    if valores.dtype == object:
+        return valores.where(valores.isna(), valores.astype(str))
+    return valores
+
+
+def _concatenar(bloques):
+    """Une los bloques limpios; las categóricas se unen sin pasar por object"""
+    if len(bloques) == 1:
+        return bloques[0].reset_index(drop=True)
+    columnas = {}
+    for col in bloques[0].columns:
+        partes = [b[col] for b in bloques]
+        tipo = partes[0].dtype
+        if (isinstance(tipo, pd.CategoricalDtype) and not tipo.ordered
+                and all(isinstance(p.dtype, pd.CategoricalDtype) for p in partes)):
+            columnas[col] = pd.Series(union_categoricals(partes, sort_categories=True))
+        else:
+            columnas[col] = pd.concat(partes, ignore_index=True)
+    return pd.DataFrame(columnas)
+
+
+# ============= INGESTA =============
+class Ingesta:
+    """Resultado de ``ingerir``: cubo, detalle (None en modo agregado) y conteos"""
+
+    def __init__(self, cubo, df, filas, invalidas, ejemplos, bloques, segundos):
+        self.cubo = cubo
+        self.df = df
+        self.filas = filas
+        self.invalidas = invalidas
+        self.ejemplos = ejemplos
+        self.bloques = bloques
+        self.segundos = segundos
+
+    def huella(self):
+        """Huella del contenido agregado (sirve sin el detalle)"""
+        return huella_cubo(self.cubo)
+
+
+def huella_cubo(cubo):
+    """Huella del cubo de conteos: cambia si cambia cualquier conteo o barrio"""
+    h = hashlib.sha256()
+    h.update(str(cubo.meses[0]).encode())
+    h.update('\x1f'.join(map(str, cubo.barrios)).encode('utf-8'))
+    for arreglo in (cubo.conteos.indptr, cubo.conteos.indices, cubo.conteos.data):
+        h.update(np.ascontiguousarray(arreglo).tobytes())
+    return h.hexdigest()[:16]
+
+
+def ingerir(ruta, modo='completo', tam_bloque=TAM_BLOQUE, formato=None, progreso=None):
+    """
+    Lee ``ruta`` por bloques y pliega cada uno en el cubo de conteos.
+
+    En modo ``completo`` devuelve además el DataFrame limpio (mismo esquema
+    que ``cargar_incidencias``, ordenado por fecha); en modo ``agregado``
+    solo se leen fecha y barrio y ``df`` es None. Las filas sin fecha
+    válida se descartan y se informan con un único aviso.
+    """
+    if modo not in MODOS:
+        raise ValueError(f"Modo no soportado: '{modo}' (use {', '.join(MODOS)})")
+    inicio = time.perf_counter()
+    acumulador = AcumuladorCubo()
+    detalle, invalidas, ejemplos, n_bloques = [], 0, {}, 0
+    columnas = COLUMNAS_CUBO if modo == 'agregado' else None
+
+    for bloque in leer_bloques(ruta, tam_bloque, columnas, formato):
+        n_bloques += 1
+        bloque.columns = bloque.columns.str.strip()
+        if modo == 'completo':
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                limpio = limpiar_datos(bloque)
+            info = limpio.attrs.pop('fechas_invalidas')
+            invalidas += info['total']
+            fechas, barrios = limpio['Fecha de Creación'], limpio['Barrio']
+            detalle.append(limpio)
+        else:
+            fechas, malas = parsear_fechas(bloque['Fecha de Creación'])
+            validas = fechas.notna().to_numpy()
+            info = {'total': len(malas), 'ejemplos': filas_invalidas(malas)}
+            invalidas += info['total']
+            fechas, barrios = fechas[validas], _texto(bloque['Barrio'])[validas]
+        if len(ejemplos) < MAX_EJEMPLOS_INVALIDOS:
+            ejemplos.update(itertools.islice(info['ejemplos'].items(), MAX_EJEMPLOS_INVALIDOS - len(ejemplos)))
+
+        meses, franjas = _campos_calendario(fechas)
+        acumulador.agregar(meses, franjas, barrios.to_numpy())
+        if progreso is not None:
+            progreso(acumulador.filas, n_bloques)
+
+    if invalidas:
+        warnings.warn(f"{invalidas:,} filas sin 'Fecha de Creación' válida descartadas "
+                      f"(filas {', '.join(map(str, list(ejemplos)[:5]))}{'...' if invalidas > 5 else ''})")
+
+    df = None
+    if modo == 'completo':
+        df = _concatenar(detalle)
+        del detalle
+        if not df['Fecha de Creación'].is_monotonic_increasing:
+            df = df.sort_values('Fecha de Creación', kind='stable', ignore_index=True)
+        df.attrs['fechas_invalidas'] = {'total': invalidas, 'ejemplos': ejemplos}
+
+    return Ingesta(acumulador.cubo(), df, acumulador.filas, invalidas, ejemplos,
+                   n_bloques, time.perf_counter() - inicio)
+
+
+# ============= CLI =============
+def main(argv=None):
+    import resource
+
+    parser = argparse.ArgumentParser(description="Ingesta por bloques de exportaciones de incidencias")
+    parser.add_argument('--ruta', required=True, help="Archivo .xlsx, .csv o .parquet")
+    parser.add_argument('--modo', choices=MODOS, default='agregado', help="Conservar el detalle o solo los agregados")
+    parser.add_argument('--bloque', type=int, default=TAM_BLOQUE, help="Filas por bloque")
+    parser.add_argument('--formato', choices=FORMATOS, default=None, help="Formato (por defecto, la extensión)")
+    args = parser.parse_args(argv)
+
+    def progreso(filas, bloques):
+        print(f"   {filas:,} filas en {bloques} bloques")
+
+    ingesta = ingerir(args.ruta, args.modo, args.bloque, args.formato, progreso)
+    cubo = ingesta.cubo
+    print(f"✅ {ingesta.filas:,} roturas en {ingesta.segundos:.2f} s "
+          f"({len(cubo.meses)} meses, {len(cubo.barrios):,} barrios, {ingesta.invalidas:,} filas inválidas)")
+    print(f"   Cubo: {cubo.nbytes / 1e6:.1f} MB"
+          + ('' if ingesta.df is None else f" | Detalle: {ingesta.df.memory_usage(deep=True).sum() / 1e6:.1f} MB")
+          + f" | Pico RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3:.0f} MB")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,313 @@
+"""
+📈 Métricas de Rendimiento del Dashboard - Predicción de Roturas en Red de Gas
+Universidad Tecnológica de Bolívar
+
+Instrumentación opcional del dashboard para saber dónde se va el tiempo:
+- duración de cada sección con nombre (carga de datos, pestañas, gráficas)
+- aciertos y fallos de las funciones con ``st.cache_data``/``st.cache_resource``
+- número de ejecuciones del script (reruns) por sesión
+
+Se activa con variables de entorno al lanzar Streamlit:
+
+    DASHBOARD_METRICAS=1                       activa la medición
+    DASHBOARD_METRICAS_PROM=metricas.prom      archivo en formato Prometheus
+                                               (para el textfile collector)
+    DASHBOARD_METRICAS_JSONL=metricas.jsonl    instantáneas en JSON lines
+    DASHBOARD_METRICAS_PUERTO=9108             endpoint HTTP /metrics
+
+Desactivada, ``seccion`` devuelve un contexto vacío compartido y
+``cacheada`` devuelve la función de Streamlit sin envolver, así que el costo
+es una comparación por sección.
+
+El registro es único por proceso: lo comparten todas las sesiones del
+servidor de Streamlit.
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Intervalo mínimo entre escrituras de los archivos de métricas
+INTERVALO_ESCRITURA = 10
+# Sesiones cuyo conteo de reruns se conserva (las más recientes)
+MAX_SESIONES = 500
+
+PREFIJO = 'dashboard'
+
+_NULO = nullcontext()
+
+
+def _activado(valor):
+    return (valor or '').strip().lower() in ('1', 'true', 'si', 'sí', 'yes', 'on')
+
+
+def _sesion_actual():
+    """Identificador de la sesión de Streamlit que ejecuta el script, si hay una"""
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+    except ImportError:
+        return None
+    ctx = get_script_run_ctx()
+    return None if ctx is None else ctx.session_id
+
+
+class _Seccion:
+    """Contexto que mide una sección y la anota en el medidor al salir"""
+
+    __slots__ = ('medidor', 'nombre', 'inicio')
+
+    def __init__(self, medidor, nombre):
+        self.medidor = medidor
+        self.nombre = nombre
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.medidor.registrar(self.nombre, time.perf_counter() - self.inicio)
+        return False
+
+
+# ============= REGISTRO =============
+class Medidor:
+    """
+    Registro de tiempos por sección, conteos de caché y reruns por sesión.
+
+    Todas las operaciones toman un lock: el servidor de Streamlit ejecuta
+    las sesiones en hilos distintos.
+    """
+
+    def __init__(self, habilitado=False, ruta_prometheus=None, ruta_jsonl=None,
+                 intervalo=INTERVALO_ESCRITURA, max_sesiones=MAX_SESIONES):
+        self.habilitado = habilitado
+        self.ruta_prometheus = ruta_prometheus
+        self.ruta_jsonl = ruta_jsonl
+        self.intervalo = intervalo
+        self.max_sesiones = max_sesiones
+        self._lock = threading.Lock()
+        self._ultima_escritura = 0.0
+        self._servidor = None
+        self.reiniciar()
+
+    @classmethod
+    def desde_entorno(cls, entorno=None):
+        """Crea el medidor según las variables ``DASHBOARD_METRICAS*``"""
+        entorno = os.environ if entorno is None else entorno
+        medidor = cls(
+            habilitado=_activado(entorno.get('DASHBOARD_METRICAS')),
+            ruta_prometheus=entorno.get('DASHBOARD_METRICAS_PROM') or None,
+            ruta_jsonl=entorno.get('DASHBOARD_METRICAS_JSONL') or None,
+        )
+        if medidor.habilitado and entorno.get('DASHBOARD_METRICAS_PUERTO'):
+            medidor.servir(int(entorno['DASHBOARD_METRICAS_PUERTO']))
+        return medidor
+
+    def reiniciar(self):
+        """Borra todo lo registrado"""
+        with self._lock:
+            self.desde = time.time()
+            self.secciones = {}  # nombre -> [conteo, total, máximo, último]
+            self.llamadas = {}
+            self.fallos = {}
+            self.sesiones = OrderedDict()
+            self.reruns = 0
+
+    # ----- Secciones -----
+    def seccion(self, nombre):
+        """Contexto que mide la duración de la sección ``nombre``"""
+        if not self.habilitado:
+            return _NULO
+        return _Seccion(self, nombre)
+
+    def medida(self, nombre=None):
+        """Decorador que mide cada llamada a la función como una sección"""
+        def aplicar(funcion):
+            if not self.habilitado:
+                return funcion
+            seccion = nombre or funcion.__name__
+
+            @functools.wraps(funcion)
+            def medir(*args, **kwargs):
+                with _Seccion(self, seccion):
+                    return funcion(*args, **kwargs)
+            return medir
+        return aplicar
+
+    def registrar(self, nombre, segundos):
+        """Anota una duración de la sección ``nombre``"""
+        with self._lock:
+            datos = self.secciones.get(nombre)
+            if datos is None:
+                self.secciones[nombre] = [1, segundos, segundos, segundos]
+            else:
+                datos[0] += 1
+                datos[1] += segundos
+                datos[2] = max(datos[2], segundos)
+                datos[3] = segundos
+
+    # ----- Cachés -----
+    def cacheada(self, decorador_cache):
+        """
+        Aplica ``decorador_cache`` (p. ej. ``st.cache_data``) contando
+        llamadas y fallos: la función original solo se ejecuta cuando la
+        caché falla, así que los aciertos son llamadas menos fallos. La
+        llamada completa se mide como la sección ``cache:<nombre>``.
+        """
+        def aplicar(funcion):
+            if not self.habilitado:
+                return decorador_cache(funcion)
+            nombre = funcion.__name__
+
+            @functools.wraps(funcion)
+            def ejecutar(*args, **kwargs):
+                self._contar(self.fallos, nombre)
+                return funcion(*args, **kwargs)
+
+            en_cache = decorador_cache(ejecutar)
+
+            @functools.wraps(funcion)
+            def llamar(*args, **kwargs):
+                self._contar(self.llamadas, nombre)
+                with _Seccion(self, f"cache:{nombre}"):
+                    return en_cache(*args, **kwargs)
+
+            llamar.clear = en_cache.clear
+            return llamar
+        return aplicar
+
+    def _contar(self, conteos, nombre):
+        with self._lock:
+            conteos[nombre] = conteos.get(nombre, 0) + 1
+
+    # ----- Reruns -----
+    def rerun(self, sesion=None):
+        """Anota una ejecución del script para la sesión (por defecto, la actual)"""
+        if not self.habilitado:
+            return
+        sesion = sesion or _sesion_actual() or 'sin_sesion'
+        with self._lock:
+            self.reruns += 1
+            self.sesiones[sesion] = self.sesiones.pop(sesion, 0) + 1
+            while len(self.sesiones) > self.max_sesiones:
+                self.sesiones.popitem(last=False)
+
+    # ----- Exportación -----
+    def instantanea(self):
+        """Estado actual como dict serializable a JSON"""
+        with self._lock:
+            secciones = {
+                nombre: {'conteo': c, 'total_s': t, 'media_s': t / c, 'max_s': m, 'ultimo_s': u}
+                for nombre, (c, t, m, u) in self.secciones.items()
+            }
+            caches = {
+                nombre: {'llamadas': llamadas, 'fallos': self.fallos.get(nombre, 0),
+                         'aciertos': llamadas - self.fallos.get(nombre, 0)}
+                for nombre, llamadas in self.llamadas.items()
+            }
+            return {
+                'timestamp': time.time(),
+                'desde': self.desde,
+                'pid': os.getpid(),
+                'secciones': secciones,
+                'caches': caches,
+                'reruns': {'total': self.reruns, 'sesiones': len(self.sesiones),
+                           'por_sesion': dict(self.sesiones)},
+            }
+
+    def prometheus(self):
+        """Métricas en el formato de texto de Prometheus"""
+        datos = self.instantanea()
+        secciones, caches = datos['secciones'].items(), datos['caches'].items()
+        lineas = []
+
+        def metrica(nombre, tipo, ayuda, muestras):
+            """``muestras``: (sufijo, etiquetas, valor) de la familia ``nombre``"""
+            lineas.append(f"# HELP {PREFIJO}_{nombre} {ayuda}")
+            lineas.append(f"# TYPE {PREFIJO}_{nombre} {tipo}")
+            for sufijo, etiquetas, valor in muestras:
+                etiqueta = ','.join(f'{k}="{_escapar(v)}"' for k, v in etiquetas.items())
+                lineas.append(f"{PREFIJO}_{nombre}{sufijo}{{{etiqueta}}} {valor:.9g}" if etiqueta
+                              else f"{PREFIJO}_{nombre}{sufijo} {valor:.9g}")
+
+        # Summary sin cuantiles: solo las series _sum y _count
+        metrica('seccion_segundos', 'summary', "Duración de las secciones del dashboard",
+                [(sufijo, {'seccion': n}, s[campo]) for n, s in secciones
+                 for sufijo, campo in (('_sum', 'total_s'), ('_count', 'conteo'))])
+        metrica('seccion_segundos_max', 'gauge', "Duración máxima de cada sección",
+                [('', {'seccion': n}, s['max_s']) for n, s in secciones])
+        metrica('cache_llamadas_total', 'counter', "Llamadas a funciones cacheadas",
+                [('', {'funcion': n}, c['llamadas']) for n, c in caches])
+        metrica('cache_fallos_total', 'counter', "Fallos de caché (la función se ejecutó)",
+                [('', {'funcion': n}, c['fallos']) for n, c in caches])
+        metrica('reruns_total', 'counter', "Ejecuciones del script", [('', {}, datos['reruns']['total'])])
+        metrica('sesiones', 'gauge', "Sesiones con reruns registrados", [('', {}, datos['reruns']['sesiones'])])
+        metrica('reruns_por_sesion_max', 'gauge', "Máximo de reruns de una sesión",
+                [('', {}, max(datos['reruns']['por_sesion'].values(), default=0))])
+        return '\n'.join(lineas) + '\n'
+
+    def exportar(self, forzar=False):
+        """
+        Escribe el archivo Prometheus (reemplazándolo) y agrega una línea al
+        JSONL, como mucho una vez cada ``intervalo`` segundos.
+        """
+        if not self.habilitado or not (self.ruta_prometheus or self.ruta_jsonl):
+            return False
+        ahora = time.monotonic()
+        with self._lock:
+            if not forzar and ahora - self._ultima_escritura < self.intervalo:
+                return False
+            self._ultima_escritura = ahora
+
+        if self.ruta_prometheus:
+            temporal = f"{self.ruta_prometheus}.{os.getpid()}.tmp"
+            with open(temporal, 'w', encoding='utf-8') as f:
+                f.write(self.prometheus())
+            os.replace(temporal, self.ruta_prometheus)
+        if self.ruta_jsonl:
+            with open(self.ruta_jsonl, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(self.instantanea(), ensure_ascii=False) + '\n')
+        return True
+
+    def servir(self, puerto, host='0.0.0.0'):
+        """Sirve ``/metrics`` (Prometheus) y ``/metrics.json`` en un hilo de fondo"""
+        if self._servidor is not None:
+            return self._servidor
+        medidor = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            def do_GET(self):
+                ruta = self.path.split('?', 1)[0]
+                if ruta == '/metrics':
+                    cuerpo, tipo = medidor.prometheus().encode('utf-8'), 'text/plain; version=0.0.4'
+                elif ruta == '/metrics.json':
+                    cuerpo, tipo = json.dumps(medidor.instantanea()).encode('utf-8'), 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', tipo)
+                self.send_header('Content-Length', str(len(cuerpo)))
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+            def log_message(self, formato, *args):
+                pass
+
+        self._servidor = ThreadingHTTPServer((host, puerto), Manejador)
+        self._servidor.daemon_threads = True
+        threading.Thread(target=self._servidor.serve_forever, daemon=True).start()
+        return self._servidor
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# Registro único del proceso (los módulos se importan una vez por servidor)
+medidor = Medidor.desde_entorno()
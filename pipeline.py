@@ -0,0 +1,450 @@
+"""
+⚙️ Pipeline del Modelo - Predicción de Roturas en Red de Gas
+Universidad Tecnológica de Bolívar
+
+Reemplaza la ejecución manual de ``modelo.ipynb`` de principio a fin: cada
+paso del notebook es una etapa con entradas y salidas declaradas, y las
+etapas forman un grafo (DAG) según qué archivo produce cada una:
+
+    datos ─┬─ descomposicion, estacionariedad        (Imagenes/*.png)
+           ├─ grid ── modelo ── diagnostico ─┬─ resultados, residuos
+           │                                 │      (Imagenes/*.png)
+           └─ flota                          └─ (modelos/diagnostico.npz)
+
+- datos: caché Parquet de incidencias (``datos.py``)
+- grid: búsqueda de órdenes SARIMA sobre los meses de entrenamiento
+  (``busqueda_grid.py``); el mejor por AIC queda en ``grid.json``
+- modelo: ajuste final con ese orden sobre log1p, ``modelos/sarima_final.npz``
+- diagnostico: residuos, pruebas, baseline, + log y rolling window,
+  ``modelos/diagnostico.npz``
+- flota: un modelo por barrio y distrito, ``modelos/flota_barrios.npz``
+- descomposicion, estacionariedad, resultados, residuos: las figuras del
+  notebook (``imagenes.py``)
+
+Las salidas son los archivos que carga el dashboard. Cada etapa tiene una
+huella: contenido de sus archivos de entrada, código de sus módulos,
+parámetros y versiones de las bibliotecas. Si la huella coincide con la de
+la última ejecución y sus salidas siguen intactas, la etapa se omite; si
+no, se ejecuta y, con ella, las que dependen de sus salidas. Las etapas
+cuyas dependencias ya terminaron se ejecutan en paralelo en procesos
+separados. El estado se guarda en ``.cache/pipeline/estado.json``.
+
+Uso desde la línea de comandos:
+
+    python pipeline.py                           # ejecuta lo que esté desactualizado
+    python pipeline.py --listar                  # estado de cada etapa, sin ejecutar
+    python pipeline.py --etapas diagnostico      # una etapa (y lo que necesite)
+    python pipeline.py --forzar modelo           # re-ejecuta una etapa aunque esté vigente
+    python pipeline.py --workers 2 --procesos 2  # etapas en paralelo × procesos por etapa
+"""
+
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+
+from busqueda_grid import limitar_hilos_blas
+from cache_ajustes import versiones_bibliotecas
+from datos import DIR_CACHE, RUTA_EXCEL
+
+DIR_TRABAJO = os.path.join(DIR_CACHE, 'pipeline')
+DIR_MODELOS = 'modelos'
+
+# Versión del formato del estado y de la huella: incrementar si cambian
+VERSION_PIPELINE = 1
+
+PARAMETROS = {
+    'meses_test': 6,
+    'maxiter': 100,
+    'presupuesto_s': 60,
+    'horizonte_flota': 12,
+    'reconciliacion': 'mint_shrink',
+    'dpi': 300,
+}
+
+DIR_MODULOS = os.path.dirname(os.path.abspath(__file__))
+
+
+# ============= ETAPAS =============
+class Etapa:
+    """
+    Paso del pipeline: ``funcion(config)`` lee ``entradas`` y escribe
+    ``salidas`` (rutas de archivo). ``codigo`` son los módulos cuyo cambio
+    invalida la etapa y ``parametros`` las claves de ``config`` que
+    cambian su resultado.
+    """
+
+    def __init__(self, nombre, funcion, entradas, salidas, codigo=(), parametros=()):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.entradas = list(entradas)
+        self.salidas = list(salidas)
+        self.codigo = list(codigo)
+        self.parametros = list(parametros)
+
+
+def _serie(config):
+    from datos import cargar_incidencias, serie_mensual
+
+    df = cargar_incidencias(config['ruta'])
+    return df, serie_mensual(df)['Num_Roturas']
+
+
+def etapa_datos(config):
+    from datos import cache_vigente, construir_cache
+
+    if not cache_vigente(config['ruta']):
+        construir_cache(config['ruta'])
+
+
+def etapa_grid(config):
+    from busqueda_grid import RUTA_ALMACEN, busqueda_grid, generar_combinaciones, mejor_configuracion
+
+    _, serie = _serie(config)
+    train, test = serie[:-config['meses_test']], serie[-config['meses_test']:]
+    df_resultados = busqueda_grid(train, test, generar_combinaciones(), max_workers=config['procesos'],
+                                  presupuesto_s=config['presupuesto_s'], maxiter=config['maxiter'],
+                                  ruta_almacen=RUTA_ALMACEN)
+    mejor = mejor_configuracion(df_resultados, 'AIC')
+    resumen = {
+        'order': list(mejor['order']),
+        'seasonal_order': list(mejor['seasonal']),
+        'AIC': float(mejor['AIC']),
+        'MAE': float(mejor['MAE']),
+        'MAPE': float(mejor['MAPE']),
+        'configuraciones': len(df_resultados),
+        'convergidas': int((df_resultados['estado'] == 'ok').sum()),
+    }
+    _escribir_json(config['grid'], resumen)
+
+
+def etapa_modelo(config):
+    from pronostico import ajustar_modelo, extraer_artefacto, guardar_artefacto
+
+    with open(config['grid'], encoding='utf-8') as f:
+        mejor = json.load(f)
+    _, serie = _serie(config)
+    resultado = ajustar_modelo(serie, tuple(mejor['order']), tuple(mejor['seasonal_order']), 'log1p')
+    guardar_artefacto(extraer_artefacto(resultado, serie, 'log1p'), config['artefacto'])
+
+
+def etapa_diagnostico(config):
+    from diagnostico import actualizar_diagnostico
+    from pronostico import cargar_artefacto
+
+    _, serie = _serie(config)
+    actualizar_diagnostico(cargar_artefacto(config['artefacto']), serie, config['diagnostico'],
+                           meses_test=config['meses_test'], max_workers=config['procesos'])
+
+
+def etapa_flota(config):
+    from flota import entrenar_flota, guardar_flota
+
+    df, _ = _serie(config)
+    guardar_flota(entrenar_flota(df, horizonte=config['horizonte_flota'], max_workers=config['procesos'],
+                                 reconciliacion=config['reconciliacion']), config['flota'])
+
+
+def etapa_descomposicion(config):
+    from imagenes import figura_descomposicion
+
+    _, serie = _serie(config)
+    figura_descomposicion(serie, config['imagenes']['descomposicion'], config['dpi'])
+
+
+def etapa_estacionariedad(config):
+    from imagenes import figura_estacionariedad
+
+    _, serie = _serie(config)
+    figura_estacionariedad(serie, config['imagenes']['estacionariedad'], config['dpi'])
+
+
+def etapa_resultados(config):
+    from diagnostico import cargar_diagnostico
+    from imagenes import figura_resultados
+    from pronostico import cargar_artefacto
+
+    df, serie = _serie(config)
+    figura_resultados(df, serie, cargar_artefacto(config['artefacto']), cargar_diagnostico(config['diagnostico']),
+                      config['imagenes']['resultados'], config['meses_test'], config['dpi'])
+
+
+def etapa_residuos(config):
+    from diagnostico import cargar_diagnostico
+    from imagenes import figura_residuos
+
+    figura_residuos(cargar_diagnostico(config['diagnostico']), config['imagenes']['residuos'], config['dpi'])
+
+
+def configurar(ruta=RUTA_EXCEL, dir_modelos=DIR_MODELOS, dir_imagenes=None, dir_trabajo=DIR_TRABAJO,
+               procesos=None, **parametros):
+    """Rutas y parámetros que reciben las etapas (un diccionario serializable)"""
+    from imagenes import DIR_IMAGENES, FIGURAS
+
+    dir_imagenes = DIR_IMAGENES if dir_imagenes is None else dir_imagenes
+    return {
+        **PARAMETROS,
+        **parametros,
+        'ruta': ruta,
+        'dir_trabajo': dir_trabajo,
+        'grid': os.path.join(dir_trabajo, 'grid.json'),
+        'artefacto': os.path.join(dir_modelos, 'sarima_final.npz'),
+        'diagnostico': os.path.join(dir_modelos, 'diagnostico.npz'),
+        'flota': os.path.join(dir_modelos, 'flota_barrios.npz'),
+        'imagenes': {nombre: os.path.join(dir_imagenes, archivo) for nombre, archivo in FIGURAS.items()},
+        'procesos': procesos,
+    }
+
+
+def definir_etapas(config):
+    """Etapas del pipeline en orden topológico"""
+    from datos import rutas_cache
+
+    # Las demás etapas dependen solo del Parquet: los metadatos cambian con el mtime del Excel
+    ruta_parquet, ruta_meta = rutas_cache(config['ruta'])
+    parquet = [ruta_parquet]
+    imagenes = config['imagenes']
+    return [
+        Etapa('datos', etapa_datos, [config['ruta']], [ruta_parquet, ruta_meta], ['datos.py', 'esquema.py']),
+        Etapa('descomposicion', etapa_descomposicion, parquet, [imagenes['descomposicion']],
+              ['imagenes.py'], ['dpi']),
+        Etapa('estacionariedad', etapa_estacionariedad, parquet, [imagenes['estacionariedad']],
+              ['imagenes.py'], ['dpi']),
+        Etapa('grid', etapa_grid, parquet, [config['grid']], ['busqueda_grid.py'],
+              ['meses_test', 'maxiter', 'presupuesto_s']),
+        Etapa('modelo', etapa_modelo, parquet + [config['grid']], [config['artefacto']], ['pronostico.py']),
+        Etapa('flota', etapa_flota, parquet, [config['flota']], ['flota.py', 'reconciliacion.py'],
+              ['horizonte_flota', 'reconciliacion']),
+        Etapa('diagnostico', etapa_diagnostico, parquet + [config['artefacto']], [config['diagnostico']],
+              ['diagnostico.py', 'validacion.py', 'pronostico.py'], ['meses_test']),
+        Etapa('resultados', etapa_resultados, parquet + [config['artefacto'], config['diagnostico']],
+              [imagenes['resultados']], ['imagenes.py'], ['meses_test', 'dpi']),
+        Etapa('residuos', etapa_residuos, [config['diagnostico']], [imagenes['residuos']],
+              ['imagenes.py'], ['dpi']),
+    ]
+
+
+def dependencias(etapas):
+    """Etapas de las que depende cada una: las que producen alguno de sus archivos de entrada"""
+    productor = {ruta: etapa.nombre for etapa in etapas for ruta in etapa.salidas}
+    return {etapa.nombre: sorted({productor[r] for r in etapa.entradas if r in productor} - {etapa.nombre})
+            for etapa in etapas}
+
+
+def con_ancestros(nombres, deps):
+    """Las etapas pedidas y todas aquellas de las que dependen"""
+    pendientes, incluidas = list(nombres), set()
+    while pendientes:
+        nombre = pendientes.pop()
+        if nombre not in incluidas:
+            incluidas.add(nombre)
+            pendientes.extend(deps[nombre])
+    return incluidas
+
+
+# ============= HUELLAS Y ESTADO =============
+def _hash_archivo(ruta):
+    from datos import _hash_contenido
+
+    return _hash_contenido(ruta) if os.path.exists(ruta) else None
+
+
+def huella_etapa(etapa, config):
+    """Huella de todo lo que determina las salidas de la etapa"""
+    h = hashlib.sha256()
+    h.update(json.dumps({
+        'version': VERSION_PIPELINE,
+        'etapa': etapa.nombre,
+        'funcion': inspect.getsource(etapa.funcion),
+        'entradas': {os.path.basename(r): _hash_archivo(r) for r in etapa.entradas},
+        'codigo': {m: _hash_archivo(os.path.join(DIR_MODULOS, m)) for m in etapa.codigo},
+        'parametros': {p: config[p] for p in etapa.parametros},
+        'bibliotecas': versiones_bibliotecas(),
+    }, sort_keys=True).encode('utf-8'))
+    return h.hexdigest()[:32]
+
+
+def _escribir_json(ruta, contenido):
+    directorio = os.path.dirname(ruta)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(contenido, f, ensure_ascii=False, indent=2)
+    os.replace(temporal, ruta)
+
+
+def leer_estado(dir_trabajo=DIR_TRABAJO):
+    try:
+        with open(os.path.join(dir_trabajo, 'estado.json'), encoding='utf-8') as f:
+            estado = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return estado.get('etapas', {}) if estado.get('version') == VERSION_PIPELINE else {}
+
+
+def guardar_estado(estado, dir_trabajo=DIR_TRABAJO):
+    _escribir_json(os.path.join(dir_trabajo, 'estado.json'), {'version': VERSION_PIPELINE, 'etapas': estado})
+
+
+def vigente(etapa, huella, registro):
+    """La última ejecución tuvo la misma huella y sus salidas no se han tocado"""
+    if not registro or registro.get('huella') != huella:
+        return False
+    return all(registro['salidas'].get(r) is not None and registro['salidas'][r] == _hash_archivo(r)
+               for r in etapa.salidas)
+
+
+# ============= EJECUCIÓN =============
+def _ejecutar(etapa, config):
+    """Corre una etapa y devuelve sus segundos (en el proceso trabajador o en el actual)"""
+    inicio = time.perf_counter()
+    etapa.funcion(config)
+    faltantes = [r for r in etapa.salidas if not os.path.exists(r)]
+    if faltantes:
+        raise RuntimeError(f"La etapa '{etapa.nombre}' no produjo: {', '.join(faltantes)}")
+    return time.perf_counter() - inicio
+
+
+def ejecutar_pipeline(config, etapas=None, seleccion=None, forzar=(), max_workers=None, informar=print):
+    """
+    Ejecuta las etapas seleccionadas (por defecto todas) y las que
+    necesitan, omitiendo las vigentes. Las etapas listas se reparten entre
+    ``max_workers`` procesos (con 1, se ejecutan en este proceso). Si una
+    etapa falla, las que dependen de ella no se ejecutan y el resto sigue.
+
+    Devuelve ``{etapa: 'omitida' | 'ejecutada' | 'fallida' | 'bloqueada'}``.
+    """
+    etapas = etapas or definir_etapas(config)
+    por_nombre = {etapa.nombre: etapa for etapa in etapas}
+    deps = dependencias(etapas)
+    incluidas = con_ancestros(seleccion or list(por_nombre), deps)
+    forzar = set(por_nombre) if 'todas' in forzar else set(forzar)
+    orden = [etapa.nombre for etapa in etapas if etapa.nombre in incluidas]
+
+    estado = leer_estado(config['dir_trabajo'])
+    resultado = {}
+    huellas = {}
+    max_workers = max_workers or os.cpu_count() or 1
+    pool = ProcessPoolExecutor(max_workers=max_workers, initializer=limitar_hilos_blas) if max_workers > 1 else None
+    en_curso = {}
+
+    def terminar(nombre, segundos=None, error=None):
+        etapa = por_nombre[nombre]
+        if error is not None:
+            resultado[nombre] = 'fallida'
+            informar(f"❌ {nombre}: {error}")
+            return
+        resultado[nombre] = 'ejecutada'
+        estado[nombre] = {'huella': huellas[nombre], 'salidas': {r: _hash_archivo(r) for r in etapa.salidas},
+                          'segundos': round(segundos, 2), 'fecha': datetime.now().isoformat(timespec='seconds')}
+        guardar_estado(estado, config['dir_trabajo'])
+        informar(f"✅ {nombre} ({segundos:.1f} s)")
+
+    try:
+        while len(resultado) < len(orden):
+            for nombre in orden:
+                if nombre in resultado or nombre in en_curso:
+                    continue
+                estados_deps = [resultado.get(d) for d in deps[nombre]]
+                if any(e in ('fallida', 'bloqueada') for e in estados_deps):
+                    resultado[nombre] = 'bloqueada'
+                    informar(f"⛔ {nombre}: depende de una etapa que falló")
+                    continue
+                if not all(e in ('omitida', 'ejecutada') for e in estados_deps):
+                    continue
+                # Las entradas ya son definitivas: se calcula la huella
+                etapa = por_nombre[nombre]
+                huellas[nombre] = huella_etapa(etapa, config)
+                if nombre not in forzar and vigente(etapa, huellas[nombre], estado.get(nombre)):
+                    resultado[nombre] = 'omitida'
+                    informar(f"⏭️  {nombre}: vigente")
+                    continue
+                informar(f"▶️  {nombre}...")
+                if pool is None:
+                    try:
+                        terminar(nombre, _ejecutar(etapa, config))
+                    except Exception as error:  # noqa: BLE001 - se informa y se bloquean sus dependientes
+                        terminar(nombre, error=error)
+                else:
+                    en_curso[nombre] = pool.submit(_ejecutar, etapa, config)
+
+            if en_curso:
+                hechos, _ = wait(en_curso.values(), return_when=FIRST_COMPLETED)
+                for nombre in [n for n, futuro in en_curso.items() if futuro in hechos]:
+                    futuro = en_curso.pop(nombre)
+                    if futuro.exception() is not None:
+                        terminar(nombre, error=futuro.exception())
+                    else:
+                        terminar(nombre, futuro.result())
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    return resultado
+
+
+# ============= CLI =============
+def _listar(config, etapas):
+    deps = dependencias(etapas)
+    estado = leer_estado(config['dir_trabajo'])
+    print(f"{'Etapa':<16} {'Estado':<14} {'Depende de':<28} Salidas")
+    print("-" * 90)
+    for etapa in etapas:
+        registro = estado.get(etapa.nombre)
+        # La huella usa las entradas actuales: si una dependencia está
+        # pendiente, esta aparece vigente hasta que aquella se ejecute
+        situacion = 'vigente' if vigente(etapa, huella_etapa(etapa, config), registro) else 'pendiente'
+        print(f"{etapa.nombre:<16} {situacion:<14} {', '.join(deps[etapa.nombre]) or '-':<28} "
+              f"{', '.join(etapa.salidas)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ejecuta el pipeline del modelo con etapas en caché")
+    parser.add_argument('--ruta', default=RUTA_EXCEL, help="Archivo Excel de origen")
+    parser.add_argument('--modelos', default=DIR_MODELOS, help="Directorio de los artefactos .npz")
+    parser.add_argument('--imagenes', default=None, help="Directorio de las figuras PNG (por defecto, Imagenes)")
+    parser.add_argument('--trabajo', default=DIR_TRABAJO, help="Directorio del estado y los intermedios")
+    parser.add_argument('--etapas', nargs='+', default=None, help="Etapas a ejecutar (y las que necesiten)")
+    parser.add_argument('--forzar', nargs='*', default=None,
+                        help="Etapas a re-ejecutar aunque estén vigentes (sin nombres, todas)")
+    parser.add_argument('--workers', type=int, default=None, help="Etapas en paralelo (por defecto, núcleos)")
+    parser.add_argument('--procesos', type=int, default=None,
+                        help="Procesos dentro de cada etapa: grid, backtest y flota (por defecto, núcleos)")
+    parser.add_argument('--listar', action='store_true', help="Mostrar el estado de las etapas sin ejecutar")
+    args = parser.parse_args(argv)
+
+    config = configurar(args.ruta, args.modelos, args.imagenes, args.trabajo, args.procesos)
+    etapas = definir_etapas(config)
+    nombres = [etapa.nombre for etapa in etapas]
+    for nombre in (args.etapas or []) + [n for n in args.forzar or [] if n != 'todas']:
+        if nombre not in nombres:
+            parser.error(f"Etapa desconocida: {nombre} (disponibles: {', '.join(nombres)})")
+
+    if args.listar:
+        _listar(config, etapas)
+        return 0
+
+    if not os.path.exists(args.ruta):
+        print(f"❌ No se encontró el archivo de datos: {args.ruta}", file=sys.stderr)
+        return 1
+
+    inicio = time.perf_counter()
+    forzar = ['todas'] if args.forzar == [] else args.forzar or ()
+    resultado = ejecutar_pipeline(config, etapas, args.etapas, forzar, args.workers)
+
+    conteo = {e: sum(1 for r in resultado.values() if r == e)
+              for e in ('ejecutada', 'omitida', 'fallida', 'bloqueada')}
+    print(f"\n⚙️  {len(resultado)} etapas en {time.perf_counter() - inicio:.1f} s: "
+          f"{conteo['ejecutada']} ejecutadas, {conteo['omitida']} vigentes"
+          + (f", {conteo['fallida']} fallidas, {conteo['bloqueada']} bloqueadas"
+             if conteo['fallida'] or conteo['bloqueada'] else ""))
+    return 1 if conteo['fallida'] or conteo['bloqueada'] else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,221 @@
+"""
+🔮 Motor de Pronóstico SARIMA - Predicción de Roturas en Red de Gas
+Universidad Tecnológica de Bolívar
+
+Ajusta fuera de línea el modelo final del notebook (SARIMA(0,1,1)(0,1,1,12)
+sobre log1p de la serie mensual) y guarda un artefacto liviano con los
+parámetros estimados, las matrices del espacio de estados y el estado del
+filtro de Kalman al final de la muestra. El dashboard carga ese artefacto y
+proyecta el estado hacia adelante con NumPy, sin volver a ajustar el modelo
+ni importar statsmodels.
+
+Uso desde la línea de comandos:
+
+    python pronostico.py                         # ajusta y guarda el artefacto
+    python pronostico.py --salida otro.npz       # guarda en otra ruta
+
+Al guardar el modelo se regenera también su diagnóstico (``diagnostico.py``).
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from cache_ajustes import cache_ajustes, clave_ajuste
+
+RUTA_ARTEFACTO = os.path.join('modelos', 'sarima_final.npz')
+
+ORDEN = (0, 1, 1)
+ORDEN_ESTACIONAL = (0, 1, 1, 12)
+
+# Versión del formato del artefacto (2: primer_mes, estimado_hasta,
+# observaciones y residuos para la actualización incremental)
+VERSION_ARTEFACTO = 2
+
+
+# ============= AJUSTE (FUERA DE LÍNEA) =============
+def escala_modelo(valores, transformacion='log1p'):
+    """Lleva roturas/mes a la escala en que se ajusta el modelo"""
+    return np.log1p(valores) if transformacion == 'log1p' else valores
+
+
+def ajustar_modelo(serie, order=ORDEN, seasonal_order=ORDEN_ESTACIONAL, transformacion='log1p', cache=None):
+    """
+    Ajusta SARIMAX sobre la serie mensual y devuelve el objeto de resultados.
+
+    Si la misma serie ya se ajustó con la misma configuración (ver
+    ``cache_ajustes.py``), el resultado se reconstruye filtrando con los
+    parámetros guardados, sin optimizar: pronósticos, intervalos y AIC son
+    los del ajuste original.
+    """
+    from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+    cache = cache_ajustes if cache is None else cache
+    clave = clave_ajuste(serie, order, seasonal_order, transformacion)
+    modelo = SARIMAX(escala_modelo(serie, transformacion), order=order, seasonal_order=seasonal_order)
+    entrada = cache.obtener(clave)
+    if entrada is not None:
+        return modelo.filter(entrada['params'])
+
+    resultado = modelo.fit(disp=False)
+    cache.guardar(clave, {
+        'params': np.asarray(resultado.params, dtype=float),
+        'meta': {'nombres_parametros': list(resultado.params.index), 'aic': float(resultado.aic),
+                 'convergio': bool(resultado.mle_retvals.get('converged', True)),
+                 'iteraciones': resultado.mle_retvals.get('iterations')},
+    })
+    return resultado
+
+
+def extraer_artefacto(resultado, serie, transformacion='log1p', estimado_hasta=None):
+    """
+    Reduce un resultado de SARIMAX a lo mínimo necesario para pronosticar:
+    parámetros, matrices del sistema (invariantes en el tiempo) y el estado
+    predicho a(n+1|n) con su covarianza P(n+1|n).
+
+    Guarda además las observaciones filtradas y los residuos estandarizados
+    de un paso de los meses posteriores a ``estimado_hasta`` (el último mes
+    usado para estimar los parámetros; por defecto, el último de la serie),
+    que usa ``actualizacion.py`` para extender el filtro y vigilar la deriva.
+    """
+    filtro = resultado.filter_results
+    modelo = resultado.model
+    ultimo_mes = serie.index[-1].to_period('M')
+    estimado_hasta = ultimo_mes if estimado_hasta is None else pd.Period(estimado_hasta, freq='M')
+    posteriores = (ultimo_mes - estimado_hasta).n
+    residuos = filtro.standardized_forecasts_error[0]
+    meta = {
+        'version': VERSION_ARTEFACTO,
+        'order': list(modelo.order),
+        'seasonal_order': list(modelo.seasonal_order),
+        'transformacion': transformacion,
+        'nombres_parametros': list(resultado.params.index),
+        'primer_mes': str(serie.index[0].to_period('M')),
+        'ultimo_mes': str(ultimo_mes),
+        'estimado_hasta': str(estimado_hasta),
+        'nobs': int(resultado.nobs),
+        'aic': float(resultado.aic),
+    }
+    return {
+        'meta': meta,
+        'parametros': np.asarray(resultado.params, dtype=float),
+        'Z': filtro.design[:, :, 0].copy(),
+        'T': filtro.transition[:, :, 0].copy(),
+        'R': filtro.selection[:, :, 0].copy(),
+        'Q': filtro.state_cov[:, :, 0].copy(),
+        'H': filtro.obs_cov[:, :, 0].copy(),
+        'd': filtro.obs_intercept[:, 0].copy(),
+        'c': filtro.state_intercept[:, 0].copy(),
+        'estado': filtro.predicted_state[:, -1].copy(),
+        'cov_estado': filtro.predicted_state_cov[:, :, -1].copy(),
+        'observaciones': np.asarray(modelo.endog, dtype=float).ravel().copy(),
+        'residuos': residuos[len(residuos) - posteriores:].copy() if posteriores else np.empty(0),
+    }
+
+
+def guardar_artefacto(artefacto, ruta=RUTA_ARTEFACTO):
+    """Guarda el artefacto en un .npz comprimido (metadatos como JSON)"""
+    directorio = os.path.dirname(ruta)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+    arrays = {k: v for k, v in artefacto.items() if k != 'meta'}
+    temporal = f"{ruta}.{os.getpid()}.tmp.npz"
+    np.savez_compressed(temporal, meta=np.array(json.dumps(artefacto['meta'])), **arrays)
+    os.replace(temporal, ruta)
+
+
+def cargar_artefacto(ruta=RUTA_ARTEFACTO):
+    """Carga un artefacto guardado con guardar_artefacto"""
+    with np.load(ruta, allow_pickle=False) as datos_npz:
+        artefacto = {k: datos_npz[k] for k in datos_npz.files if k != 'meta'}
+        artefacto['meta'] = json.loads(str(datos_npz['meta']))
+    if artefacto['meta'].get('version') != VERSION_ARTEFACTO:
+        raise ValueError(f"Versión de artefacto no soportada: {artefacto['meta'].get('version')}")
+    return artefacto
+
+
+# ============= PRONÓSTICO (EN LÍNEA) =============
+def proyectar_estado(artefacto, pasos):
+    """
+    Propaga el filtro de Kalman ``pasos`` meses hacia adelante.
+
+    Devuelve la media y la varianza del pronóstico en la escala del modelo
+    (log1p si el modelo se ajustó con esa transformación).
+    """
+    Z, T, R = artefacto['Z'], artefacto['T'], artefacto['R']
+    Q, H, d, c = artefacto['Q'], artefacto['H'], artefacto['d'], artefacto['c']
+    a = artefacto['estado'].copy()
+    P = artefacto['cov_estado'].copy()
+    RQR = R @ Q @ R.T
+
+    medias = np.empty(pasos)
+    varianzas = np.empty(pasos)
+    for h in range(pasos):
+        medias[h] = (d + Z @ a)[0]
+        varianzas[h] = (Z @ P @ Z.T + H)[0, 0]
+        a = c + T @ a
+        P = T @ P @ T.T + RQR
+    return medias, varianzas
+
+
+def pronosticar(artefacto, pasos, confianza=95):
+    """
+    Pronóstico e intervalo de confianza en la escala original (roturas/mes).
+
+    Devuelve un DataFrame con Fecha, Prediccion, IC_Inferior e IC_Superior.
+    """
+    medias, varianzas = proyectar_estado(artefacto, pasos)
+    z = stats.norm.ppf(0.5 + confianza / 200)
+    desv = np.sqrt(varianzas)
+    inferior, superior = medias - z * desv, medias + z * desv
+
+    if artefacto['meta']['transformacion'] == 'log1p':
+        medias, inferior, superior = np.expm1(medias), np.expm1(inferior), np.expm1(superior)
+
+    ultimo_mes = pd.Period(artefacto['meta']['ultimo_mes'], freq='M')
+    fechas = pd.date_range(start=(ultimo_mes + 1).start_time, periods=pasos, freq='M')
+
+    return pd.DataFrame({
+        'Fecha': fechas,
+        'Prediccion': medias,
+        'IC_Inferior': np.maximum(inferior, 0),
+        'IC_Superior': superior,
+    })
+
+
+# ============= CLI =============
+def main(argv=None):
+    from datos import RUTA_EXCEL, cargar_incidencias, serie_mensual
+    from diagnostico import RUTA_DIAGNOSTICO, actualizar_diagnostico
+
+    parser = argparse.ArgumentParser(
+        description="Ajusta el modelo SARIMA final y guarda el artefacto de pronóstico"
+    )
+    parser.add_argument('--ruta', default=RUTA_EXCEL, help="Archivo Excel de origen")
+    parser.add_argument('--salida', default=RUTA_ARTEFACTO, help="Ruta del artefacto .npz")
+    parser.add_argument('--diagnostico', default=RUTA_DIAGNOSTICO, help="Ruta del artefacto de diagnóstico")
+    parser.add_argument('--sin-diagnostico', action='store_true', help="No regenerar el diagnóstico")
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    serie = serie_mensual(cargar_incidencias(args.ruta))['Num_Roturas']
+    resultado = ajustar_modelo(serie)
+    artefacto = extraer_artefacto(resultado, serie)
+    guardar_artefacto(artefacto, args.salida)
+
+    print(f"✅ Modelo SARIMA{ORDEN}{ORDEN_ESTACIONAL} ajustado con {len(serie)} meses "
+          f"(AIC={resultado.aic:.2f}, {time.perf_counter() - inicio:.2f} s)")
+    print(f"   Artefacto guardado en: {args.salida}")
+    if not args.sin_diagnostico:
+        actualizar_diagnostico(artefacto, serie, args.diagnostico)
+        print(f"   Diagnóstico guardado en: {args.diagnostico}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,269 @@
+"""
+🧮 Reconciliación Jerárquica de Pronósticos - Predicción de Roturas en Red de Gas
+Universidad Tecnológica de Bolívar
+
+Los pronósticos por barrio, por distrito y de la ciudad se ajustan por
+separado (``flota.py``) y no suman entre sí. Este módulo los hace coherentes
+en la jerarquía barrio → distrito → total:
+
+- ``bottom_up``: los agregados son la suma de los barrios
+- ``ols``: proyección ortogonal sobre el espacio de pronósticos coherentes
+- ``mint_shrink``: MinT (traza mínima) con la covarianza de los residuos de
+  un paso encogida hacia su diagonal (Schäfer-Strimmer), que pondera cada
+  serie según su error y sus correlaciones
+
+La matriz de suma S (nodos × barrios) se arma como matriz dispersa a partir
+de las incidencias. La covarianza de N series nunca se forma como matriz
+N × N: con T meses de residuos (T ≪ N) se guarda como diagonal + factor de
+rango T, la intensidad del shrinkage sale de productos T × T y la proyección
+solo resuelve un sistema del tamaño de los agregados (distritos + 1). Así se
+reconcilian miles de barrios en segundos.
+
+Los intervalos se reconcilian con la misma proyección: la varianza de cada
+nodo se escala por diag(P Σ Pᵀ) / diag(Σ), donde P es la reconciliación y Σ
+la covarianza estimada, y el intervalo queda simétrico alrededor del
+pronóstico reconciliado. Los barrios negativos se llevan a cero y los
+agregados se recalculan sumándolos, así que el resultado sigue siendo
+coherente.
+
+Uso desde la línea de comandos (reconcilia la flota ya entrenada):
+
+    python reconciliacion.py                       # MinT shrinkage
+    python reconciliacion.py --metodo bottom_up
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import linalg, sparse
+
+METODOS = ('bottom_up', 'ols', 'mint_shrink')
+
+# Nodos para las incidencias sin barrio o sin distrito registrado
+SIN_BARRIO = 'SIN BARRIO'
+SIN_DISTRITO = 'SIN DISTRITO'
+
+
+# ============= JERARQUÍA =============
+def completar_jerarquia(df):
+    """
+    Asigna las filas sin distrito a ``SIN DISTRITO`` y las sin barrio a un
+    nodo ``SIN BARRIO (<distrito>)`` por distrito, de modo que los barrios
+    cubren todas las incidencias y suman el total de la ciudad.
+    """
+    if not (df['Barrio'].isna().any() or df['Distrito'].isna().any()):
+        return df
+    distrito = df['Distrito'].astype(object).fillna(SIN_DISTRITO)
+    barrio = df['Barrio'].astype(object).fillna(SIN_BARRIO + ' (' + distrito.astype(str) + ')')
+    return df.assign(Barrio=barrio.astype('category'), Distrito=distrito.astype('category'))
+
+
+def jerarquia_desde_incidencias(df):
+    """
+    Barrios (ordenados) y el distrito de cada uno. Un barrio registrado en
+    varios distritos se asigna al más frecuente; las filas sin barrio o sin
+    distrito entran en los nodos de ``completar_jerarquia``.
+    """
+    df = completar_jerarquia(df)
+    conteos = df.groupby(['Barrio', 'Distrito'], observed=True).size()
+    conteos = conteos[conteos > 0].sort_values(ascending=False, kind='stable')
+    principal = conteos.reset_index().drop_duplicates('Barrio').sort_values('Barrio')
+    return principal['Barrio'].to_numpy(dtype=str), principal['Distrito'].to_numpy(dtype=str)
+
+
+def matriz_suma(barrios, distritos):
+    """
+    Matriz de suma S dispersa (nodos × barrios) con los nodos en el orden
+    total, distritos (ordenados) y barrios. Devuelve (S, niveles, nombres).
+    """
+    codigos, nombres_distritos = pd.factorize(np.asarray(distritos), sort=True)
+    m, k = len(barrios), len(nombres_distritos) + 1
+    columnas = np.arange(m)
+    filas = np.concatenate([np.zeros(m, dtype=np.int64), 1 + codigos, k + columnas])
+    S = sparse.csr_matrix((np.ones(3 * m), (filas, np.tile(columnas, 3))), shape=(k + m, m))
+    niveles = np.array(['Total'] + ['Distrito'] * (k - 1) + ['Barrio'] * m)
+    nombres = np.concatenate([['Total'], np.asarray(nombres_distritos, dtype=str), np.asarray(barrios, dtype=str)])
+    return S, niveles, nombres
+
+
+# ============= COVARIANZA =============
+def covarianza_shrink(residuos):
+    """
+    Covarianza de los residuos (series × meses) encogida hacia su diagonal:
+
+        Σ = λ diag(W) + (1 - λ) W,   W = E Eᵀ / T
+
+    con λ de Schäfer-Strimmer. Se usan los meses con residuos en todas las
+    series. Devuelve ``(diagonal, factor, λ)`` con Σ = diag(diagonal) +
+    factor @ factor.T, sin formar ninguna matriz series × series.
+    """
+    E = np.asarray(residuos, dtype=float)
+    E = E[:, np.all(np.isfinite(E), axis=0)]
+    n, T = E.shape
+    if T < 2:
+        raise ValueError("Se necesitan al menos dos meses con residuos en todas las series")
+
+    varianzas = np.einsum('it,it->i', E, E) / T
+    escala = np.sqrt(np.where(varianzas > 0, varianzas, 1.0))
+    X = (E / escala[:, None]).T  # T × n, residuos estandarizados
+    cuadrados = X ** 2
+    G = X @ X.T  # T × T: sus normas dan las sumas sobre pares de series
+    norma_G = np.sum(G ** 2)
+    diag_corr = np.sum(cuadrados, axis=0) ** 2
+
+    # Suma de las varianzas estimadas de las correlaciones fuera de la diagonal
+    suma_v = ((np.sum(np.sum(cuadrados, axis=1) ** 2) - np.sum(cuadrados ** 2))
+              - (norma_G - np.sum(diag_corr)) / T) / (T * (T - 1))
+    # Suma de las correlaciones al cuadrado fuera de la diagonal
+    suma_d = (norma_G - np.sum(diag_corr)) / T ** 2
+    lambda_ = float(np.clip(suma_v / suma_d, 0, 1)) if suma_d > 0 else 1.0
+
+    # Piso para series sin error (p. ej. barrios sin roturas) y λ = 0
+    piso = 1e-8 * max(varianzas.max(), 1e-8)
+    diagonal = np.maximum(max(lambda_, 1e-6) * varianzas, piso)
+    factor = E * np.sqrt((1 - lambda_) / T)
+    return diagonal, factor, lambda_
+
+
+# ============= RECONCILIACIÓN =============
+class Reconciliador:
+    """
+    Reconciliación de pronósticos en una jerarquía con matriz de suma S.
+
+    Los nodos van primero los k agregados y después los m barrios, de modo
+    que S = [A; I] y la coherencia es C y = 0 con C = [I, -A]. Para ``ols``
+    y ``mint_shrink`` la reconciliación es la proyección
+
+        ỹ = ŷ - W Cᵀ (C W Cᵀ)⁻¹ C ŷ
+
+    con W = I (ols) o W = Σ (mint_shrink). Solo se factoriza C W Cᵀ (k × k);
+    W Cᵀ (nodos × k) se arma con la diagonal y el factor de Σ.
+    """
+
+    def __init__(self, S, niveles, nombres, metodo='mint_shrink'):
+        if metodo not in METODOS:
+            raise ValueError(f"Método de reconciliación desconocido: {metodo} (use {', '.join(METODOS)})")
+        self.S = S.tocsr()
+        self.niveles = niveles
+        self.nombres = nombres
+        self.metodo = metodo
+        self.n_hojas = S.shape[1]
+        self.n_agregados = S.shape[0] - self.n_hojas
+        self.A = self.S[:self.n_agregados]
+        self.diagonal = self.factor = self.lambda_ = None
+        self.F = self.cho = None
+        self.segundos = 0.0
+
+    @classmethod
+    def desde_jerarquia(cls, barrios, distritos, metodo='mint_shrink'):
+        return cls(*matriz_suma(barrios, distritos), metodo=metodo)
+
+    def ajustar_covarianza(self, residuos):
+        """Estima Σ con los residuos de un paso de cada nodo (en el orden de S)"""
+        inicio = time.perf_counter()
+        self.diagonal, self.factor, self.lambda_ = covarianza_shrink(residuos)
+        self._preparar()
+        self.segundos += time.perf_counter() - inicio
+        return self
+
+    # ----- Álgebra con C = [I, -A] -----
+    def _C(self, Y):
+        """C Y para Y (nodos × columnas)"""
+        return Y[:self.n_agregados] - self.A @ Y[self.n_agregados:]
+
+    def _W_Ct(self, diagonal, factor):
+        """W Cᵀ (nodos × k) para W = diag(diagonal) + factor factorᵀ"""
+        k = self.n_agregados
+        Ct = sparse.vstack([sparse.identity(k, format='csr'), -self.A.T]).tocsr()
+        return np.asarray(Ct.multiply(diagonal[:, None]).todense()) + factor @ self._C(factor).T
+
+    def _preparar(self):
+        """Factoriza C W Cᵀ y precalcula la varianza reconciliada de cada nodo"""
+        diagonal, factor = self.diagonal, self.factor
+        var_base = diagonal + np.einsum('it,it->i', factor, factor)
+
+        if self.metodo == 'bottom_up':
+            hojas = slice(self.n_agregados, None)
+            var_rec = self.S @ diagonal[hojas] + np.sum((self.S @ factor[hojas]) ** 2, axis=1)
+        else:
+            if self.metodo == 'ols':
+                self.F = self._W_Ct(np.ones_like(diagonal), np.zeros((len(diagonal), 0)))
+            else:
+                self.F = self._W_Ct(diagonal, factor)
+            self.cho = linalg.cho_factor(self._C(self.F))
+            # diag(P Σ Pᵀ) con P = I - F M⁻¹ C, sin formar P
+            F_sigma = self.F if self.metodo == 'mint_shrink' else self._W_Ct(diagonal, factor)
+            K = linalg.cho_solve(self.cho, F_sigma.T)
+            X = linalg.cho_solve(self.cho, linalg.cho_solve(self.cho, self._C(F_sigma)).T)
+            var_rec = (var_base - 2 * np.einsum('ij,ji->i', self.F, K)
+                       + np.einsum('ij,ij->i', self.F @ X, self.F))
+        self.razon_varianza = np.clip(var_rec, 0, None) / var_base
+
+    def proyectar(self, Y):
+        """Reconcilia Y (nodos × horizonte) y lleva los barrios negativos a cero"""
+        Y = np.asarray(Y, dtype=float)
+        if self.metodo == 'bottom_up':
+            hojas = Y[self.n_agregados:]
+        else:
+            if self.F is None:
+                raise ValueError("Falta ajustar_covarianza antes de reconciliar")
+            hojas = (Y - self.F @ linalg.cho_solve(self.cho, self._C(Y)))[self.n_agregados:]
+        return self.S @ np.maximum(hojas, 0)
+
+    def reconciliar(self, media, inferior, superior):
+        """
+        Pronósticos e intervalos reconciliados (nodos × horizonte). El
+        intervalo base se escala por la razón de varianzas de cada nodo.
+        """
+        if self.diagonal is None:
+            raise ValueError("Falta ajustar_covarianza antes de reconciliar")
+        inicio = time.perf_counter()
+        media_rec = self.proyectar(media)
+        semiancho = (np.asarray(superior) - np.asarray(inferior)) / 2 * np.sqrt(self.razon_varianza)[:, None]
+        self.segundos += time.perf_counter() - inicio
+        return media_rec, np.maximum(media_rec - semiancho, 0), media_rec + semiancho
+
+    def resumen(self):
+        """Datos de la reconciliación para los metadatos del artefacto"""
+        return {'hojas': int(self.n_hojas), 'agregados': int(self.n_agregados),
+                'lambda_shrinkage': self.lambda_, 'segundos_reconciliacion': self.segundos}
+
+
+# ============= CLI =============
+def main(argv=None):
+    from datos import RUTA_EXCEL, cargar_incidencias
+    from flota import RUTA_FLOTA, VERSION_FLOTA, guardar_flota, reconciliar_flota
+
+    parser = argparse.ArgumentParser(description="Reconcilia los pronósticos de la flota barrio → distrito → total")
+    parser.add_argument('--ruta', default=RUTA_EXCEL, help="Archivo Excel de origen (para la jerarquía)")
+    parser.add_argument('--flota', default=RUTA_FLOTA, help="Artefacto de la flota (.npz)")
+    parser.add_argument('--metodo', choices=METODOS, default='mint_shrink', help="Método de reconciliación")
+    args = parser.parse_args(argv)
+
+    with np.load(args.flota, allow_pickle=False) as datos_npz:
+        flota = {k: datos_npz[k] for k in datos_npz.files if k != 'meta'}
+        meta = json.loads(str(datos_npz['meta']))
+    if meta.get('version') != VERSION_FLOTA:
+        print(f"❌ Versión de flota no soportada ({meta.get('version')}): vuelva a entrenarla con `python flota.py`")
+        return 1
+    # Se reconcilia siempre desde los pronósticos base
+    for clave in ('prediccion', 'ic_inferior', 'ic_superior'):
+        flota[clave] = flota.pop(f"{clave}_base", flota[clave]).copy()
+    flota['meta'] = meta
+
+    reconciliar_flota(flota, cargar_incidencias(args.ruta), args.metodo)
+    guardar_flota(flota, args.flota)
+
+    totales = flota['niveles'] == 'Total'
+    print(f"✅ Reconciliación {args.metodo}: {meta['hojas']} barrios, {meta['agregados']} agregados, "
+          f"λ={meta['lambda_shrinkage']:.3f} ({meta['segundos_reconciliacion']:.2f} s)")
+    print(f"   Total próximo mes: base {flota['prediccion_base'][totales, 0][0]:.1f}, "
+          f"reconciliado {flota['prediccion'][totales, 0][0]:.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,477 @@
+"""
+📄 Servicio de Reportes PDF - Predicción de Roturas en Red de Gas
+Universidad Tecnológica de Bolívar
+
+Genera los reportes PDF fuera del hilo de la interfaz:
+- ``preparar_datos_reporte`` resume en un dict liviano lo que va en el PDF
+  (a partir del cubo de conteos, sin volver a agrupar el DataFrame).
+- ``ServicioReportes`` encola los reportes en un pool de procesos; cada PDF se
+  guarda en ``.cache/reportes`` con una clave derivada de sus parámetros
+  (mes, top N, horizonte, distrito) y de la huella de los datos. Si el
+  reporte ya existe se entrega de inmediato.
+- El modo por lotes pre-genera el conjunto estándar de reportes: cada
+  distrito, cada mes histórico y el histórico completo.
+
+Uso desde la línea de comandos:
+
+    python reportes.py --lote                    # pre-genera todos los reportes estándar
+    python reportes.py --lote --workers 4 --top-n 10
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from datetime import datetime
+
+from datos import DIR_CACHE
+from esquema import nombre_mes
+
+DIR_REPORTES = os.path.join(DIR_CACHE, 'reportes')
+
+# Versión del contenido del reporte: al cambiarla se invalidan los PDF en caché
+VERSION_REPORTE = 2
+
+# Parámetros del conjunto estándar del modo por lotes
+TOP_N_ESTANDAR = 6
+HORIZONTE_ESTANDAR = 6
+
+
+# ============= DATOS DEL REPORTE =============
+def resumen_modelo(diagnostico):
+    """Métricas del modelo desplegado según su diagnóstico precalculado (None si no hay diagnóstico)"""
+    if diagnostico is None:
+        return None
+    meta = diagnostico['meta']
+    modelo, bt = meta['modelo'], meta['backtest']
+    baseline = meta['comparacion'][0]
+    return {
+        'nombre': f"SARIMA{tuple(modelo['order'])}{tuple(modelo['seasonal_order'])}".replace(' ', ''),
+        'precision': float(bt['Precision']),
+        'precision_std': float(bt['MAPE_std']),
+        'ic95_precision': [float(v) for v in bt['IC95_Precision']],
+        'mae': float(bt['MAE']),
+        'reduccion_mae': float((baseline['MAE'] - bt['MAE']) / baseline['MAE'] * 100),
+    }
+
+
+def preparar_datos_reporte(cubo, df_predicciones, mes=None, top_n_barrios=6, distrito=None, diagnostico=None):
+    """
+    Resume el contenido de un reporte en un dict serializable.
+
+    ``mes`` es un pd.Period (None = histórico completo) y ``cubo`` el cubo de
+    conteos de los datos a reportar (ya filtrados por distrito si aplica).
+    Un mes fuera del rango del cubo se reporta con cero roturas. Las
+    métricas del modelo salen de ``diagnostico`` (``cargar_diagnostico``).
+    """
+    pos_mes = None if mes is None else cubo.posicion_mes(mes.year, mes.month)
+    # posicion_mes devuelve None fuera del rango, que el cubo lee como histórico completo
+    fuera_de_rango = mes is not None and pos_mes is None
+    barrios = cubo.conteo_barrios(pos_mes).head(0 if fuera_de_rango else top_n_barrios)
+    serie = cubo.serie_mensual()['Num_Roturas']
+
+    return {
+        'parametros': {
+            'mes': 'Todos' if mes is None else str(mes),
+            'top_n_barrios': int(top_n_barrios),
+            'horizonte': int(len(df_predicciones)),
+            'distrito': distrito,
+        },
+        'periodo': 'Histórico Completo' if mes is None else f"{nombre_mes(mes.month)} {mes.year}",
+        'total_roturas': cubo.total(),
+        'total_periodo': 0 if fuera_de_rango else cubo.total(pos_mes),
+        'n_meses': int(len(serie)),
+        'promedio_mensual': float(serie.mean()),
+        'predicciones': [
+            [f"{nombre_mes(f.month)} {f.year}", float(p), float(lo), float(hi)]
+            for f, p, lo, hi in zip(df_predicciones['Fecha'], df_predicciones['Prediccion'],
+                                    df_predicciones['IC_Inferior'], df_predicciones['IC_Superior'])
+        ],
+        'barrios': [[str(b), int(c)] for b, c in barrios.items()],
+        'modelo': resumen_modelo(diagnostico),
+    }
+
+
+def clave_reporte(datos_reporte, huella):
+    """Clave del PDF: parámetros, huella de los datos, predicciones y métricas del modelo usadas"""
+    contenido = json.dumps({
+        'version': VERSION_REPORTE,
+        'huella': huella,
+        'parametros': datos_reporte['parametros'],
+        'predicciones': datos_reporte['predicciones'],
+        'modelo': datos_reporte['modelo'],
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(contenido.encode('utf-8')).hexdigest()[:24]
+
+
+# ============= RENDERIZADO (EN LOS TRABAJADORES) =============
+def generar_pdf_reporte(datos_reporte):
+    """
+    Genera el reporte PDF con los resultados del análisis y devuelve sus bytes
+    """
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.units import inch
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_CENTER
+
+    # Crear buffer para el PDF
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter, topMargin=0.5*inch, bottomMargin=0.5*inch)
+
+    # Estilos
+    styles = getSampleStyleSheet()
+    titulo_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        textColor=colors.HexColor('#2E86AB'),
+        spaceAfter=30,
+        alignment=TA_CENTER,
+        fontName='Helvetica-Bold'
+    )
+
+    subtitulo_style = ParagraphStyle(
+        'CustomSubtitle',
+        parent=styles['Heading2'],
+        fontSize=16,
+        textColor=colors.HexColor('#D90429'),
+        spaceAfter=12,
+        spaceBefore=12,
+        fontName='Helvetica-Bold'
+    )
+
+    parametros = datos_reporte['parametros']
+    modelo = datos_reporte['modelo']
+    alcance = f"Distrito {parametros['distrito']}" if parametros['distrito'] else "Red de Gas de Bolívar"
+
+    # Contenido
+    elementos = []
+
+    # Portada
+    elementos.append(Spacer(1, 1.5*inch))
+    elementos.append(Paragraph("🔮 REPORTE DE PREDICCIÓN", titulo_style))
+    elementos.append(Paragraph(f"Roturas en {alcance}", styles['Heading2']))
+    elementos.append(Spacer(1, 0.5*inch))
+    elementos.append(Paragraph(f"<b>Fecha de generación:</b> {datetime.now().strftime('%d de %B de %Y, %H:%M')}", styles['Normal']))
+    elementos.append(Paragraph(f"<b>Período analizado:</b> {datos_reporte['periodo']}", styles['Normal']))
+    if modelo is not None:
+        elementos.append(Paragraph(f"<b>Modelo:</b> {modelo['nombre']}", styles['Normal']))
+        elementos.append(Paragraph(f"<b>Precisión:</b> {modelo['precision']:.2f}% (±{modelo['precision_std']:.2f}%)", styles['Normal']))
+    else:
+        elementos.append(Paragraph("<b>Modelo:</b> SARIMA (sin diagnóstico precalculado)", styles['Normal']))
+    elementos.append(Paragraph("<b>Universidad Tecnológica de Bolívar</b>", styles['Normal']))
+
+    elementos.append(PageBreak())
+
+    # Resumen Ejecutivo
+    elementos.append(Paragraph("1. RESUMEN EJECUTIVO", subtitulo_style))
+
+    if modelo is not None:
+        ic_inferior, ic_superior = modelo['ic95_precision']
+        desempeno = (f"El modelo alcanzó una precisión del {modelo['precision']:.2f}%, "
+                     + ("superando" if modelo['precision'] >= 70 else "por debajo de")
+                     + " el benchmark esperado para series temporales con alta variabilidad.")
+        metricas_modelo = (f"• Precisión: {modelo['precision']:.2f}% (IC 95%: [{ic_inferior:.2f}%, {ic_superior:.2f}%])<br/>"
+                           f"• MAE: {modelo['mae']:.2f} roturas ({'reducción' if modelo['reduccion_mae'] > 0 else 'aumento'} "
+                           f"del {abs(modelo['reduccion_mae']):.1f}% vs baseline)<br/>")
+    else:
+        desempeno = "Las métricas de validación no están disponibles: ejecute <i>python diagnostico.py</i>."
+        metricas_modelo = ""
+
+    resumen_texto = f"""
+    El presente reporte presenta los resultados del modelo predictivo SARIMA aplicado a las roturas
+    causadas por terceros en la red de gas de Bolívar. {desempeno}
+    <br/><br/>
+    <b>Métricas principales:</b><br/>
+    {metricas_modelo}• Total de observaciones históricas: {datos_reporte['total_roturas']:,} roturas ({datos_reporte['n_meses']} meses)<br/>
+    • Promedio mensual histórico: {datos_reporte['promedio_mensual']:.1f} roturas/mes
+    """
+
+    elementos.append(Paragraph(resumen_texto, styles['Normal']))
+    elementos.append(Spacer(1, 0.3*inch))
+
+    # Tabla de predicciones
+    elementos.append(Paragraph("2. PREDICCIONES PRÓXIMOS MESES", subtitulo_style))
+
+    tabla_data = [['Mes', 'Predicción', 'IC Inferior', 'IC Superior']]
+    for mes_nombre, prediccion, ic_inferior, ic_superior in datos_reporte['predicciones']:
+        tabla_data.append([
+            mes_nombre,
+            f"{prediccion:.0f}",
+            f"{ic_inferior:.0f}",
+            f"{ic_superior:.0f}"
+        ])
+
+    tabla = Table(tabla_data, colWidths=[2.5*inch, 1.5*inch, 1.5*inch, 1.5*inch])
+    tabla.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2E86AB')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey])
+    ]))
+
+    elementos.append(tabla)
+    elementos.append(Spacer(1, 0.3*inch))
+
+    # Análisis por barrios
+    elementos.append(Paragraph(f"3. ANÁLISIS ESPACIAL - {datos_reporte['periodo']}", subtitulo_style))
+
+    historico = parametros['mes'] == 'Todos'
+    tabla_barrios_data = [['Ranking', 'Barrio', 'Roturas', 'Prom/Mes' if historico else 'Roturas/Mes', '% Total']]
+    total_periodo = datos_reporte['total_periodo'] or 1
+
+    for i, (barrio, count) in enumerate(datos_reporte['barrios'], 1):
+        promedio = count / datos_reporte['n_meses'] if historico else count
+        porcentaje = (count / total_periodo) * 100
+        nombre_corto = barrio[:35] + "..." if len(barrio) > 35 else barrio
+        tabla_barrios_data.append([
+            str(i),
+            nombre_corto,
+            str(count),
+            f"{promedio:.2f}",
+            f"{porcentaje:.1f}%"
+        ])
+
+    tabla_barrios = Table(tabla_barrios_data, colWidths=[0.6*inch, 3*inch, 1*inch, 1*inch, 1*inch])
+    tabla_barrios.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#D90429')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey])
+    ]))
+
+    elementos.append(tabla_barrios)
+    elementos.append(Spacer(1, 0.3*inch))
+
+    # Recomendaciones
+    elementos.append(PageBreak())
+    elementos.append(Paragraph("4. RECOMENDACIONES OPERATIVAS", subtitulo_style))
+
+    recomendaciones_texto = f"""
+    <b>4.1 Planificación de Recursos</b><br/>
+    • Incrementar recursos preventivos en meses de noviembre y diciembre (pico estacional)<br/>
+    • Mantener cuadrillas de respuesta rápida en barrios de mayor incidencia<br/>
+    • Programar mantenimiento preventivo en agosto-septiembre (baja incidencia)<br/><br/>
+
+    <b>4.2 Vigilancia y Monitoreo</b><br/>
+    • Reforzar inspecciones en horario de 8:00-12:00 hrs (horario crítico)<br/>
+    • Priorizar días laborables (5x mayor incidencia vs fines de semana)<br/>
+    • Implementar sistema de alertas tempranas basado en predicciones<br/><br/>
+
+    <b>4.3 Actualización del Modelo</b><br/>
+    • Actualizar el modelo cada mes con los datos nuevos (<i>python actualizacion.py</i>); los parámetros se re-estiman solo si los residuos muestran deriva<br/>
+    • Incorporar variables exógenas (clima, festividades) para mejorar precisión<br/>
+    • Monitorear métricas de desempeño continuamente<br/><br/>
+
+    <b>4.4 Inversión en Infraestructura</b><br/>
+    • Renovar tuberías en los {parametros['top_n_barrios']} barrios de mayor riesgo identificados<br/>
+    • Implementar señalización preventiva en zonas críticas<br/>
+    • Coordinar con entidades de obras civiles para minimizar daños
+    """
+
+    elementos.append(Paragraph(recomendaciones_texto, styles['Normal']))
+
+    # Construir PDF
+    doc.build(elementos)
+    return buffer.getvalue()
+
+
+def _renderizar_a_archivo(datos_reporte, ruta):
+    """Trabajador: genera el PDF y lo deja en ``ruta`` de forma atómica"""
+    contenido = generar_pdf_reporte(datos_reporte)
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with open(temporal, 'wb') as f:
+        f.write(contenido)
+    os.replace(temporal, ruta)
+    return ruta
+
+
+# ============= SERVICIO =============
+class ServicioReportes:
+    """
+    Cola de reportes sobre un pool de procesos.
+
+    ``solicitar`` nunca espera a reportlab: devuelve 'listo' si el PDF ya
+    está en caché y si no lo encola (una sola vez por clave) y devuelve
+    'en_proceso'. Los procesos se crean con 'spawn' para no heredar los
+    hilos del servidor de Streamlit.
+    """
+
+    def __init__(self, directorio=DIR_REPORTES, max_workers=2):
+        self.directorio = directorio
+        self.max_workers = max_workers
+        self._pool = None
+        self._trabajos = {}
+        self._errores = {}
+        self._candado = threading.Lock()
+
+    def ruta(self, clave):
+        return os.path.join(self.directorio, f"reporte_{clave}.pdf")
+
+    def _obtener_pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                             mp_context=multiprocessing.get_context('spawn'))
+        return self._pool
+
+    def estado(self, clave):
+        """'listo', 'en_proceso', 'error' o 'no_solicitado'"""
+        if os.path.exists(self.ruta(clave)):
+            return 'listo'
+        with self._candado:
+            futuro = self._trabajos.get(clave)
+            if futuro is None:
+                return 'error' if clave in self._errores else 'no_solicitado'
+            if not futuro.done():
+                return 'en_proceso'
+            del self._trabajos[clave]
+            if futuro.exception() is not None:
+                self._errores[clave] = f"{type(futuro.exception()).__name__}: {futuro.exception()}"
+                return 'error'
+        return 'listo' if os.path.exists(self.ruta(clave)) else 'error'
+
+    def error(self, clave):
+        return self._errores.get(clave)
+
+    def solicitar(self, clave, datos_reporte):
+        """Encola el reporte si no está en caché ni en proceso; devuelve su estado"""
+        estado = self.estado(clave)
+        if estado in ('listo', 'en_proceso'):
+            return estado
+        os.makedirs(self.directorio, exist_ok=True)
+        with self._candado:
+            self._errores.pop(clave, None)
+            if clave not in self._trabajos:
+                self._trabajos[clave] = self._obtener_pool().submit(
+                    _renderizar_a_archivo, datos_reporte, self.ruta(clave))
+        return 'en_proceso'
+
+    def leer(self, clave):
+        """Bytes del PDF en caché"""
+        with open(self.ruta(clave), 'rb') as f:
+            return f.read()
+
+    def esperar(self):
+        """Bloquea hasta terminar los trabajos encolados (solo para el modo por lotes)"""
+        with self._candado:
+            futuros = list(self._trabajos.values())
+        wait(futuros)
+
+    def cerrar(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+
+# ============= MODO POR LOTES =============
+def combinaciones_estandar(cubos):
+    """
+    (distrito, mes) del conjunto estándar: para la red completa (None) y cada
+    distrito, el histórico y cada mes con roturas según el cubo del distrito.
+    """
+    return [(d, m) for d, cubo in cubos.items()
+            for m in [None] + list(cubo.ultimos_meses(len(cubo.meses))[::-1])]
+
+
+def prerenderizar(df, df_predicciones, huella, servicio, top_n_barrios=TOP_N_ESTANDAR,
+                  predicciones_distrito=None, progreso=None, diagnostico=None):
+    """
+    Encola los reportes estándar que falten en caché y espera a que terminen.
+
+    ``predicciones_distrito(distrito)`` puede devolver el pronóstico propio de
+    un distrito (p. ej. de la flota); si devuelve None se usa el general.
+    ``diagnostico`` aporta las métricas del modelo. Devuelve (encolados, ya_en_cache).
+    """
+    from agregados import construir_cubo
+
+    cubos = {None: construir_cubo(df)}
+    for distrito in sorted(df['Distrito'].dropna().unique().tolist()):
+        cubos[distrito] = construir_cubo(df[df['Distrito'] == distrito])
+    encolados = en_cache = 0
+    combinaciones = combinaciones_estandar(cubos)
+    for i, (distrito, mes) in enumerate(combinaciones, 1):
+        predicciones = df_predicciones
+        if distrito is not None and predicciones_distrito is not None:
+            propias = predicciones_distrito(distrito)
+            predicciones = df_predicciones if propias is None else propias
+
+        datos_reporte = preparar_datos_reporte(cubos[distrito], predicciones, mes, top_n_barrios, distrito,
+                                               diagnostico)
+        clave = clave_reporte(datos_reporte, huella)
+        if servicio.solicitar(clave, datos_reporte) == 'listo':
+            en_cache += 1
+        else:
+            encolados += 1
+        if progreso is not None:
+            progreso(i, len(combinaciones))
+
+    servicio.esperar()
+    return encolados, en_cache
+
+
+# ============= CLI =============
+def main(argv=None):
+    from datos import RUTA_EXCEL, cargar_incidencias, huella_datos
+    from pronostico import RUTA_ARTEFACTO, cargar_artefacto, pronosticar
+    from flota import RUTA_FLOTA, FlotaPronosticos
+    from diagnostico import RUTA_DIAGNOSTICO, cargar_diagnostico
+
+    parser = argparse.ArgumentParser(description="Pre-genera los reportes PDF estándar en segundo plano")
+    parser.add_argument('--ruta', default=RUTA_EXCEL, help="Archivo Excel de origen")
+    parser.add_argument('--lote', action='store_true', help="Generar todos los reportes estándar")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Procesos de renderizado")
+    parser.add_argument('--top-n', type=int, default=TOP_N_ESTANDAR, help="Barrios por reporte")
+    parser.add_argument('--horizonte', type=int, default=HORIZONTE_ESTANDAR, help="Meses de predicción")
+    parser.add_argument('--directorio', default=DIR_REPORTES, help="Directorio de la caché de PDF")
+    args = parser.parse_args(argv)
+
+    if not args.lote:
+        parser.print_help()
+        return 0
+
+    df = cargar_incidencias(args.ruta)
+    df_predicciones = pronosticar(cargar_artefacto(RUTA_ARTEFACTO), args.horizonte)
+    try:
+        flota = FlotaPronosticos.cargar(RUTA_FLOTA)
+        predicciones_distrito = lambda d: flota.pronostico(d, 'Distrito', args.horizonte)
+    except FileNotFoundError:
+        predicciones_distrito = None
+
+    try:
+        diagnostico = cargar_diagnostico(RUTA_DIAGNOSTICO)
+    except FileNotFoundError:
+        diagnostico = None
+
+    servicio = ServicioReportes(args.directorio, max_workers=args.workers)
+    inicio = time.perf_counter()
+    try:
+        encolados, en_cache = prerenderizar(df, df_predicciones, huella_datos(df), servicio,
+                                            args.top_n, predicciones_distrito, diagnostico=diagnostico)
+    finally:
+        servicio.cerrar()
+
+    print(f"✅ {encolados} reportes generados, {en_cache} ya estaban en caché "
+          f"({time.perf_counter() - inicio:.1f} s)")
+    print(f"   Directorio: {args.directorio}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
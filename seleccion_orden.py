@@ -0,0 +1,331 @@
+"""
+🧭 Selección Stepwise del Orden SARIMA - Predicción de Roturas en Red de Gas
+Universidad Tecnológica de Bolívar
+
+Alternativa al grid search completo del notebook (celda 12) al estilo de
+auto-ARIMA (Hyndman-Khandakar):
+
+1. Pruebas de diferenciación fijan ``D`` y ``d`` antes de buscar:
+   - ``D``: fuerza de la estacionalidad con STL; se diferencia si supera 0.64
+   - ``d``: KPSS sobre la serie (ya diferenciada estacionalmente); se
+     diferencia mientras la prueba rechace la estacionariedad
+2. Búsqueda stepwise por criterio de información (AIC por defecto): desde
+   cuatro modelos iniciales, se evalúan solo los vecinos del mejor modelo
+   (p, q, P o Q ± 1, y p y q o P y Q juntos) y se avanza mientras alguno
+   mejore el criterio.
+
+Con ``d`` y ``D`` fijos, el criterio compara modelos sobre los mismos datos
+diferenciados. Cada configuración evaluada se recuerda durante la búsqueda y
+se guarda en la caché de ajustes (``cache_ajustes.py``), así que repetir la
+selección con la misma serie no reajusta nada. Sobre la serie de la ciudad
+se ajusta una fracción de las 140 configuraciones del grid.
+
+``seleccionar_lote`` reparte la selección de muchas series (p. ej. una por
+barrio) entre procesos.
+
+Uso desde la línea de comandos:
+
+    python seleccion_orden.py                    # serie de la ciudad
+    python seleccion_orden.py --log              # sobre log1p, como el modelo final
+    python seleccion_orden.py --nivel Barrio     # cada barrio con serie densa
+"""
+
+import argparse
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from busqueda_grid import PresupuestoAgotado, limitar_hilos_blas
+from cache_ajustes import cache_ajustes, clave_ajuste
+from pronostico import escala_modelo
+
+CRITERIOS = {'aic': 'aic', 'aicc': 'aicc', 'bic': 'bic'}
+
+# Umbral de fuerza estacional de auto.arima para diferenciar estacionalmente
+UMBRAL_ESTACIONAL = 0.64
+ALFA_KPSS = 0.05
+
+# Límites por defecto: los mismos del grid del notebook
+MAX_P, MAX_Q, MAX_P_ESTACIONAL, MAX_Q_ESTACIONAL = 2, 2, 1, 1
+MAX_D, MAX_D_ESTACIONAL = 1, 1
+MAX_PASOS = 50
+
+
+# ============= DIFERENCIACIÓN =============
+def fuerza_estacional(y, s=12):
+    """
+    Fuerza de la estacionalidad de Hyndman, max(0, 1 - Var(R) / Var(S + R)),
+    con la descomposición STL. 0 si la serie no cubre dos temporadas.
+    """
+    from statsmodels.tsa.seasonal import STL
+
+    y = np.asarray(y, dtype=float)
+    if len(y) < 2 * s + 1 or np.var(y) == 0:
+        return 0.0
+    descomposicion = STL(y, period=s, robust=True).fit()
+    var_total = np.var(descomposicion.seasonal + descomposicion.resid)
+    return float(max(0.0, 1 - np.var(descomposicion.resid) / var_total)) if var_total > 0 else 0.0
+
+
+def diferencias_estacionales(y, s=12, max_D=MAX_D_ESTACIONAL, umbral=UMBRAL_ESTACIONAL):
+    """Número de diferencias estacionales: 1 si la estacionalidad es fuerte"""
+    fuerza = fuerza_estacional(y, s)
+    return (1 if max_D >= 1 and fuerza > umbral else 0), fuerza
+
+
+def diferencias_regulares(y, max_d=MAX_D, alfa=ALFA_KPSS):
+    """Diferencias regulares según KPSS: se diferencia mientras se rechace la estacionariedad"""
+    from statsmodels.tsa.stattools import kpss
+
+    y = np.asarray(y, dtype=float)
+    valores_p = []
+    for d in range(max_d + 1):
+        if len(y) < 10 or np.var(y) == 0:
+            return d, valores_p
+        with warnings.catch_warnings():
+            # KPSS avisa cuando el estadístico cae fuera de su tabla de valores p
+            warnings.simplefilter('ignore')
+            valor_p = float(kpss(y, regression='c', nlags='auto')[1])
+        valores_p.append(valor_p)
+        if valor_p >= alfa or d == max_d:
+            return d, valores_p
+        y = np.diff(y)
+    return max_d, valores_p
+
+
+def fijar_diferencias(y, s=12, max_d=MAX_D, max_D=MAX_D_ESTACIONAL):
+    """``d`` y ``D`` de la serie, con los resultados de las pruebas"""
+    y = np.asarray(y, dtype=float)
+    D, fuerza = diferencias_estacionales(y, s, max_D)
+    diferenciada = y[s:] - y[:-s] if D else y
+    d, valores_p = diferencias_regulares(diferenciada, max_d)
+    return d, D, {'fuerza_estacional': fuerza, 'kpss_p': valores_p}
+
+
+# ============= AJUSTE =============
+def evaluar_configuracion(y, order, seasonal_order, maxiter=50, presupuesto_s=60, cache=None,
+                          transformacion=None):
+    """
+    Ajusta una configuración sobre ``y`` (ya en la escala del modelo) y
+    devuelve un registro con estado y criterios de información. Los
+    resultados salvo 'tiempo_agotado' se guardan en la caché de ajustes.
+    """
+    from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+    cache = cache_ajustes if cache is None else cache
+    registro = {'order': tuple(order), 'seasonal_order': tuple(seasonal_order)}
+    clave = clave_ajuste(y, order, seasonal_order, transformacion, maxiter=maxiter, objetivo='seleccion')
+    entrada = cache.obtener(clave)
+    if entrada is not None:
+        registro.update(entrada['meta'], segundos=0.0, en_cache=True)
+        return registro
+
+    inicio = time.perf_counter()
+
+    def vigilar_tiempo(_params):
+        if time.perf_counter() - inicio > presupuesto_s:
+            raise PresupuestoAgotado()
+
+    params = None
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            resultado = SARIMAX(y, order=order, seasonal_order=seasonal_order).fit(
+                disp=False, maxiter=maxiter, callback=vigilar_tiempo)
+    except PresupuestoAgotado:
+        registro['estado'] = 'tiempo_agotado'
+    except Exception as e:
+        registro.update(estado='error', error=f"{type(e).__name__}: {e}")
+    else:
+        params = np.asarray(resultado.params, dtype=float)
+        convergio = resultado.mle_retvals.get('converged', True)
+        registro.update(estado='ok' if convergio else 'no_converge', aic=float(resultado.aic),
+                        aicc=float(resultado.aicc), bic=float(resultado.bic))
+
+    registro.update(segundos=time.perf_counter() - inicio, en_cache=False)
+    if registro['estado'] != 'tiempo_agotado':
+        meta = {k: v for k, v in registro.items() if k not in ('order', 'seasonal_order', 'segundos', 'en_cache')}
+        cache.guardar(clave, {'meta': meta} if params is None else {'meta': meta, 'params': params})
+    return registro
+
+
+# ============= BÚSQUEDA STEPWISE =============
+def _iniciales(d, D, s, limites):
+    """Modelos de partida de Hyndman-Khandakar, recortados a los límites y sin repetidos"""
+    max_p, max_q, max_P, max_Q = limites
+    iniciales = []
+    for p, q, P, Q in ((2, 2, 1, 1), (0, 0, 0, 0), (1, 0, 1, 0), (0, 1, 0, 1)):
+        configuracion = ((min(p, max_p), d, min(q, max_q)), (min(P, max_P), D, min(Q, max_Q), s))
+        if configuracion not in iniciales:
+            iniciales.append(configuracion)
+    return iniciales
+
+
+def _vecinos(configuracion, limites):
+    """Configuraciones a un paso: p, q, P o Q ± 1, y (p, q) o (P, Q) juntos"""
+    (p, d, q), (P, D, Q, s) = configuracion
+    max_p, max_q, max_P, max_Q = limites
+    pasos = [(dp, 0, 0, 0) for dp in (-1, 1)] + [(0, dq, 0, 0) for dq in (-1, 1)]
+    pasos += [(0, 0, dP, 0) for dP in (-1, 1)] + [(0, 0, 0, dQ) for dQ in (-1, 1)]
+    pasos += [(k, k, 0, 0) for k in (-1, 1)] + [(0, 0, k, k) for k in (-1, 1)]
+    vecinos = []
+    for dp, dq, dP, dQ in pasos:
+        np_, nq, nP, nQ = p + dp, q + dq, P + dP, Q + dQ
+        if 0 <= np_ <= max_p and 0 <= nq <= max_q and 0 <= nP <= max_P and 0 <= nQ <= max_Q:
+            vecinos.append(((np_, d, nq), (nP, D, nQ, s)))
+    return vecinos
+
+
+def _valida(configuracion):
+    """Mismas exclusiones que el grid: sin modelos vacíos"""
+    (p, _, q), (P, _, Q, _) = configuracion
+    return p + q + P + Q > 0
+
+
+def seleccionar_orden(serie, s=12, transformacion=None, criterio='aic', max_p=MAX_P, max_q=MAX_Q,
+                      max_P=MAX_P_ESTACIONAL, max_Q=MAX_Q_ESTACIONAL, max_d=MAX_D,
+                      max_D=MAX_D_ESTACIONAL, d=None, D=None, maxiter=50, presupuesto_s=60,
+                      max_pasos=MAX_PASOS, cache=None):
+    """
+    Selección stepwise del orden SARIMA de la serie mensual.
+
+    ``d`` y ``D`` se fijan con las pruebas de diferenciación si no se dan.
+    Devuelve un dict con ``order``, ``seasonal_order``, el valor del
+    criterio, las pruebas y ``evaluados`` (DataFrame con cada configuración
+    ajustada, en el orden en que se visitó).
+    """
+    if criterio not in CRITERIOS:
+        raise ValueError(f"Criterio desconocido: {criterio} (use {', '.join(CRITERIOS)})")
+    inicio = time.perf_counter()
+    y = escala_modelo(np.asarray(serie, dtype=float), transformacion)
+    pruebas = {}
+    if d is None or D is None:
+        d_prueba, D_prueba, pruebas = fijar_diferencias(y, s, max_d, max_D)
+        d = d_prueba if d is None else d
+        D = D_prueba if D is None else D
+    limites = (max_p, max_q, max_P, max_Q)
+
+    visitados = {}
+
+    def valor(configuracion):
+        """Criterio de la configuración (ajustándola si aún no se visitó); inf si no sirve"""
+        if configuracion not in visitados:
+            visitados[configuracion] = evaluar_configuracion(
+                y, *configuracion, maxiter=maxiter, presupuesto_s=presupuesto_s, cache=cache,
+                transformacion=transformacion)
+        registro = visitados[configuracion]
+        return registro[criterio] if registro['estado'] == 'ok' else np.inf
+
+    iniciales = [c for c in _iniciales(d, D, s, limites) if _valida(c)]
+    if not iniciales:
+        raise ValueError("Los límites solo admiten el modelo vacío: max_p, max_q, max_P o max_Q debe ser mayor que 0")
+    mejor = min(iniciales, key=valor)
+    pasos = 0
+    while pasos < max_pasos:
+        candidatos = [c for c in _vecinos(mejor, limites) if _valida(c) and c not in visitados]
+        if not candidatos:
+            break
+        siguiente = min(candidatos, key=valor)
+        if valor(siguiente) >= valor(mejor):
+            break
+        mejor, pasos = siguiente, pasos + 1
+
+    evaluados = pd.DataFrame([
+        {'order': r['order'], 'seasonal': r['seasonal_order'], 'estado': r['estado'],
+         'AIC': r.get('aic', np.nan), 'AICc': r.get('aicc', np.nan), 'BIC': r.get('bic', np.nan),
+         'segundos': r['segundos'], 'en_cache': r['en_cache']}
+        for r in visitados.values()
+    ])
+    return {
+        'order': mejor[0],
+        'seasonal_order': mejor[1],
+        'criterio': criterio,
+        'valor': valor(mejor),
+        'd': d,
+        'D': D,
+        'pruebas': pruebas,
+        'pasos': pasos,
+        'ajustes': int((~evaluados['en_cache']).sum()),
+        'evaluados': evaluados,
+        'segundos': time.perf_counter() - inicio,
+    }
+
+
+# ============= LOTE =============
+def _seleccionar_serie(serie, opciones):
+    resultado = seleccionar_orden(serie, **opciones)
+    return {k: resultado[k] for k in ('order', 'seasonal_order', 'valor', 'd', 'D', 'pasos', 'ajustes')} | {
+        'evaluados': len(resultado['evaluados'])}
+
+
+def seleccionar_lote(series, max_workers=None, **opciones):
+    """
+    Selección stepwise de muchas series (p. ej. filas de una matriz
+    barrios × meses) en un pool de procesos. Devuelve un DataFrame con una
+    fila por serie.
+    """
+    series = [np.asarray(y, dtype=float) for y in series]
+    if max_workers == 1:
+        limitar_hilos_blas()
+        filas = [_seleccionar_serie(y, opciones) for y in series]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=limitar_hilos_blas) as pool:
+            filas = list(pool.map(_seleccionar_serie, series, [opciones] * len(series)))
+    return pd.DataFrame(filas)
+
+
+# ============= CLI =============
+def main(argv=None):
+    from datos import RUTA_EXCEL, cargar_incidencias, serie_mensual
+
+    parser = argparse.ArgumentParser(description="Selección stepwise del orden SARIMA con pruebas de diferenciación")
+    parser.add_argument('--ruta', default=RUTA_EXCEL, help="Archivo Excel de origen")
+    parser.add_argument('--criterio', choices=CRITERIOS, default='aic', help="Criterio de información")
+    parser.add_argument('--log', action='store_true', help="Seleccionar sobre log1p de la serie")
+    parser.add_argument('--test', type=int, default=6, help="Meses reservados para test (como el grid)")
+    parser.add_argument('--d', type=int, default=None, help="Diferencias regulares (por defecto, KPSS)")
+    parser.add_argument('--D', type=int, default=None, help="Diferencias estacionales (por defecto, fuerza STL)")
+    parser.add_argument('--nivel', choices=('Barrio', 'Distrito'), default=None,
+                        help="Seleccionar por serie en este nivel (solo series densas)")
+    parser.add_argument('--workers', type=int, default=None, help="Procesos para --nivel")
+    args = parser.parse_args(argv)
+
+    df = cargar_incidencias(args.ruta)
+    transformacion = 'log1p' if args.log else None
+
+    if args.nivel:
+        from flota import clasificar_serie, series_por_nivel
+
+        nombres, _, matriz = series_por_nivel(df, args.nivel)
+        densas = np.array([clasificar_serie(y) == 'sarima' for y in matriz])
+        inicio = time.perf_counter()
+        tabla = seleccionar_lote(matriz[densas], max_workers=args.workers, criterio=args.criterio,
+                                 transformacion=transformacion, d=args.d, D=args.D)
+        tabla.insert(0, args.nivel, nombres[densas])
+        print(f"🧭 {len(tabla)} series de {args.nivel} ({time.perf_counter() - inicio:.1f} s, "
+              f"{tabla['ajustes'].sum()} ajustes)")
+        for _, fila in tabla.iterrows():
+            print(f"   {fila[args.nivel][:30]:<30} SARIMA{fila['order']}{fila['seasonal_order']} "
+                  f"{args.criterio.upper()}={fila['valor']:.2f} ({fila['evaluados']} evaluados)")
+        return 0
+
+    serie = serie_mensual(df)['Num_Roturas'][:-args.test] if args.test else serie_mensual(df)['Num_Roturas']
+    r = seleccionar_orden(serie, transformacion=transformacion, criterio=args.criterio, d=args.d, D=args.D)
+    pruebas = r['pruebas']
+    if pruebas:
+        valores_p = ', '.join(f"{p:.3f}" for p in pruebas['kpss_p'])
+        print(f"🧭 Diferenciación: d={r['d']}, D={r['D']} (fuerza estacional "
+              f"{pruebas['fuerza_estacional']:.2f}, KPSS p=[{valores_p}])")
+    else:
+        print(f"🧭 Diferenciación fijada: d={r['d']}, D={r['D']}")
+    print(f"✅ SARIMA{r['order']}{r['seasonal_order']} {r['criterio'].upper()}={r['valor']:.2f}")
+    print(f"   {len(r['evaluados'])} configuraciones evaluadas en {r['pasos']} pasos "
+          f"({r['ajustes']} ajustes nuevos, {r['segundos']:.1f} s)")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,198 @@
+"""
+🎲 Simulación Monte Carlo de Pronósticos - Predicción de Roturas en Red de Gas
+Universidad Tecnológica de Bolívar
+
+Genera de una vez decenas de miles de trayectorias futuras del modelo SARIMA
+a partir del artefacto (``pronostico.py``): se sortea el estado inicial con
+su covarianza y se propaga el sistema en el espacio de estados con ruido de
+estado y de observación, todo como productos de matrices sobre todas las
+trayectorias a la vez, sin bucles por trayectoria. Las trayectorias se llevan a la escala
+original (roturas/mes) antes de consultarlas.
+
+Con las mismas trayectorias se responden todas las consultas:
+- cuantiles de cada mes y probabilidad de superar un umbral
+  ("probabilidad de más de 70 roturas en noviembre")
+- cuantiles y probabilidades del total de roturas en un horizonte
+
+Al construir la simulación se ordenan una vez los valores de cada mes y los
+totales acumulados de cada horizonte, así que cada consulta es una búsqueda
+binaria o una interpolación, sin volver a simular ni a ordenar. La semilla
+es fija: la misma versión del modelo produce siempre las mismas trayectorias.
+
+Uso desde la línea de comandos:
+
+    python simulacion.py                                # resumen a 12 meses
+    python simulacion.py --umbral 70 --horizonte 6      # P(> 70) por mes y total a 6 meses
+    python simulacion.py --trayectorias 50000 --total 400
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from pronostico import RUTA_ARTEFACTO, cargar_artefacto
+
+N_TRAYECTORIAS = 20000
+PASOS = 12
+SEMILLA = 0
+
+NIVELES = (0.1, 0.5, 0.9)
+
+
+# ============= TRAYECTORIAS =============
+def _raiz_covarianza(P):
+    """L con L @ L.T = P; tolera covarianzas semidefinidas (estados sin incertidumbre)"""
+    valores, vectores = np.linalg.eigh((P + P.T) / 2)
+    return vectores * np.sqrt(np.clip(valores, 0, None))
+
+
+def simular_trayectorias(artefacto, pasos=PASOS, n=N_TRAYECTORIAS, semilla=SEMILLA):
+    """
+    Trayectorias (n, pasos) en la escala del modelo desde el estado predicho
+    del artefacto:
+
+        α₁ ~ N(a, P),  y_t = d + Z α_t + ε_t,  α_{t+1} = c + T α_t + R η_t
+
+    con ε ~ N(0, H) y η ~ N(0, Q). Los estados se guardan como (estados, n)
+    y cada paso es un producto de las matrices del sistema, dispersas (en
+    SARIMA son casi todas ceros: desplazamientos de rezagos), por todas las
+    trayectorias a la vez.
+    """
+    Z, T, R = (sparse.csr_matrix(artefacto[m]) for m in ('Z', 'T', 'R'))
+    Q, H, d, c = artefacto['Q'], artefacto['H'], artefacto['d'], artefacto['c']
+    RQ = R @ sparse.csr_matrix(_raiz_covarianza(Q))
+    rng = np.random.default_rng(semilla)
+
+    k = T.shape[0]
+    estados = artefacto['estado'][:, None] + _raiz_covarianza(artefacto['cov_estado']) @ rng.standard_normal((k, n))
+    ruido_estado = rng.standard_normal((pasos, Q.shape[0], n))
+    ruido_obs = rng.standard_normal((pasos, n)) * np.sqrt(max(H[0, 0], 0.0))
+    c = c[:, None]
+
+    trayectorias = np.empty((pasos, n))
+    for h in range(pasos):
+        trayectorias[h] = d[0] + (Z @ estados)[0] + ruido_obs[h]
+        estados = T @ estados + RQ @ ruido_estado[h] + c
+    return np.ascontiguousarray(trayectorias.T)
+
+
+def _cuantiles_ordenados(ordenadas, niveles):
+    """Cuantiles (interpolación lineal, como np.quantile) de columnas ya ordenadas"""
+    posiciones = np.asarray(niveles, dtype=float) * (len(ordenadas) - 1)
+    abajo = np.floor(posiciones).astype(int)
+    arriba = np.minimum(abajo + 1, len(ordenadas) - 1)
+    fraccion = (posiciones - abajo)[:, None]
+    return ordenadas[abajo] * (1 - fraccion) + ordenadas[arriba] * fraccion
+
+
+# ============= SIMULACIÓN =============
+class Simulacion:
+    """
+    Trayectorias simuladas en roturas/mes y sus consultas.
+
+    ``trayectorias`` tiene forma (n, pasos). Se precalculan:
+    - ``ordenadas``: cada mes ordenado de menor a mayor
+    - ``totales``: total acumulado hasta cada mes (horizonte), ordenado
+
+    Los horizontes van de 1 a ``pasos``; las consultas por mes usan la
+    posición del mes (0 = primer mes pronosticado).
+    """
+
+    def __init__(self, trayectorias, fechas):
+        self.trayectorias = trayectorias
+        self.fechas = pd.DatetimeIndex(fechas)
+        self.ordenadas = np.sort(trayectorias, axis=0)
+        self.totales = np.sort(np.cumsum(trayectorias, axis=1), axis=0)
+
+    @classmethod
+    def desde_artefacto(cls, artefacto, pasos=PASOS, n=N_TRAYECTORIAS, semilla=SEMILLA):
+        """Simula ``n`` trayectorias de ``pasos`` meses y las lleva a roturas/mes"""
+        trayectorias = simular_trayectorias(artefacto, pasos, n, semilla)
+        if artefacto['meta']['transformacion'] == 'log1p':
+            trayectorias = np.expm1(trayectorias)
+        ultimo_mes = pd.Period(artefacto['meta']['ultimo_mes'], freq='M')
+        fechas = pd.date_range(start=(ultimo_mes + 1).start_time, periods=pasos, freq='M')
+        return cls(np.maximum(trayectorias, 0), fechas)
+
+    @property
+    def n(self):
+        return self.trayectorias.shape[0]
+
+    @property
+    def pasos(self):
+        return self.trayectorias.shape[1]
+
+    def _horizonte(self, horizonte):
+        horizonte = self.pasos if horizonte is None else horizonte
+        if not 1 <= horizonte <= self.pasos:
+            raise ValueError(f"Horizonte fuera de rango: {horizonte} (simulados {self.pasos} meses)")
+        return horizonte
+
+    def _excedencia(self, ordenadas, umbral):
+        return 1 - np.searchsorted(ordenadas, umbral, side='right') / self.n
+
+    # ----- Por mes -----
+    def cuantiles(self, niveles=NIVELES, horizonte=None):
+        """Cuantiles de cada mes: arreglo (len(niveles), horizonte)"""
+        return _cuantiles_ordenados(self.ordenadas[:, :self._horizonte(horizonte)], niveles)
+
+    def prob_excedencia(self, umbral, horizonte=None):
+        """P(roturas > umbral) de cada mes del horizonte"""
+        h = self._horizonte(horizonte)
+        return np.array([self._excedencia(self.ordenadas[:, i], umbral) for i in range(h)])
+
+    # ----- Total del horizonte -----
+    def cuantiles_total(self, niveles=NIVELES, horizonte=None):
+        """Cuantiles del total de roturas en los primeros ``horizonte`` meses"""
+        return _cuantiles_ordenados(self.totales[:, self._horizonte(horizonte) - 1][:, None], niveles)[:, 0]
+
+    def prob_total(self, umbral, horizonte=None):
+        """P(total de roturas en el horizonte > umbral)"""
+        return float(self._excedencia(self.totales[:, self._horizonte(horizonte) - 1], umbral))
+
+    def resumen(self, umbral, horizonte=None, niveles=NIVELES):
+        """DataFrame por mes con la probabilidad de superar ``umbral`` y los cuantiles"""
+        h = self._horizonte(horizonte)
+        tabla = pd.DataFrame({'Fecha': self.fechas[:h], 'Prob_Excede': self.prob_excedencia(umbral, h)})
+        for nivel, valores in zip(niveles, self.cuantiles(niveles, h)):
+            tabla[f"P{nivel * 100:g}"] = valores
+        return tabla
+
+
+# ============= CLI =============
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Probabilidades de roturas por simulación Monte Carlo")
+    parser.add_argument('--artefacto', default=RUTA_ARTEFACTO, help="Ruta del artefacto .npz")
+    parser.add_argument('--trayectorias', type=int, default=N_TRAYECTORIAS, help="Trayectorias simuladas")
+    parser.add_argument('--horizonte', type=int, default=PASOS, help="Meses a resumir")
+    parser.add_argument('--umbral', type=float, default=70, help="Roturas en un mes")
+    parser.add_argument('--total', type=float, default=None, help="Roturas en el total del horizonte")
+    parser.add_argument('--semilla', type=int, default=SEMILLA, help="Semilla del generador")
+    args = parser.parse_args(argv)
+    if args.horizonte < 1:
+        parser.error(f"--horizonte debe ser al menos 1 (recibido {args.horizonte})")
+
+    artefacto = cargar_artefacto(args.artefacto)
+    inicio = time.perf_counter()
+    sim = Simulacion.desde_artefacto(artefacto, args.horizonte, args.trayectorias, args.semilla)
+    segundos = time.perf_counter() - inicio
+
+    print(f"🎲 {sim.n:,} trayectorias × {sim.pasos} meses ({segundos * 1000:.0f} ms)")
+    print(f"\n{'Mes':<12} {'P(> ' + f'{args.umbral:g})':>10} {'P10':>8} {'P50':>8} {'P90':>8}")
+    print("-" * 50)
+    for _, fila in sim.resumen(args.umbral, args.horizonte).iterrows():
+        print(f"{fila['Fecha'].strftime('%Y-%m'):<12} {fila['Prob_Excede']:>10.1%} "
+              f"{fila['P10']:>8.0f} {fila['P50']:>8.0f} {fila['P90']:>8.0f}")
+    p10, p50, p90 = sim.cuantiles_total(horizonte=args.horizonte)
+    print("-" * 50)
+    print(f"Total {args.horizonte} meses: mediana {p50:.0f} (80%: [{p10:.0f}, {p90:.0f}])")
+    if args.total is not None:
+        print(f"P(total > {args.total:g}) = {sim.prob_total(args.total, args.horizonte):.1%}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,227 @@
+"""
+🔄 Validación Rolling Window en Paralelo - Predicción de Roturas en Red de Gas
+Universidad Tecnológica de Bolívar
+
+Motor de backtesting para la validación de la celda 18 del notebook:
+- Ventanas expansivas o deslizantes con ``min_train_size`` y ``horizon``
+  configurables.
+- Las ventanas se reparten en bloques contiguos entre procesos; dentro de
+  cada bloque cada ventana arranca desde los parámetros de la ventana
+  vecina, que se ajustó sobre casi la misma serie.
+- Cada ventana se guarda en la caché de ajustes (``cache_ajustes.py``) con
+  sus parámetros, pronósticos y métricas. Con ventana expansiva las
+  ventanas viejas no cambian cuando llega un mes nuevo: solo se ajustan las
+  nuevas, y una repetición con los mismos datos no ajusta ninguna.
+
+Uso desde la línea de comandos:
+
+    python validacion.py                                 # modelo final, ventana expansiva
+    python validacion.py --ventana deslizante --horizon 3 --workers 4
+"""
+
+import argparse
+import os
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from busqueda_grid import calcular_mape, limitar_hilos_blas
+from cache_ajustes import cache_ajustes, clave_ajuste
+from pronostico import ORDEN, ORDEN_ESTACIONAL
+
+VENTANAS = ('expansiva', 'deslizante')
+
+
+def generar_ventanas(n_obs, min_train_size=60, horizon=6, ventana='expansiva', paso=1):
+    """
+    Lista de ventanas (inicio_train, fin_train, fin_test) sobre n_obs meses.
+
+    Con ventana 'expansiva' el train siempre empieza en 0; con 'deslizante'
+    conserva ``min_train_size`` meses.
+    """
+    if ventana not in VENTANAS:
+        raise ValueError(f"ventana debe ser una de {VENTANAS}, no '{ventana}'")
+
+    ventanas = []
+    for fin_train in range(min_train_size, n_obs - horizon + 1, paso):
+        inicio_train = 0 if ventana == 'expansiva' else fin_train - min_train_size
+        ventanas.append((inicio_train, fin_train, fin_train + horizon))
+    return ventanas
+
+
+def _clave_ventana(serie, ventana, order, seasonal_order, transformacion, maxiter):
+    """Clave de caché de una ventana: su train, sus meses de prueba y el modelo"""
+    inicio_train, fin_train, fin_test = ventana
+    return clave_ajuste(serie.iloc[inicio_train:fin_train], order, seasonal_order, transformacion,
+                        maxiter=maxiter, prueba=serie.iloc[fin_train:fin_test].to_numpy(dtype=float))
+
+
+def _registro_en_cache(fold, ventana, entrada):
+    """Fila del backtest a partir de una entrada de la caché"""
+    inicio_train, fin_train, _ = ventana
+    meta = entrada['meta']
+    return {'fold': fold, 'inicio_train': inicio_train, 'fin_train': fin_train, 'estado': 'ok',
+            'MAE': meta['MAE'], 'RMSE': meta['RMSE'], 'MAPE': meta['MAPE'],
+            'iteraciones': meta['iteraciones'], 'params': entrada['params'],
+            'segundos': 0.0, 'en_cache': True}
+
+
+def _evaluar_bloque(serie, bloque, order, seasonal_order, transformacion, maxiter,
+                    calentar, start_params=None, cache=None):
+    """Ajusta en orden las ventanas de un bloque, encadenando los parámetros"""
+    from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+    cache = cache_ajustes if cache is None else cache
+    resultados = []
+    for fold, (inicio_train, fin_train, fin_test) in bloque:
+        fold_train = serie.iloc[inicio_train:fin_train]
+        fold_test = serie.iloc[fin_train:fin_test]
+        if transformacion == 'log1p':
+            fold_train = np.log1p(fold_train)
+
+        registro = {'fold': fold, 'inicio_train': inicio_train, 'fin_train': fin_train, 'en_cache': False}
+        inicio = time.perf_counter()
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                modelo = SARIMAX(fold_train, order=order, seasonal_order=seasonal_order)
+                resultado = modelo.fit(disp=False, maxiter=maxiter, start_params=start_params)
+        except Exception as e:
+            registro['estado'] = 'error'
+            registro['error'] = f"{type(e).__name__}: {e}"
+        else:
+            pred = np.asarray(resultado.forecast(steps=len(fold_test)))
+            if transformacion == 'log1p':
+                pred = np.expm1(pred)
+            real = fold_test.to_numpy(dtype=float)
+            registro.update({
+                'estado': 'ok',
+                'MAE': float(np.mean(np.abs(real - pred))),
+                'RMSE': float(np.sqrt(np.mean((real - pred) ** 2))),
+                'MAPE': calcular_mape(real, pred, valor_sin_datos=0),
+                'iteraciones': resultado.mle_retvals.get('iterations'),
+                'params': np.asarray(resultado.params),
+            })
+            cache.guardar(_clave_ventana(serie, (inicio_train, fin_train, fin_test), order, seasonal_order,
+                                         transformacion, maxiter),
+                          {'params': registro['params'], 'pred': pred,
+                           'meta': {k: registro[k] for k in ('MAE', 'RMSE', 'MAPE', 'iteraciones')}})
+            if calentar:
+                start_params = resultado.params.to_numpy()
+        registro['segundos'] = time.perf_counter() - inicio
+        resultados.append(registro)
+    return resultados
+
+
+def _repartir(numeradas, n_bloques):
+    """Bloques contiguos de ventanas numeradas ``(fold, ventana)``, uno por proceso"""
+    base, resto = divmod(len(numeradas), n_bloques)
+    bloques, inicio = [], 0
+    for i in range(n_bloques):
+        fin = inicio + base + (1 if i < resto else 0)
+        bloques.append(numeradas[inicio:fin])
+        inicio = fin
+    return [b for b in bloques if b]
+
+
+def backtest(serie, order=ORDEN, seasonal_order=ORDEN_ESTACIONAL, min_train_size=60,
+             horizon=6, ventana='expansiva', paso=1, transformacion='log1p', maxiter=50,
+             max_workers=None, calentar=True, start_params=None, cache=None):
+    """
+    Validación rolling window de una configuración SARIMA.
+
+    Devuelve un DataFrame con una fila por ventana (MAE, RMSE, MAPE,
+    iteraciones del optimizador, segundos y si salió de la caché). Solo se
+    ajustan las ventanas que no están en la caché de ajustes. Con
+    ``max_workers=1`` se ejecuta en el proceso actual.
+    """
+    ventanas = generar_ventanas(len(serie), min_train_size, horizon, ventana, paso)
+    if not ventanas:
+        return pd.DataFrame(columns=['fold', 'inicio_train', 'fin_train', 'estado'])
+
+    cache = cache_ajustes if cache is None else cache
+    resultados, pendientes, params_cache = [], [], {}
+    for fold, v in enumerate(ventanas):
+        entrada = cache.obtener(_clave_ventana(serie, v, order, seasonal_order, transformacion, maxiter))
+        if entrada is None:
+            pendientes.append((fold, v))
+        else:
+            resultados.append(_registro_en_cache(fold, v, entrada))
+            params_cache[fold] = entrada['params']
+
+    if pendientes:
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        n_bloques = min(max_workers, len(pendientes))
+        bloques = _repartir(pendientes, n_bloques)
+        argumentos = (order, seasonal_order, transformacion, maxiter, calentar)
+
+        def inicio_bloque(bloque):
+            # Un bloque que sigue a una ventana en caché arranca desde sus parámetros
+            previo = params_cache.get(bloque[0][0] - 1)
+            return previo if calentar and previo is not None else start_params
+
+        if n_bloques == 1:
+            resultados += _evaluar_bloque(serie, bloques[0], *argumentos, inicio_bloque(bloques[0]), cache)
+        else:
+            with ProcessPoolExecutor(max_workers=n_bloques, initializer=limitar_hilos_blas) as pool:
+                futuros = [pool.submit(_evaluar_bloque, serie, b, *argumentos, inicio_bloque(b), cache)
+                           for b in bloques]
+                resultados += [r for f in futuros for r in f.result()]
+
+    return pd.DataFrame(resultados).sort_values('fold').reset_index(drop=True)
+
+
+def resumen_backtest(df_folds):
+    """Métricas agregadas como en el notebook (media ± desviación)"""
+    ok = df_folds[df_folds['estado'] == 'ok']
+    mape = ok['MAPE'].mean()
+    mape_std = ok['MAPE'].std(ddof=0)
+    precision = 100 - mape
+    return {
+        'ventanas': int(len(ok)),
+        'MAE': float(ok['MAE'].mean()),
+        'MAE_std': float(ok['MAE'].std(ddof=0)),
+        'RMSE': float(ok['RMSE'].mean()),
+        'MAPE': float(mape),
+        'MAPE_std': float(mape_std),
+        'Precision': float(precision),
+        'IC95_Precision': [float(precision - 1.96 * mape_std), float(precision + 1.96 * mape_std)],
+    }
+
+
+# ============= CLI =============
+def main(argv=None):
+    from datos import RUTA_EXCEL, cargar_incidencias, serie_mensual
+
+    parser = argparse.ArgumentParser(description="Validación rolling window en paralelo")
+    parser.add_argument('--ruta', default=RUTA_EXCEL, help="Archivo Excel de origen")
+    parser.add_argument('--min-train-size', type=int, default=60, help="Meses mínimos de entrenamiento")
+    parser.add_argument('--horizon', type=int, default=6, help="Meses de predicción por ventana")
+    parser.add_argument('--ventana', choices=VENTANAS, default='expansiva', help="Tipo de ventana")
+    parser.add_argument('--workers', type=int, default=None, help="Procesos (por defecto, todos los núcleos)")
+    parser.add_argument('--sin-calentar', action='store_true', help="Ajustar cada ventana desde cero")
+    args = parser.parse_args(argv)
+
+    serie = serie_mensual(cargar_incidencias(args.ruta))['Num_Roturas']
+    inicio = time.perf_counter()
+    df_folds = backtest(serie, min_train_size=args.min_train_size, horizon=args.horizon,
+                        ventana=args.ventana, max_workers=args.workers,
+                        calentar=not args.sin_calentar)
+    r = resumen_backtest(df_folds)
+
+    en_cache = int(df_folds['en_cache'].sum())
+    print(f"✅ {r['ventanas']} validaciones completadas ({time.perf_counter() - inicio:.2f} s, "
+          f"{en_cache} desde la caché de ajustes)")
+    print(f"Precisión: {r['Precision']:.2f}% ± {r['MAPE_std']:.2f}%")
+    print(f"MAE: {r['MAE']:.2f} ± {r['MAE_std']:.2f}")
+    print(f"RMSE: {r['RMSE']:.2f}")
+    print(f"IC 95%: [{r['IC95_Precision'][0]:.2f}%, {r['IC95_Precision'][1]:.2f}%]")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())